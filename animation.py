@@ -0,0 +1,71 @@
+# Time-based card flight scheduler for the game window. Nothing here blocks
+# or touches the display: the main loop calls update(now) once per frame to
+# land finished flights, then draws positions(now) on top of the table. Any
+# number of cards can be in the air at once, and the flight time is measured
+# in milliseconds, so animations run at the same speed whatever the frame
+# rate. Needs no pygame, times are plain millisecond numbers.
+
+DEFAULT_FLIGHT_MS = 400
+FAST_FLIGHT_MS = 100
+
+
+class CardFlight:
+    __slots__ = ('card', 'start', 'end', 'start_time', 'duration', 'on_land')
+
+    def __init__(self, card, start, end, start_time, duration, on_land):
+        self.card = card
+        self.start = start
+        self.end = end
+        self.start_time = start_time
+        self.duration = duration
+        self.on_land = on_land
+
+    def position(self, now):
+        progress = min(1.0, max(0.0, (now - self.start_time) / self.duration)) if self.duration else 1.0
+        return (self.start[0] + (self.end[0] - self.start[0]) * progress,
+                self.start[1] + (self.end[1] - self.start[1]) * progress)
+
+    def landed(self, now):
+        return now >= self.start_time + self.duration
+
+
+class Animator:
+    def __init__(self, flight_ms=DEFAULT_FLIGHT_MS, fast_flight_ms=FAST_FLIGHT_MS):
+        self.flight_ms = flight_ms
+        self.fast_flight_ms = fast_flight_ms
+        self.fast = False
+        self.flights = []
+
+    def duration(self):
+        return self.fast_flight_ms if self.fast else self.flight_ms
+
+    def schedule(self, card, start, end, now, delay_ms=0, on_land=None):
+        # Queues a flight starting delay_ms from now. on_land is called from
+        # update() once the card arrives.
+        self.flights.append(CardFlight(card, start, end, now + delay_ms, self.duration(), on_land))
+
+    def busy(self):
+        return bool(self.flights)
+
+    def update(self, now):
+        # Cards land strictly in the order they were scheduled, so a hand is
+        # always built in dealing order even if a later flight is quicker
+        while self.flights and self.flights[0].landed(now):
+            flight = self.flights.pop(0)
+            if flight.on_land:
+                flight.on_land(flight.card)
+
+    def skip(self, now):
+        # Lands everything in the air immediately
+        for flight in self.flights:
+            flight.start_time = now - flight.duration
+        self.update(now)
+
+    def shift(self, dx, dy):
+        # Moves where the cards in the air are heading, e.g. when the table
+        # under them scrolls
+        for flight in self.flights:
+            flight.end = (flight.end[0] + dx, flight.end[1] + dy)
+
+    def positions(self, now):
+        return [(flight.card, flight.position(now)) for flight in self.flights if now >= flight.start_time]
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from engine import CARDS
+
+# Background image loading. Files are decoded and scaled on a small thread
+# pool so the menu can appear straight away; each image is converted to the
+# display format on the main thread the first time it is asked for, waiting
+# for its decode only if it has not finished yet.
+#
+# Card faces are also packed into one pre-scaled atlas sheet, cached on disk
+# with an offset index. Later launches decode that single sheet instead of
+# 52 PNGs, and every face is a subsurface of it.
+
+ASSET_DIR = "assets"
+ASSET_CACHE_DIR = ".cache"
+ATLAS_VERSION = 1
+ATLAS_COLUMNS = 13
+LOADER_WORKERS = 4
+
+
+def decode_image(path, size):
+    # Runs on a worker thread: no display calls allowed here
+    try:
+        image = pygame.image.load(path)
+    except (pygame.error, FileNotFoundError):
+        return None
+    if size and image.get_size() != tuple(size):
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+class AssetLoader:
+    def __init__(self, workers=LOADER_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.futures = {}
+        self.surfaces = {}
+        self.alpha = {}
+
+    def load(self, key, path, size=None, alpha=True):
+        self.alpha[key] = alpha
+        self.futures[key] = self.pool.submit(decode_image, path, size)
+
+    def ready(self, key):
+        return key in self.surfaces or (key in self.futures and self.futures[key].done())
+
+    def get(self, key):
+        # Returns the display-ready surface, or None if the file is missing
+        if key not in self.surfaces:
+            image = self.futures.pop(key).result()
+            if image is not None:
+                image = image.convert_alpha() if self.alpha[key] else image.convert()
+            self.surfaces[key] = image
+        return self.surfaces[key]
+
+
+class CardFaces:
+    # The 52 card faces, indexed by engine card id
+    def __init__(self, loader, size, placeholder_color):
+        self.loader = loader
+        self.size = tuple(size)
+        self.placeholder_color = placeholder_color
+        self.faces = [None] * len(CARDS)
+        name = f"card_atlas_{self.size[0]}x{self.size[1]}"
+        self.atlas_path = os.path.join(ASSET_CACHE_DIR, name + ".png")
+        self.index_path = os.path.join(ASSET_CACHE_DIR, name + ".json")
+        self.started = None
+        self.ready_ms = None
+        self.warm = False
+
+    def source_path(self, card):
+        return os.path.join(ASSET_DIR, f"{card.rank}_of_{card.suit}.png")
+
+    def sources_stamp(self):
+        stamps = [os.path.getmtime(self.source_path(card)) for card in CARDS if os.path.exists(self.source_path(card))]
+        return max(stamps) if stamps else 0
+
+    def read_index(self):
+        if not (os.path.exists(self.atlas_path) and os.path.exists(self.index_path)):
+            return None
+        with open(self.index_path, "r") as f:
+            try: index = json.load(f)
+            except json.JSONDecodeError: return None
+        if index.get("version") != ATLAS_VERSION or index.get("size") != list(self.size):
+            return None
+        if index.get("sources") != self.sources_stamp() or len(index.get("offsets", [])) != len(CARDS):
+            return None
+        return index
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.index = self.read_index()
+        self.warm = self.index is not None
+        if self.warm:
+            self.loader.load("card_atlas", self.atlas_path)
+        else:
+            for card in CARDS:
+                self.loader.load(("card", card.id), self.source_path(card), self.size)
+
+    def placeholder(self, card):
+        print(f"Warning: Could not load card image {self.source_path(card)}")
+        placeholder = pygame.Surface(self.size)
+        placeholder.fill(self.placeholder_color)
+        return placeholder
+
+    def get(self, card_id):
+        face = self.faces[card_id]
+        if face is None:
+            if self.warm:
+                self.load_from_atlas()
+            else:
+                face = self.loader.get(("card", card_id)) or self.placeholder(CARDS[card_id])
+                self.faces[card_id] = face
+            face = self.faces[card_id]
+            self.check_ready()
+        return face
+
+    def load_from_atlas(self):
+        atlas = self.loader.get("card_atlas")
+        for card_id, (x, y) in enumerate(self.index["offsets"]):
+            self.faces[card_id] = atlas.subsurface(pygame.Rect((x, y), self.size))
+
+    def poll(self):
+        # Called once per frame from idle screens to pick up finished decodes
+        if self.ready_ms is not None:
+            return
+        if self.warm:
+            if self.loader.ready("card_atlas"):
+                self.load_from_atlas()
+        else:
+            for card in CARDS:
+                if self.faces[card.id] is None and self.loader.ready(("card", card.id)):
+                    self.get(card.id)
+        self.check_ready()
+
+    def check_ready(self):
+        if self.ready_ms is None and all(face is not None for face in self.faces):
+            self.ready_ms = (time.perf_counter() - self.started) * 1000
+            if not self.warm:
+                self.save_atlas()
+
+    def save_atlas(self):
+        width, height = self.size
+        rows = (len(CARDS) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+        atlas = pygame.Surface((width * ATLAS_COLUMNS, height * rows), pygame.SRCALPHA)
+        offsets = []
+        for card_id, face in enumerate(self.faces):
+            offset = ((card_id % ATLAS_COLUMNS) * width, (card_id // ATLAS_COLUMNS) * height)
+            atlas.blit(face, offset)
+            offsets.append(offset)
+        try:
+            os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+            pygame.image.save(atlas, self.atlas_path)
+            with open(self.index_path, "w") as f:
+                json.dump({"version": ATLAS_VERSION, "size": list(self.size),
+                           "sources": self.sources_stamp(), "offsets": offsets}, f)
+        except (OSError, pygame.error) as e:
+            print(f"Warning: Could not write card atlas cache: {e}")
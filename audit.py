@@ -0,0 +1,289 @@
+import math
+import os
+import time
+
+import numpy as np
+
+import engine
+import eventlog
+from shuffling import RNG_KINDS, make_rng
+
+# Shuffle fairness audit. Two sources are tested:
+#
+#   - batches of permutations from each RNG in shuffling.py, made with its
+#     batch mode (a shoe of N decks is a permutation of range(52 * N), and
+#     position i of the unshuffled shoe holds card i % 52, as in engine.Shoe)
+#   - a round log (eventlog.py) written by the game: every shoe order the
+#     game shuffled, and the first two cards of each seat and the dealer in
+#     every round main_game_loop dealt
+#
+# Shoe orders get four tests. A chi-square over the card x position table
+# checks that every card is equally likely at every position. The worst
+# single position is checked the same way, Bonferroni-corrected. The worst
+# card's mean position is tested as a z-score. A chi-square over which card
+# follows which catches shuffles that leave neighbours together. Dealt
+# cards get a chi-square of the ranks landing in each deal slot (player
+# first and second card, dealer upcard and hole card), and a slot x rank
+# table for any difference between the slots. Rounds from one shoe are not
+# independent (the cards are dealt without replacement), which only makes
+# those tests more conservative.
+#
+# p-values come from the Wilson-Hilferty approximation of the chi-square
+# distribution, so no SciPy is needed. A test fails below --alpha. A
+# chi-square with any expected cell count under 5 is reported but not
+# judged. --control also audits a naive swap-with-any-position shuffle,
+# which is biased, to show the tests catch it.
+#
+#     python audit.py --permutations 1000000 --rng pcg64 --decks 1 6
+#     python audit.py --rng mt crypto --log round_log.bin --report shuffle_audit.txt
+
+DEFAULT_PERMUTATIONS = 100000
+DEFAULT_BATCH = 50000
+DEFAULT_ALPHA = 0.001
+MIN_EXPECTED = 5
+REPORT_FILE = "shuffle_audit.txt"
+DECK_SIZE = len(engine.CARDS)
+RANK_COUNT = len(engine.RANKS)
+CONTROL = "naive swap (control)"
+DEAL_SLOTS = ["player first card", "player second card", "dealer upcard", "dealer hole card"]
+
+
+def normal_sf(z):
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def chi2_sf(x, dof):
+    # Wilson-Hilferty: (x / dof) ** (1/3) is close to normal
+    if x <= 0:
+        return 1.0
+    scale = 2 / (9 * dof)
+    return normal_sf(((x / dof) ** (1 / 3) - (1 - scale)) / math.sqrt(scale))
+
+
+def chi_square(observed, expected):
+    # Statistic over the cells that can occur at all (expected > 0)
+    cells = expected > 0
+    return float((((observed - expected) ** 2)[cells] / expected[cells]).sum())
+
+
+class AuditResult:
+    def __init__(self, name, statistic, p, detail, reliable=True):
+        self.name = name
+        self.statistic = statistic
+        self.p = p
+        self.detail = detail
+        self.reliable = reliable
+
+    def verdict(self, alpha):
+        if not self.reliable:
+            return "too little data"
+        return "pass" if self.p >= alpha else "FAIL"
+
+    def line(self, alpha):
+        return f"  {self.name:<20}{self.detail:<44}p = {self.p:<11.4g}{self.verdict(alpha)}"
+
+
+class ShoeAudit:
+    # Counts over many shuffled shoes of the same size, given as card ids
+    def __init__(self, decks):
+        self.decks = decks
+        self.size = DECK_SIZE * decks
+        self.positions = np.zeros((self.size, DECK_SIZE), dtype=np.int64)
+        self.successors = np.zeros((DECK_SIZE, DECK_SIZE), dtype=np.int64)
+        self.count = 0
+
+    def add(self, cards):
+        cards = np.asarray(cards, dtype=np.int64).reshape(-1, self.size)
+        offsets = np.arange(self.size, dtype=np.int64) * DECK_SIZE
+        self.positions += np.bincount((cards + offsets).ravel(),
+                                      minlength=self.size * DECK_SIZE).reshape(self.size, DECK_SIZE)
+        self.successors += np.bincount((cards[:, :-1] * DECK_SIZE + cards[:, 1:]).ravel(),
+                                       minlength=DECK_SIZE * DECK_SIZE).reshape(DECK_SIZE, DECK_SIZE)
+        self.count += len(cards)
+
+    def results(self):
+        n, size, copies = self.count, self.size, self.decks
+        results = []
+
+        # Each card is at each position with probability copies / size. A
+        # shoe puts one card at every position and every card somewhere, so
+        # the table is not a free multinomial; its statistic averages
+        # 52 * (size - copies), which is used as the degrees of freedom.
+        expected = n * copies / size
+        statistic = chi_square(self.positions, np.full(self.positions.shape, expected))
+        dof = DECK_SIZE * (size - copies)
+        results.append(AuditResult("card x position", statistic, chi2_sf(statistic, dof),
+                                   f"chi2 {statistic:,.0f} on {dof:,} dof", expected >= MIN_EXPECTED))
+
+        per_position = ((self.positions - expected) ** 2 / expected).sum(axis=1)
+        worst = int(per_position.argmax())
+        p = min(1.0, size * chi2_sf(float(per_position[worst]), DECK_SIZE - 1))
+        results.append(AuditResult("worst position", float(per_position[worst]), p,
+                                   f"position {worst}, chi2 {per_position[worst]:,.1f} on {DECK_SIZE - 1} dof",
+                                   expected >= MIN_EXPECTED))
+
+        # Mean position of each card: its copies take positions drawn
+        # without replacement, each uniform over the shoe
+        mean = (self.positions * np.arange(size)[:, None]).sum(axis=0) / (n * copies)
+        variance = (size * size - 1) / 12 * (size - copies) / (size - 1) / (n * copies)
+        z = (mean - (size - 1) / 2) / math.sqrt(variance)
+        card = int(np.abs(z).argmax())
+        p = min(1.0, DECK_SIZE * 2 * normal_sf(abs(float(z[card]))))
+        results.append(AuditResult("mean position", abs(float(z[card])), p,
+                                   f"{card_name(card)} at {mean[card]:.2f}, z {z[card]:+.2f}"))
+
+        # Card b follows card a with probability copies * (copies - [a == b])
+        # / (size * (size - 1)) at each of the size - 1 neighbouring pairs
+        same = np.eye(DECK_SIZE, dtype=bool)
+        expected_pairs = n * copies * (copies - same) / size
+        statistic = chi_square(self.successors, expected_pairs)
+        dof = (DECK_SIZE - 1) ** 2
+        results.append(AuditResult("adjacent pairs", statistic, chi2_sf(statistic, dof),
+                                   f"chi2 {statistic:,.0f} on {dof:,} dof",
+                                   expected_pairs[expected_pairs > 0].min() >= MIN_EXPECTED))
+        return results
+
+
+class DealAudit:
+    # Ranks of the cards in each initial deal slot, from a round log
+    def __init__(self):
+        self.slots = np.zeros((len(DEAL_SLOTS), RANK_COUNT), dtype=np.int64)
+        self.rounds = 0
+
+    def add(self, logged):
+        seats = len(logged.bets)
+        deal = [byte & 0x7F for byte in logged.draws[:2 * (seats + 1)]]
+        if len(deal) < 2 * (seats + 1):
+            return
+        for i, card in enumerate(deal):
+            pass_, seat = divmod(i, seats + 1)
+            slot = 2 + pass_ if seat == seats else pass_
+            self.slots[slot, card % RANK_COUNT] += 1
+        self.rounds += 1
+
+    def results(self):
+        results = []
+        for name, counts in zip(DEAL_SLOTS, self.slots):
+            expected = counts.sum() / RANK_COUNT
+            statistic = chi_square(counts, np.full(RANK_COUNT, expected))
+            results.append(AuditResult(name, statistic, chi2_sf(statistic, RANK_COUNT - 1),
+                                       f"{counts.sum():,} cards, chi2 {statistic:.1f} on {RANK_COUNT - 1} dof",
+                                       expected >= MIN_EXPECTED))
+
+        # Slot x rank independence: does any slot get different cards?
+        totals = self.slots.sum(axis=1, keepdims=True)
+        expected = totals * self.slots.sum(axis=0, keepdims=True) / max(self.slots.sum(), 1)
+        statistic = chi_square(self.slots, expected)
+        dof = (len(DEAL_SLOTS) - 1) * (RANK_COUNT - 1)
+        results.append(AuditResult("slot x rank", statistic, chi2_sf(statistic, dof),
+                                   f"chi2 {statistic:.1f} on {dof} dof", expected.min() >= MIN_EXPECTED))
+        return results
+
+
+def card_name(card_id):
+    card = engine.CARDS[card_id]
+    return f"{card.rank} of {card.suit}"
+
+
+def naive_permutations(generator, count, size):
+    # Swaps every position with any position, not just the ones after it:
+    # size ** size equally likely paths onto size! orders, so some orders
+    # come up more often than others
+    batch = np.tile(np.arange(size, dtype=np.uint16), (count, 1))
+    rows = np.arange(count)
+    for i in range(size):
+        j = generator.integers(0, size, count)
+        batch[rows, i], batch[rows, j] = batch[rows, j], batch[rows, i]
+    return batch
+
+
+def audit_permutations(make_batch, decks, count, batch_size=DEFAULT_BATCH):
+    audit = ShoeAudit(decks)
+    done = 0
+    while done < count:
+        size = min(batch_size, count - done)
+        audit.add(make_batch(size, audit.size) % DECK_SIZE)
+        done += size
+    return audit
+
+
+def audit_log(path):
+    # (ShoeAudit per shoe size, DealAudit) for a round log
+    shoes = {}
+    for order in eventlog.read_shuffles(path):
+        decks = len(order) // DECK_SIZE
+        shoes.setdefault(decks, ShoeAudit(decks)).add(np.frombuffer(order, dtype=np.uint8))
+    deals = DealAudit()
+    for logged in eventlog.read_rounds(path):
+        deals.add(logged)
+    return shoes, deals
+
+
+def section(title, results, alpha):
+    return [title] + [result.line(alpha) for result in results] + [""]
+
+
+def failed(results, alpha):
+    return sum(result.verdict(alpha) == "FAIL" for result in results)
+
+
+def run_audit(kinds, decks_list, count, seed=None, log=None, control=False, alpha=DEFAULT_ALPHA):
+    # Returns (report lines, number of failed tests); the control's own
+    # failures are reported but not counted
+    lines = [f"Shuffle fairness audit, {time.strftime('%Y-%m-%d %H:%M:%S')}",
+             f"alpha {alpha}, seed {seed if seed is not None else 'random'}", ""]
+    failures = 0
+    sources = [(kind, lambda n, size, rng=make_rng(kind, seed): rng.permutations(n, size)) for kind in kinds]
+    if control:
+        generator = np.random.default_rng(seed)
+        sources.append((CONTROL, lambda n, size: naive_permutations(generator, n, size)))
+    for name, make_batch in sources:
+        for decks in decks_list:
+            start = time.perf_counter()
+            audit = audit_permutations(make_batch, decks, count)
+            elapsed = time.perf_counter() - start
+            results = audit.results()
+            title = f"{name}: {count:,} shuffles of {decks} deck(s), {count / elapsed:,.0f} shuffles/s"
+            if name == CONTROL:
+                caught = failed(results, alpha)
+                title += f" - {'caught' if caught else 'NOT caught'} by {caught} test(s)"
+            else:
+                failures += failed(results, alpha)
+            lines += section(title, results, alpha)
+    if log and os.path.exists(log):
+        shoes, deals = audit_log(log)
+        for decks, audit in sorted(shoes.items()):
+            results = audit.results()
+            failures += failed(results, alpha)
+            lines += section(f"{log}: {audit.count:,} logged shoes of {decks} deck(s)", results, alpha)
+        results = deals.results()
+        failures += failed(results, alpha)
+        lines += section(f"{log}: initial deal of {deals.rounds:,} logged rounds", results, alpha)
+    elif log:
+        lines += [f"{log}: not found, no dealt cards audited", ""]
+    return lines, failures
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Test shuffles and dealt cards for bias")
+    parser.add_argument("--rng", nargs="+", choices=RNG_KINDS, default=RNG_KINDS)
+    parser.add_argument("--decks", type=int, nargs="+", default=[1])
+    parser.add_argument("--permutations", type=int, default=DEFAULT_PERMUTATIONS, help="shuffles per RNG and shoe size")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log", default=eventlog.ROUND_LOG_FILE, help="round log to audit too, if it exists")
+    parser.add_argument("--control", action="store_true", help="also audit a deliberately biased shuffle")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--report", default=REPORT_FILE)
+    args = parser.parse_args()
+
+    lines, failures = run_audit(args.rng, args.decks, args.permutations, args.seed, args.log, args.control,
+                                args.alpha)
+    lines.append(f"{failures} failed test(s)")
+    with open(args.report, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+    print(f"Report written to {args.report}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,290 @@
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import engine
+from history import make_record
+from shuffling import CRYPTO, PCG64, make_rng
+
+# Benchmark suite for the engine, the table renderer and the player store.
+# Runs headless (the renderer uses SDL's dummy video driver), so it works on
+# a plain Linux CI box:
+#
+#     python benchmarks.py                  # run and compare with baselines
+#     python benchmarks.py --save           # record new baselines
+#     python benchmarks.py --only engine    # one group: engine, render, storage
+#
+# Every metric has a direction (higher or lower is better). Results are
+# compared with benchmark_baselines.json and anything worse than the
+# tolerance is flagged as a regression (after one confirming re-run); the
+# exit status is 1 if any were.
+
+BASELINE_FILE = "benchmark_baselines.json"
+DEFAULT_TOLERANCE = 0.25
+# Store timings swing more between runs than CPU-bound ones, and what they
+# are here to catch is a cost that grows with history size (10x or more)
+GROUP_TOLERANCE = {"storage": 0.6}
+GROUPS = ["engine", "render", "storage"]
+HISTORY_SIZES = [10000, 100000, 1000000]
+QUICK_HISTORY_SIZES = [10000, 100000]
+DIRECTORY_PROFILES = 100000
+HIGHER, LOWER = "higher", "lower"
+
+
+def best_time(func, number, repeat=7):
+    # Best of repeat runs, in seconds per call
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+# Engine
+def bench_engine(results):
+    rng = random.Random(1)
+    hands = [[engine.CARDS[rng.randrange(len(engine.CARDS))] for _ in range(5)] for _ in range(1000)]
+
+    def score_hands():
+        for hand in hands:
+            player = engine.Player("Bench")
+            for card in hand:
+                player.hit(card)
+            player.calculate_score()
+    results["engine.hand_scoring"] = (len(hands) / best_time(score_hands, 10), "hands/s", HIGHER)
+
+    cards = engine.CARDS * 20
+
+    def card_values():
+        for card in cards:
+            card.value()
+    results["engine.card_value"] = (len(cards) / best_time(card_values, 100), "calls/s", HIGHER)
+
+    results["engine.deck_construct"] = (best_time(lambda: engine.Deck(rng), 2000) * 1e6, "us", LOWER)
+    shoe = engine.Shoe(6, rng=rng)
+    results["engine.shoe_shuffle_6_decks"] = (best_time(shoe.shuffle, 500) * 1e6, "us", LOWER)
+    for kind in (PCG64, CRYPTO):
+        shoe = engine.Shoe(6, rng=make_rng(kind, 1))
+        results[f"engine.shoe_shuffle_6_decks_{kind}"] = (best_time(shoe.shuffle, 200) * 1e6, "us", LOWER)
+    batch = make_rng(PCG64, 1)
+    results["engine.permutation_batch_pcg64"] = (
+        100000 / best_time(lambda: batch.permutations(100000, len(engine.CARDS)), 1, 5), "decks/s", HIGHER)
+
+    rounds = 20000
+    elapsed = best_time(lambda: engine.simulate_rounds(rounds, seed=1), 1, 3)
+    results["engine.round_simulation"] = (rounds / elapsed, "rounds/s", HIGHER)
+
+
+# Rendering
+def bench_render(results):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import blackjack
+
+    rng = random.Random(2)
+    # Up to a full table, then large tables that only fit by scrolling
+    for seats in (1, 2, 3, 4, 5, 6, 24, 48):
+        players = [blackjack.Player(f"p{i}") for i in range(seats)]
+        dealer = blackjack.Player("Dealer")
+        for player in players + [dealer]:
+            # Long hands: eight small cards each
+            for _ in range(8):
+                player.hit(engine.CARDS[rng.choice([0, 1, 2, 13, 14, 26, 39])])
+        participants = players + [dealer]
+        blackjack.TABLE_SCENE.background = blackjack.table_background()
+
+        def idle_frame():
+            blackjack.draw_table(participants, 0, 0, False)
+            blackjack.TABLE_SCENE.present()
+
+        def full_frame():
+            blackjack.TABLE_SCENE.invalidate()
+            idle_frame()
+
+        idle_frame()  # warm the panel cache and the card faces
+        results[f"render.draw_table_{seats}p_idle"] = (best_time(idle_frame, 200) * 1000, "ms", LOWER)
+        results[f"render.draw_table_{seats}p_full"] = (best_time(full_frame, 50) * 1000, "ms", LOWER)
+
+
+# Storage
+def bench_storage(results, sizes):
+    from storage import PlayerStore
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        store = PlayerStore(os.path.join(workdir, "players.db"), legacy_json=None)
+        name = "bench"
+        balance = engine.STARTING_BALANCE
+        stored = 0
+        chunk = 10000
+        for size in sizes:
+            while stored < size:
+                records = [make_record(100, engine.WIN if i % 2 else engine.LOSS, 100 if i % 2 else -100, balance, 0)
+                           for i in range(min(chunk, size - stored))]
+                store.save_many([(name, {"balance": balance, "pending": records})])
+                stored += len(records)
+
+            label = f"{size // 1000}k" if size < 1000000 else f"{size // 1000000}M"
+            results[f"storage.load_profile_{label}"] = (best_time(lambda: store.load(name), 200) * 1e6, "us", LOWER)
+            page = store.load_history(name, 50)
+            before_id = page[-1]["id"]
+            results[f"storage.load_history_page_{label}"] = (
+                best_time(lambda: store.load_history(name, 50, before_id), 200) * 1e6, "us", LOWER)
+
+            def save_round():
+                record = make_record(100, engine.PUSH, 0, balance)
+                store.save_many([(name, {"balance": balance, "pending": [record]})])
+            results[f"storage.save_round_{label}"] = (best_time(save_round, 50) * 1e6, "us", LOWER)
+            stored += 250  # the save_round calls above
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_directory(results, profiles=DIRECTORY_PROFILES):
+    from storage import PlayerStore
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        store = PlayerStore(os.path.join(workdir, "players.db"), legacy_json=None)
+        rng = random.Random(3)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        names = ["".join(rng.choice(letters) for _ in range(8)) + str(i) for i in range(profiles)]
+        chunk = 10000
+        for start in range(0, profiles, chunk):
+            batch = []
+            for name in names[start:start + chunk]:
+                payout = rng.randrange(-500, 501, 50)
+                record = make_record(100, engine.WIN if payout > 0 else engine.LOSS, payout,
+                                     engine.STARTING_BALANCE + payout, 0)
+                batch.append((name, {"balance": record["balance"], "pending": [record]}))
+            store.save_many(batch)
+
+        label = f"{profiles // 1000}k"
+        for order in ("balance", "net"):
+            results[f"storage.leaderboard_{order}_{label}"] = (
+                best_time(lambda: store.leaderboard(order, 10), 200) * 1e6, "us", LOWER)
+        prefixes = [name[:2] for name in rng.sample(names, 50)]
+        results[f"storage.prefix_search_{label}"] = (
+            best_time(lambda: [store.search(prefix, 10) for prefix in prefixes], 20) / len(prefixes) * 1e6,
+            "us", LOWER)
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Baselines
+def load_baselines(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        try: return json.load(f).get("results", {})
+        except json.JSONDecodeError: return {}
+
+
+def save_baselines(results, path=BASELINE_FILE):
+    data = {"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.processor() or platform.machine()},
+            "results": {name: {"value": value, "unit": unit, "better": better}
+                        for name, (value, unit, better) in sorted(results.items())}}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def run_groups(groups, sizes):
+    results = {}
+    if "engine" in groups:
+        bench_engine(results)
+    if "render" in groups:
+        bench_render(results)
+    if "storage" in groups:
+        bench_storage(results, sizes)
+        bench_directory(results)
+    return results
+
+
+def is_worse(name, value, baseline, better, tolerance):
+    tolerance = max(tolerance, GROUP_TOLERANCE.get(name.split(".")[0], 0.0))
+    change = value / baseline - 1 if baseline else 0.0
+    return change < -tolerance if better == HIGHER else change > tolerance
+
+
+def regressed(results, baselines, tolerance):
+    # The groups with at least one metric worse than its baseline
+    return {name.split(".")[0] for name, (value, unit, better) in results.items()
+            if name in baselines and is_worse(name, value, baselines[name]["value"], better, tolerance)}
+
+
+def merge_best(results, rerun):
+    merged = dict(results)
+    for name, (value, unit, better) in rerun.items():
+        old = merged.get(name)
+        if old is None or (value > old[0] if better == HIGHER else value < old[0]):
+            merged[name] = (value, unit, better)
+    return merged
+
+
+def compare(results, baselines, tolerance):
+    # Returns the names of regressed metrics and prints one line per metric
+    regressions = []
+    print(f"{'benchmark':<36}{'value':>14}  {'unit':<9}{'baseline':>12}{'change':>9}")
+    for name, (value, unit, better) in results.items():
+        baseline = baselines.get(name)
+        line = f"{name:<36}{value:>14,.2f}  {unit:<9}"
+        if baseline:
+            change = value / baseline["value"] - 1 if baseline["value"] else 0.0
+            line += f"{baseline['value']:>12,.2f}{change:>+9.1%}"
+            if is_worse(name, value, baseline["value"], better, tolerance):
+                line += "  REGRESSION"
+                regressions.append(name)
+        else:
+            line += f"{'-':>12}"
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Black Jack benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-record storage run")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baselines")
+    parser.add_argument("--baselines", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--runs", type=int, default=3, help="runs to take the median of with --save")
+    args = parser.parse_args()
+
+    # The renderer loads its images relative to the repository
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sizes = QUICK_HISTORY_SIZES if args.quick else HISTORY_SIZES
+    baselines = load_baselines(args.baselines)
+    if args.save:
+        # Baselines are the median of several runs, not one lucky one
+        runs = [run_groups(args.only, sizes) for _ in range(args.runs)]
+        results = {name: (statistics.median(run[name][0] for run in runs), unit, better)
+                   for name, (value, unit, better) in runs[0].items()}
+    else:
+        results = run_groups(args.only, sizes)
+        suspects = regressed(results, baselines, args.tolerance)
+        if suspects:
+            # Shared CI machines are noisy: a group with a suspected
+            # regression is run again and each metric keeps its better value
+            print(f"Re-running {', '.join(sorted(suspects))} to confirm...")
+            results = merge_best(results, run_groups(sorted(suspects), sizes))
+    regressions = compare(results, baselines, args.tolerance)
+    if args.save:
+        merged = {name: (entry["value"], entry["unit"], entry["better"]) for name, entry in baselines.items()}
+        merged.update(results)
+        save_baselines(merged, args.baselines)
+        print(f"Baselines written to {args.baselines}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
@@ -1,8 +1,29 @@
+import time
+
+STARTUP_BEGIN = time.perf_counter()
+
 import pygame
-import random
+import argparse
+import atexit
 import os
-import json
-import time
+import struct
+import sys
+
+import engine
+from engine import Shoe, STARTING_BALANCE
+from animation import Animator
+from layout import TableLayout
+from shuffling import DEFAULT_RNG, RNG_KINDS, make_rng
+from assets import AssetLoader, CardFaces
+from strategy import get_advisor
+from text_cache import TextCache
+from profiler import Profiler
+from storage import PlayerStore
+from profile_cache import ProfileCache
+from history import ProfilePlayer, summary_line
+from bots import bot_for_username
+from counting import COUNT_SYSTEMS, CountTracker
+import eventlog
 
 # Initialize pygame
 pygame.init()
@@ -22,116 +43,170 @@ FONT_MEDIUM = pygame.font.Font(None, 28)
 FONT_LARGE = pygame.font.Font(None, 32)
 CARD_WIDTH, CARD_HEIGHT = 100, 140
 PLAYER_DATA_FILE = "player_data.json"
+PLAYER_DB_FILE = "player_data.db"
 HIGHLIGHT_COLOR = (255, 215, 0)
 DECK_POS = (WIDTH - CARD_WIDTH - 50, 50)
 ANIMATION_SPEED_MS = 400
+FAST_ANIMATION_SPEED_MS = 100
+DEAL_STAGGER_MS = 150
+DEALER_PAUSE_MS = 400
+BOT_THINK_MS = 500
+# Table rules come from the same flags as engine.py, e.g. --dealer-17 s17,
+# --decks N deals from an N-deck shoe (1-8) instead of the usual six, and
+# --rng mt|pcg64|crypto picks the shuffle's random source (shuffling.py).
+# The round log flags are described at ROUND_LOG_FILE.
+_rules_parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+_rules_parser.add_argument("--decks", type=int, default=engine.DEFAULT_DECKS)
+_rules_parser.add_argument("--rng", choices=RNG_KINDS, default=DEFAULT_RNG)
+_rules_parser.add_argument("--no-round-log", action="store_true")
+_rules_parser.add_argument("--replay", metavar="LOG", default=None)
+_rules_parser.add_argument("--round", type=int, default=0)
+_rules_parser.add_argument("--speed", type=float, default=1.0)
+engine.add_rules_arguments(_rules_parser)
+_args = _rules_parser.parse_known_args()[0]
+if not engine.MIN_DECKS <= _args.decks <= engine.MAX_DECKS:
+    _rules_parser.error(f"--decks must be {engine.MIN_DECKS}-{engine.MAX_DECKS}, not {_args.decks}")
+if _args.speed <= 0:
+    _rules_parser.error(f"--speed must be above 0, not {_args.speed}")
+TABLE_RULES = engine.rules_from_args(_args)
+SHOE_DECKS = _args.decks
+SHOE_PENETRATION = engine.DEFAULT_PENETRATION
+SHOE_RNG = _args.rng
+# [C] cycles the count shown under the deck through these, then off
+COUNT_CYCLE = list(COUNT_SYSTEMS) + [None]
+# Hints come from the exact composition-dependent solver (solver.py, needs
+# numpy) for shoes this small, and from the basic-strategy table otherwise
+EXACT_HINT_MAX_DECKS = 2
+# Split hands share their player's row: each gets a slot this wide, with
+# its cards fanned out by a step instead of laid side by side
+SPLIT_SLOT_WIDTH = 180
+SPLIT_CARD_STEP = 20
+# Seat rows: a name line (taller for the seat being played), then the cards.
+# Rows scroll under the buttons; only the ones on screen are drawn.
+SEAT_TOP = 50
+SEAT_NAME_HEIGHT = 30
+SEAT_NAME_HEIGHT_HIGHLIGHTED = 35
+SEAT_ROW_WIDTH = WIDTH - 100
+SEAT_VIEW_HEIGHT = HEIGHT - 110
+SCROLL_STEP = 40
+# Every round is appended to the round log (eventlog.py); --no-round-log
+# turns that off. --replay LOG [--round N] [--speed X] steps through a
+# logged round on the table instead of starting the game.
+ROUND_LOG_FILE = None if _args.no_round_log else eventlog.ROUND_LOG_FILE
+REPLAY_STEP_MS = 600
+# Names listed under the username prompt (see get_usernames)
+USERNAME_SUGGESTIONS = 6
+
+TEXT_CACHE = TextCache()
+
+# --profile times the game loop's phases and shows FPS and frame times in
+# the corner of the table; --cprofile also runs cProfile. Reports are
+# written when the game exits (see profiler.py).
+PROFILER = Profiler("--profile" in sys.argv or "--cprofile" in sys.argv, "--cprofile" in sys.argv)
+PROFILER_OVERLAY_WIDTH = 300
+PROFILER_OVERLAY_REFRESH_MS = 500
+
+
+@PROFILER.timed("render_text", trace=False)
+def render_text(font, text, color):
+    return TEXT_CACHE.render(font, text, color)
+
 
 # Screen setup
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Black Jack")
 clock = pygame.time.Clock()
 
-# Load background images from the 'assets' folder
-try:
-    MAIN_MENU_BG = pygame.image.load(os.path.join("assets", "main_page_bg.jpg")).convert()
-    MAIN_MENU_BG = pygame.transform.scale(MAIN_MENU_BG, (WIDTH, HEIGHT))
-    GAME_BG = pygame.image.load(os.path.join("assets", "game_page_bg.jpg")).convert()
-    GAME_BG = pygame.transform.scale(GAME_BG, (WIDTH, HEIGHT))
-except pygame.error:
-    MAIN_MENU_BG = None
-    GAME_BG = None
+# Images are decoded in the background so the menu can show right away;
+# see assets.py. Nothing below waits for a file until it is first drawn.
+ASSETS = AssetLoader()
+ASSETS.load("main_menu_bg", os.path.join("assets", "main_page_bg.jpg"), (WIDTH, HEIGHT), alpha=False)
+ASSETS.load("game_bg", os.path.join("assets", "game_page_bg.jpg"), (WIDTH, HEIGHT), alpha=False)
+ASSETS.load("card_back", os.path.join("assets", "card_back.jpeg"), (CARD_WIDTH, CARD_HEIGHT))
+CARD_IMAGES = CardFaces(ASSETS, (CARD_WIDTH, CARD_HEIGHT), WHITE)
+CARD_IMAGES.start()
+STARTUP_TIMES = {}
 
 # Create a semi-transparent overlay
 OVERLAY = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
 OVERLAY.fill((0, 0, 0, 150))
 
-# Load card images
-def load_card_images(resized_width=100, resized_height=140):
-    card_images = {}
-    suits = ['hearts', 'diamonds', 'clubs', 'spades']
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'jack', 'queen', 'king', 'ace']
-    for suit in suits:
-        for rank in ranks:
-            filepath = os.path.join("assets", f"{rank}_of_{suit}.png")
-            try:
-                card_image = pygame.image.load(filepath).convert_alpha()
-                card_image_resized = pygame.transform.scale(card_image, (resized_width, resized_height))
-                card_images[f"{rank}_of_{suit}"] = card_image_resized
-            except pygame.error:
-                print(f"Warning: Could not load card image {filepath}")
-                placeholder = pygame.Surface((resized_width, resized_height))
-                placeholder.fill(WHITE)
-                card_images[f"{rank}_of_{suit}"] = placeholder
-    return card_images
-
-CARD_IMAGES = load_card_images()
-try:
-    CARD_BACK = pygame.image.load(os.path.join("assets", "card_back.jpeg")).convert_alpha()
-    CARD_BACK = pygame.transform.scale(CARD_BACK, (CARD_WIDTH, CARD_HEIGHT))
-except pygame.error:
-    CARD_BACK = pygame.Surface((CARD_WIDTH, CARD_HEIGHT)); CARD_BACK.fill(RED)
+BACKGROUNDS = {}
 
 
-# Classes
-class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
-        self.image = CARD_IMAGES.get(f"{rank}_of_{suit}")
-
-    def value(self):
-        if self.rank.isdigit():
-            return int(self.rank)
-        elif self.rank in ['jack', 'queen', 'king']:
-            return 10
-        elif self.rank == 'ace':
-            return 11
-
-class Deck:
-    def __init__(self):
-        self.cards = [Card(rank, suit) for suit in ['hearts', 'diamonds', 'clubs', 'spades']
-                      for rank in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'jack', 'queen', 'king', 'ace']]
-        random.shuffle(self.cards)
-
-    def draw(self):
-        return self.cards.pop() if self.cards else None
-
-class Player:
-    def __init__(self, name):
-        self.name = name
-        self.hand = []
-        self.stopped = False
-        self.is_dealer = name == "Dealer"
-        self.show_second_card = False
-        self.blackjack = False
-        self.balance = 20000
-        self.history = []
-
-    def hit(self, card):
-        self.hand.append(card)
-        if self.calculate_score() == 21 and len(self.hand) >= 2:
-            self.blackjack = True
-
-    def calculate_score(self):
-        score, aces = 0, 0
-        for card in self.hand:
-            value = card.value()
-            if card.rank == 'ace':
-                aces += 1
-            score += value
-        while score > 21 and aces > 0:
-            score -= 10
-            aces -= 1
-        return score
+def composite_background(key, fallback_color):
+    # Background with the overlay already applied, built once, so screens
+    # only need one opaque blit instead of a full-screen alpha blend
+    if key not in BACKGROUNDS:
+        image = ASSETS.get(key)
+        background = pygame.Surface((WIDTH, HEIGHT)).convert()
+        if image:
+            background.blit(image, (0, 0))
+            background.blit(OVERLAY, (0, 0))
+        else:
+            background.fill(fallback_color)
+        BACKGROUNDS[key] = background
+    return BACKGROUNDS[key]
+
+
+def table_background():
+    return composite_background("game_bg", GREEN)
+
+
+def menu_background():
+    # Plain black until the menu picture has finished decoding
+    if "main_menu_bg" not in BACKGROUNDS and not ASSETS.ready("main_menu_bg"):
+        return None
+    return composite_background("main_menu_bg", BLACK)
+
+
+def card_back():
+    if "card_back" not in BACKGROUNDS:
+        image = ASSETS.get("card_back")
+        if image is None:
+            image = pygame.Surface((CARD_WIDTH, CARD_HEIGHT)); image.fill(RED)
+        BACKGROUNDS["card_back"] = image
+    return BACKGROUNDS["card_back"]
 
+
+def card_image(card):
+    return CARD_IMAGES.get(card.id)
+
+
+def report_startup():
+    mode = "warm, card atlas cache" if CARD_IMAGES.warm else "cold, individual card files"
+    print(f"Startup ({mode}): menu shown after {STARTUP_TIMES['menu_ms']:.0f} ms, "
+          f"card faces ready after {STARTUP_TIMES['cards_ms']:.0f} ms")
+
+
+ADVISOR = get_advisor(rules=TABLE_RULES)
+_solvers = {}
+
+def exact_solver(decks):
+    # None when the shoe is too big or numpy is missing
+    if decks > EXACT_HINT_MAX_DECKS:
+        return None
+    if decks not in _solvers:
+        try:
+            from solver import CompositionSolver
+        except ImportError:
+            _solvers[decks] = None
+        else:
+            _solvers[decks] = CompositionSolver(decks, rules=TABLE_RULES)
+    return _solvers[decks]
+
+
+# Classes
+class Player(ProfilePlayer):
     def load_data(self, username):
-        player_data = load_player_data(username)
-        self.balance = player_data["balance"]
-        self.history = player_data["history"]
+        self.load_profile(load_player_data(username))
 
     def save_data(self, username):
-        player_data = {"balance": self.balance, "history": self.history}
-        save_player_data(username, player_data)
+        save_player_data(username, self.profile())
+        self.pending = []
+
+if PROFILER.enabled:
+    Player.calculate_score = PROFILER.counted("calculate_score", Player.calculate_score)
 
 # Button Class
 class Button:
@@ -139,147 +214,305 @@ class Button:
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.action = action
+        self.image = self.render()
+
+    def render(self):
+        image = pygame.Surface(self.rect.size).convert()
+        image.fill(BUTTON_COLOR)
+        pygame.draw.rect(image, WHITE, image.get_rect(), 2)
+        text_surface = render_text(FONT, self.text, WHITE)
+        image.blit(text_surface, text_surface.get_rect(center=image.get_rect().center))
+        return image
 
     def draw(self, surface):
-        pygame.draw.rect(surface, BUTTON_COLOR, self.rect)
-        pygame.draw.rect(surface, WHITE, self.rect, 2)
-        text_surface = FONT.render(self.text, True, WHITE)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+        surface.blit(self.image, self.rect)
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
             if self.action:
                 self.action()
 
-# Game Functions
-def get_player_card_pos(all_players, player_idx, card_idx, current_player_idx, dealer_is_playing, scroll_offset):
-    y_pos = 50 - scroll_offset
-    for i in range(player_idx):
-        is_current = (i == current_player_idx and not dealer_is_playing)
-        is_active_dealer = (all_players[i].is_dealer and dealer_is_playing)
-        y_pos += 30 if not (is_current or is_active_dealer) else 40
-        y_pos += CARD_HEIGHT + 50
-    
-    player = all_players[player_idx]
-    is_current = (player_idx == current_player_idx and not dealer_is_playing)
-    is_active_dealer = (player.is_dealer and dealer_is_playing)
-    y_pos += 30 if not (is_current or is_active_dealer) else 40
-
-    x_pos = 50 + card_idx * (CARD_WIDTH + 10)
-    return x_pos, y_pos
-
-def animate_card_deal(game_state, card, start_pos, end_pos):
-    start_time = time.time()
-    while True:
-        elapsed_time = (time.time() - start_time) * 1000
-        if elapsed_time >= ANIMATION_SPEED_MS:
-            break
-        
-        progress = elapsed_time / ANIMATION_SPEED_MS
-        current_x = start_pos[0] + (end_pos[0] - start_pos[0]) * progress
-        current_y = start_pos[1] + (end_pos[1] - start_pos[1]) * progress
-
-        draw_table(
-            game_state['all_players'],
-            game_state['current_player_idx'],
-            game_state['scroll_offset'],
-            game_state['dealer_is_playing'],
-            game_state.get('mouse_pos', (0,0))
-        )
-        screen.blit(card.image, (current_x, current_y))
-        pygame.display.flip()
-        clock.tick(FPS)
-
-def draw_table(players, current_player_idx, scroll_offset, dealer_is_playing, mouse_pos=(0,0)):
-    if GAME_BG:
-        screen.blit(GAME_BG, (0, 0))
-        screen.blit(OVERLAY, (0, 0))
-    else:
-        screen.fill(GREEN)
-
-    y_offset = 50 - scroll_offset
-
-    screen.blit(CARD_BACK, DECK_POS)
-    deck_text = FONT.render("DECK", True, WHITE)
-    deck_text_rect = deck_text.get_rect(center=(DECK_POS[0] + CARD_WIDTH / 2, DECK_POS[1] + CARD_HEIGHT + 15))
-    screen.blit(deck_text, deck_text_rect)
-
-    for idx, player in enumerate(players):
-        is_current_player = (idx == current_player_idx and not dealer_is_playing)
-        is_active_dealer = (player.is_dealer and dealer_is_playing)
-
-        color = HIGHLIGHT_COLOR if is_current_player or is_active_dealer else WHITE
+# Retained rendering for the game table. Each frame the table is described
+# as a list of (surface, position) items; present() compares that list with
+# the previous frame and repaints and pushes only the rectangles whose items
+# appeared, moved, disappeared or were replaced. An idle table costs no
+# blits and no display update at all.
+class Scene:
+    def __init__(self, background):
+        self.background = background
+        self.items = []
+        self.previous = None
+
+    def add(self, surface, pos):
+        self.items.append((surface, pygame.Rect(pos, surface.get_size())))
+
+    def invalidate(self):
+        # Forces a full repaint, e.g. after another screen drew over the table
+        self.previous = None
+
+    def present(self):
+        items, self.items = self.items, []
+        if self.previous is None:
+            dirty = [screen.get_rect()]
+        else:
+            # The previous items are still referenced here, so a new surface
+            # can never share an id() with one that was on screen last frame
+            old = {(id(surface), tuple(rect)) for surface, rect in self.previous}
+            new = {(id(surface), tuple(rect)) for surface, rect in items}
+            dirty = [pygame.Rect(rect) for key in old ^ new for rect in [key[1]]]
+        self.previous = items
+        if not dirty:
+            return []
+        for rect in dirty:
+            screen.set_clip(rect)
+            screen.blit(self.background, rect, rect)
+            for surface, item_rect in items:
+                if item_rect.colliderect(rect):
+                    screen.blit(surface, item_rect)
+        screen.set_clip(None)
+        pygame.display.update(dirty)
+        return dirty
+
+
+TABLE_SCENE = Scene(None)
+DECK_LABEL = render_text(FONT, "DECK", WHITE)
+
+
+class PanelCache:
+    # Per-player name line plus card layout, rebuilt only when something the
+    # panel shows (hands, bets, balance, highlight, hole card) changes
+    def __init__(self):
+        self.panels = {}
+
+    def get(self, player, highlighted):
+        hands = tuple((tuple(card.id for card in hand.hand), hand.doubled, hand.surrendered)
+                      for hand in player.hands)
+        key = (hands, player.active, player.stopped, player.insurance, player.show_second_card,
+               player.blackjack, getattr(player, 'bet', 0), getattr(player, 'balance', 0), highlighted)
+        cached = self.panels.get(player.name)
+        if cached and cached[0] == key:
+            return cached[1]
+        panel = self.build(player, highlighted)
+        self.panels[player.name] = (key, panel)
+        return panel
+
+    def build(self, player, highlighted):
+        color = HIGHLIGHT_COLOR if highlighted else WHITE
         # Use FONT_MEDIUM for the highlighted player's text
-        font = FONT_MEDIUM if is_current_player or is_active_dealer else FONT
+        font = FONT_MEDIUM if highlighted else FONT
         blackjack_text = " - Black Jack!!" if player.blackjack else ""
-        
-        display_text = ""
+
         if player.is_dealer:
             score_val = player.hand[0].value() if player.hand and not player.show_second_card else player.calculate_score()
             display_text = f"{player.name} - Score: {score_val}{blackjack_text}"
         else:
-            bet_text = f" | Bet: {getattr(player, 'bet', 0)}"
+            bet_text = f" | Bet: {player.committed()}"
             balance_text = f" | Balance: {getattr(player, 'balance', 0)}"
-            display_text = f"{player.name} - Score: {player.calculate_score()}{blackjack_text}{bet_text}{balance_text}"
+            if len(player.hands) > 1:
+                # The hand being played is bracketed
+                scores = [f"[{hand.calculate_score()}]" if i == player.active and not player.stopped
+                          else str(hand.calculate_score()) for i, hand in enumerate(player.hands)]
+                score_text = f"Hands: {' / '.join(scores)}"
+            else:
+                score_text = f"Score: {player.calculate_score()}{blackjack_text}"
+                if player.doubled:
+                    score_text += " (Doubled)"
+                if player.surrendered:
+                    score_text += " (Surrendered)"
+            if player.insurance:
+                score_text += " (Insured)"
+            display_text = f"{player.name} - {score_text}{bet_text}{balance_text}"
+
+        # Items are positioned relative to the top-left of the name line
+        items = [(render_text(font, display_text, color), (0, 0))]
+        card_y = SEAT_NAME_HEIGHT_HIGHLIGHTED if highlighted else SEAT_NAME_HEIGHT
+        for hand_idx, hand in enumerate(player.hands):
+            for card_idx, card in enumerate(hand.hand):
+                if player.is_dealer and card_idx == 1 and not player.show_second_card:
+                    image = card_back()
+                else:
+                    image = card_image(card)
+                items.append((image, (card_offset(player, hand_idx, card_idx), card_y)))
+        return items
+
+
+PANELS = PanelCache()
+LAYOUT = TableLayout(SEAT_TOP, SEAT_NAME_HEIGHT, SEAT_NAME_HEIGHT_HIGHLIGHTED, CARD_HEIGHT, 20)
 
-        text = font.render(display_text, True, color)
-        text_rect = text.get_rect(topleft=(50, y_offset))
-        screen.blit(text, text_rect)
-        
-        x_card_offset = 50
-        # Adjusted card y_offset to account for the new medium font size
-        y_card_offset = y_offset + (35 if is_current_player or is_active_dealer else 30)
+
+# Game Functions
+def card_offset(player, hand_idx, card_idx):
+    # x of a card relative to the player's name line. A hand too long for
+    # the row is squeezed so its last card still fits; a card being dealt
+    # counts already, so it flies straight to where it will stay.
+    if len(player.hands) == 1:
+        cards = max(len(player.hand), card_idx + 1)
+        step = CARD_WIDTH + 10
+        if cards > 1:
+            step = min(step, (SEAT_ROW_WIDTH - CARD_WIDTH) // (cards - 1))
+        return card_idx * step
+    return hand_idx * SPLIT_SLOT_WIDTH + card_idx * SPLIT_CARD_STEP
+
+def table_layout(all_players, current_player_idx, dealer_is_playing):
+    # The dealer is always the last seat
+    highlighted = len(all_players) - 1 if dealer_is_playing else current_player_idx
+    return LAYOUT.update(len(all_players), highlighted)
+
+def get_player_card_pos(all_players, player_idx, card_idx, current_player_idx, dealer_is_playing, scroll_offset, hand_idx=0):
+    # Uses the same geometry as the panels in draw_table, so a card lands
+    # exactly where it is drawn afterwards
+    layout = table_layout(all_players, current_player_idx, dealer_is_playing)
+    x_pos = 50 + card_offset(all_players[player_idx], hand_idx, card_idx)
+    return x_pos, layout.tops[player_idx] + layout.card_y(player_idx) - scroll_offset
+
+ANIMATOR = Animator(ANIMATION_SPEED_MS, FAST_ANIMATION_SPEED_MS)
+
+_overlay = {"surface": None, "at": -PROFILER_OVERLAY_REFRESH_MS}
+
+def profiler_overlay():
+    # Rebuilt twice a second, so the dirty-rect scene only repaints its
+    # corner then rather than every frame
+    now = pygame.time.get_ticks()
+    if now - _overlay["at"] >= PROFILER_OVERLAY_REFRESH_MS:
+        text_stats = TEXT_CACHE.stats()
+        lines = PROFILER.overlay_lines() + [f"text cache hit rate {text_stats['hit_rate']:.0%}"]
+        surface = pygame.Surface((PROFILER_OVERLAY_WIDTH, len(lines) * 18 + 8)).convert()
+        surface.fill(BLACK)
+        for i, line in enumerate(lines):
+            surface.blit(render_text(FONT, line, WHITE), (5, 4 + i * 18))
+        _overlay["surface"], _overlay["at"] = surface, now
+    return _overlay["surface"]
+
+def export_profile():
+    text_stats = TEXT_CACHE.stats()
+    PROFILER.count("text_cache_hits", text_stats["hits"])
+    PROFILER.count("text_cache_misses", text_stats["misses"])
+    for path in PROFILER.export():
+        print(f"Profile written to {path}")
+
+if PROFILER.enabled:
+    atexit.register(export_profile)
+
+_count = {"system": COUNT_CYCLE[0], "tracker": None}
+
+def count_tracker(deck):
+    # The tracker following the given shoe, for the selected count system.
+    # One is kept while the count is hidden too, for the exact hints.
+    tracker = _count["tracker"]
+    if tracker and (tracker.shoe is not deck or _count["system"] not in (None, tracker.system)):
+        tracker.detach()
+        tracker = None
+    if tracker is None:
+        tracker = CountTracker(deck, _count["system"] or COUNT_CYCLE[0])
+    _count["tracker"] = tracker
+    return tracker
+
+def next_count_system(deck):
+    _count["system"] = COUNT_CYCLE[(COUNT_CYCLE.index(_count["system"]) + 1) % len(COUNT_CYCLE)]
+    return count_tracker(deck)
+
+_round_log = {"recorder": None}
+
+def round_recorder(deck):
+    # The round log recorder, following the given shoe; None when off
+    if ROUND_LOG_FILE is None:
+        return None
+    recorder = _round_log["recorder"]
+    if recorder is None:
+        recorder = _round_log["recorder"] = eventlog.RoundRecorder(ROUND_LOG_FILE)
+        atexit.register(recorder.close)
+    if recorder.shoe is not deck:
+        recorder.attach(deck)
+    return recorder
+
+def render_tooltip(lines):
+    rendered_lines = [render_text(FONT, line, BLACK) for line in lines]
+    max_width = max(line.get_width() for line in rendered_lines) if rendered_lines else 0
+    tooltip = pygame.Surface((max_width + 10, len(rendered_lines) * 20 + 10)).convert()
+    tooltip.fill(WHITE)
+    pygame.draw.rect(tooltip, BLACK, tooltip.get_rect(), 1)
+
+    line_y_offset = 5
+    for line_surface in rendered_lines:
+        tooltip.blit(line_surface, (5, line_y_offset))
+        line_y_offset += 20
+    return tooltip
+
+def scroll_thumb(height):
+    thumb = pygame.Surface((6, height)).convert()
+    thumb.fill(WHITE)
+    return thumb
+
+@PROFILER.timed("draw_table")
+def draw_table(players, current_player_idx, scroll_offset, dealer_is_playing, mouse_pos=(0,0), tracker=None):
+    # Queues the table on TABLE_SCENE; the caller adds buttons and presents
+    scene = TABLE_SCENE
+    layout = table_layout(players, current_player_idx, dealer_is_playing)
+
+    scene.add(card_back(), DECK_POS)
+    scene.add(DECK_LABEL, DECK_LABEL.get_rect(center=(DECK_POS[0] + CARD_WIDTH / 2, DECK_POS[1] + CARD_HEIGHT + 15)).topleft)
+    if tracker and _count["system"]:
+        # Count and EV estimate for the next round, right-aligned under the deck
+        for i, line in enumerate((f"{tracker.name()}  RC {tracker.running:+d}  TC {tracker.true_count():+.1f}",
+                                  f"Next round EV {tracker.ev_estimate():+.2%}")):
+            label = render_text(FONT, line, WHITE)
+            scene.add(label, label.get_rect(topright=(WIDTH - 50, DECK_POS[1] + CARD_HEIGHT + 30 + i * 18)).topleft)
+
+    for idx in layout.visible(scroll_offset, scroll_offset + HEIGHT):
+        player = players[idx]
+        y_offset = layout.tops[idx] - scroll_offset
+        items = PANELS.get(player, idx == layout.highlighted)
+        for surface, (dx, dy) in items:
+            scene.add(surface, (50 + dx, y_offset + dy))
+        text_rect = items[0][0].get_rect(topleft=(50, y_offset))
 
         # Logic to show player history on hover
         if not player.is_dealer and text_rect.collidepoint(mouse_pos):
-            history_summary = []
-            for record in player.history[-5:]:
-                result_str = record.get("result", "N/A")
-                if "Won" in result_str or "Lost" in result_str:
-                    parts = result_str.split()
-                    action = parts[-2]
-                    amount = parts[-1]
-                    history_summary.append(f"{action} {amount}")
-                elif "Push" in result_str:
-                    history_summary.append("Push")
-            
+            history_summary = [summary_line(record) for record in player.recent]
             if history_summary:
-                rendered_lines = [FONT.render(line, True, BLACK) for line in history_summary]
-                max_width = max(line.get_width() for line in rendered_lines) if rendered_lines else 0
-                box_height = len(rendered_lines) * 20 + 10
-                box_width = max_width + 10
-                
+                history_summary.append(player.stats.summary())
+                tooltip = TEXT_CACHE.cached(("tooltip", tuple(history_summary)), lambda: render_tooltip(history_summary))
+
                 # Position the tooltip box ABOVE the player's name text
                 tooltip_x = text_rect.left
-                tooltip_y = text_rect.top - box_height - 5  # 5 pixels of space
+                tooltip_y = text_rect.top - tooltip.get_height() - 5  # 5 pixels of space
                 
                 # Prevent tooltip from going off-screen
                 if tooltip_y < 0:
                     tooltip_y = text_rect.bottom + 5
-
-                tooltip_box = pygame.Rect(tooltip_x, tooltip_y, box_width, box_height)
-                pygame.draw.rect(screen, WHITE, tooltip_box)
-                pygame.draw.rect(screen, BLACK, tooltip_box, 1)
-
-                line_y_offset = tooltip_y + 5
-                for line_surface in rendered_lines:
-                    screen.blit(line_surface, (tooltip_x + 5, line_y_offset))
-                    line_y_offset += 20
-        
-        for card_idx, card in enumerate(player.hand):
-            if player.is_dealer and card_idx == 1 and not player.show_second_card:
-                screen.blit(CARD_BACK, (x_card_offset, y_card_offset))
-            else:
-                if card.image:
-                    screen.blit(card.image, (x_card_offset, y_card_offset))
-            x_card_offset += CARD_WIDTH + 10
-        
-        y_offset = y_card_offset + CARD_HEIGHT + 20
-
-def main_game_loop(multiplayer=False, usernames=None):
+                scene.add(tooltip, (tooltip_x, tooltip_y))
+
+    if layout.bottom > SEAT_VIEW_HEIGHT:
+        # Scroll bar along the left edge, sized to the share of the table
+        # in view
+        thumb_height = max(20, SEAT_VIEW_HEIGHT * SEAT_VIEW_HEIGHT // layout.bottom)
+        thumb = TEXT_CACHE.cached(("scroll_thumb", thumb_height), lambda: scroll_thumb(thumb_height))
+        travel = SEAT_VIEW_HEIGHT - thumb_height
+        scene.add(thumb, (20, scroll_offset * travel // (layout.bottom - SEAT_VIEW_HEIGHT)))
+
+    # Strategy hint for the player whose turn it is
+    dealer = players[-1]
+    if not dealer_is_playing and current_player_idx < len(players) - 1 and dealer.hand:
+        current = players[current_player_idx]
+        hand = current.current_hand()
+        if not current.stopped and len(hand.hand) >= 2 and hand.calculate_score() < 21:
+            # Doubles, splits and surrenders come from the table; the exact
+            # solver, where there is one, refines hit against stop
+            actions = engine.legal_actions(current, hand, TABLE_RULES)
+            action, ev = ADVISOR.advise_player(hand, dealer.hand[0], actions)
+            solver = exact_solver(tracker.shoe.decks) if tracker else None
+            if solver and action in (engine.HIT, engine.STOP):
+                action, ev = solver.advise_player(hand, dealer.hand[0], tracker.unseen)
+            hint = render_text(FONT, f"Hint: {action.title()} (EV {ev:+.2f})", HIGHLIGHT_COLOR)
+            scene.add(hint, hint.get_rect(bottomright=(WIDTH - 50, HEIGHT - 105)).topleft)
+
+def main_game_loop(multiplayer=False, usernames=None, shoe=None, bots=None, autoplay=False):
+    # bots maps usernames to bots.Bot; by default seats named after a bot
+    # ("botbasic", ...) are played by it. autoplay lands every card at once
+    # and skips the End Game click and the results screen, for loadgen.py.
     running = True
     scroll_offset = 0
+    followed_seat = None
     dealer_played = False
     end_game = False
     dealer_is_playing = False
@@ -290,153 +523,281 @@ def main_game_loop(multiplayer=False, usernames=None):
 
     for player in players:
         player.load_data(player.name)
+    if bots is None:
+        bots = {name: bot for name in usernames if (bot := bot_for_username(name, rules=TABLE_RULES))}
 
-    deck = Deck()
+    # The shoe lasts the whole session and is only reshuffled at the cut card
+    deck = shoe or Shoe(SHOE_DECKS, SHOE_PENETRATION, make_rng(SHOE_RNG))
+    deck.start_round()
+    tracker = count_tracker(deck)
     current_player_idx = 0
 
     for player in players:
-        player.bet = get_bet(player.balance, player.name)
+        if player.name in bots:
+            player.bet = bots[player.name].bet(player.balance)
+        else:
+            player.bet = get_bet(player.balance, player.name)
+    TABLE_SCENE.background = table_background()
+    TABLE_SCENE.invalidate()
+    recorder = round_recorder(deck)
+    if recorder:
+        recorder.start_round(players, TABLE_RULES)
     
     mouse_pos = (0,0)
-    game_state = {
-        'all_players': all_participants,
-        'current_player_idx': current_player_idx,
-        'scroll_offset': scroll_offset,
-        'dealer_is_playing': dealer_is_playing,
-        'mouse_pos': mouse_pos
-    }
+    animator = ANIMATOR
+    animator.flights = []
+    now = pygame.time.get_ticks()
 
+    # The opening deal is queued as staggered flights; each card joins its
+    # hand when it lands. The dealer's hole card is dealt face down, so it
+    # flies as a card back (None) and is only counted once it is turned.
     for i in range(2):
         for p_idx, player in enumerate(all_participants):
-            new_card = deck.draw()
-            if new_card:
-                end_pos = get_player_card_pos(all_participants, p_idx, len(player.hand), current_player_idx, dealer_is_playing, scroll_offset)
-                animate_card_deal(game_state, new_card, DECK_POS, end_pos)
-                player.hit(new_card)
+            end_pos = get_player_card_pos(all_participants, p_idx, i, current_player_idx, dealer_is_playing, scroll_offset)
+            delay = (i * len(all_participants) + p_idx) * DEAL_STAGGER_MS
+            if i == 1 and player.is_dealer:
+                hole_card = deck.draw(face_up=False)
+                animator.schedule(None, DECK_POS, end_pos, now, delay, lambda _: dealer.hit(hole_card))
+            else:
+                animator.schedule(deck.draw(), DECK_POS, end_pos, now, delay, player.hit)
 
-    for player in players:
-        if player.calculate_score() == 21:
-            player.blackjack = True
+    def advance_player():
+        nonlocal current_player_idx
+        if len(players) > 1:
+            current_player_idx = (current_player_idx + 1) % len(players)
+
+    def log_action(player, action):
+        if recorder:
+            recorder.action(player, action)
+
+    def deal_to(player, hand, delay=0):
+        # Flies a card to one of the current player's hands; the turn moves
+        # on once the player's last hand is finished
+        def land(card):
+            engine.take_card(player, hand, card, TABLE_RULES)
+            if player.stopped:
+                advance_player()
+        end_pos = get_player_card_pos(all_participants, current_player_idx, len(hand.hand), current_player_idx,
+                                      dealer_is_playing, scroll_offset, player.hands.index(hand))
+        animator.schedule(deck.draw(), DECK_POS, end_pos, pygame.time.get_ticks(), delay, on_land=land)
 
     def player_hit():
-        nonlocal current_player_idx
         player = players[current_player_idx]
-        if not player.stopped and player.calculate_score() < 21:
-            new_card = deck.draw()
-            if new_card:
-                end_pos = get_player_card_pos(all_participants, current_player_idx, len(player.hand), current_player_idx, dealer_is_playing, scroll_offset)
-                animate_card_deal(game_state, new_card, DECK_POS, end_pos)
-                player.hit(new_card)
-            if player.calculate_score() >= 21:
-                player.stopped = True
-                if len(players) > 1:
-                    current_player_idx = (current_player_idx + 1) % len(players)
+        if animator.busy():
+            return
+        if not player.stopped and engine.can_hit(player.current_hand(), TABLE_RULES):
+            log_action(player, engine.HIT)
+            deal_to(player, player.current_hand())
 
     def player_stop():
-        nonlocal current_player_idx
-        players[current_player_idx].stopped = True
-        if len(players) > 1:
-            current_player_idx = (current_player_idx + 1) % len(players)
+        if animator.busy():
+            return
+        player = players[current_player_idx]
+        # Standing on 21 or more is not a decision; the engine does it itself
+        if player.current_hand().calculate_score() < 21:
+            log_action(player, engine.STOP)
+        engine.finish_hand(player, player.current_hand())
+        if player.stopped:
+            advance_player()
+
+    def player_double():
+        player = players[current_player_idx]
+        hand = player.current_hand()
+        if not animator.busy() and engine.can_double(player, hand, TABLE_RULES):
+            log_action(player, engine.DOUBLE)
+            hand.doubled = True
+            deal_to(player, hand)
+
+    def player_split():
+        player = players[current_player_idx]
+        hand = player.current_hand()
+        if not animator.busy() and engine.can_split(player, hand, TABLE_RULES):
+            log_action(player, engine.SPLIT)
+            new_hand = engine.split_hand(player, hand)
+            deal_to(player, hand)
+            deal_to(player, new_hand, DEAL_STAGGER_MS)
+
+    def player_surrender():
+        player = players[current_player_idx]
+        if not animator.busy() and engine.can_surrender(player, player.current_hand(), TABLE_RULES):
+            log_action(player, engine.SURRENDER)
+            engine.surrender(player, player.current_hand())
+            advance_player()
+
+    def player_insure():
+        player = players[current_player_idx]
+        if not animator.busy() and engine.can_insure(player, dealer.hand[0], TABLE_RULES):
+            log_action(player, engine.INSURANCE)
+            engine.insure(player)
 
     def trigger_end_game():
         nonlocal end_game
         end_game = True
 
+    def dealer_land(card):
+        nonlocal dealer_ready_at
+        dealer.hit(card)
+        dealer_ready_at = pygame.time.get_ticks() + (0 if animator.fast else DEALER_PAUSE_MS)
+
     hit_button = Button(WIDTH - 150, HEIGHT - 100, 100, 50, "Hit", player_hit)
     stop_button = Button(WIDTH - 150, HEIGHT - 40, 100, 50, "Stop", player_stop)
+    # Shown only while the rules allow them for the hand being played
+    action_buttons = {
+        engine.DOUBLE: Button(WIDTH - 260, HEIGHT - 100, 100, 50, "Double", player_double),
+        engine.SPLIT: Button(WIDTH - 260, HEIGHT - 40, 100, 50, "Split", player_split),
+        engine.SURRENDER: Button(WIDTH - 370, HEIGHT - 100, 100, 50, "Surrender", player_surrender),
+    }
+    insurance_button = Button(WIDTH - 370, HEIGHT - 40, 100, 50, "Insurance", player_insure)
+    bot_moves = {engine.HIT: player_hit, engine.STOP: player_stop, engine.DOUBLE: player_double,
+                 engine.SPLIT: player_split, engine.SURRENDER: player_surrender}
     end_game_button = Button(WIDTH // 2 - 50, HEIGHT - 60, 100, 40, "End Game", trigger_end_game)
+    dealer_ready_at = 0
+    bot_ready_at = None
 
     while running:
         clock.tick(FPS)
+        PROFILER.frame()
+        now = pygame.time.get_ticks()
+        if autoplay:
+            animator.skip(now)
+            dealer_ready_at = 0
+        with PROFILER.section("animate"):
+            animator.update(now)
         all_players_stopped = all(p.stopped for p in players)
+        extra_buttons = []
+        if not all_players_stopped and dealer.hand and not animator.busy():
+            current = players[current_player_idx]
+            actions = engine.legal_actions(current, current.current_hand(), TABLE_RULES)
+            extra_buttons = [button for action, button in action_buttons.items() if action in actions]
+            if engine.can_insure(current, dealer.hand[0], TABLE_RULES):
+                extra_buttons.append(insurance_button)
         
-        mouse_pos = pygame.mouse.get_pos()
-        game_state['current_player_idx'] = current_player_idx
-        game_state['dealer_is_playing'] = dealer_is_playing
-        game_state['mouse_pos'] = mouse_pos
+        with PROFILER.section("events"):
+            mouse_pos = pygame.mouse.get_pos()
+            wanted_scroll = scroll_offset
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            if not all_players_stopped:
-                hit_button.handle_event(event)
-                stop_button.handle_event(event)
-            if dealer_played:
-                end_game_button.handle_event(event)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    quit_game()
+                if event.type == pygame.MOUSEWHEEL:
+                    wanted_scroll -= event.y * SCROLL_STEP
+                if event.type == pygame.KEYDOWN:
+                    # [SPACE] lands every card in flight, [F] toggles fast dealing,
+                    # [C] switches the count system (or hides the count)
+                    if event.key == pygame.K_SPACE:
+                        animator.skip(now)
+                        dealer_ready_at = 0
+                    elif event.key == pygame.K_f:
+                        animator.fast = not animator.fast
+                    elif event.key == pygame.K_c:
+                        tracker = next_count_system(deck)
+                    elif event.key == pygame.K_PAGEUP:
+                        wanted_scroll -= SEAT_VIEW_HEIGHT // 2
+                    elif event.key == pygame.K_PAGEDOWN:
+                        wanted_scroll += SEAT_VIEW_HEIGHT // 2
+                if not all_players_stopped:
+                    hit_button.handle_event(event)
+                    stop_button.handle_event(event)
+                    for button in extra_buttons:
+                        button.handle_event(event)
+                if dealer_played:
+                    end_game_button.handle_event(event)
         
-        if not all_players_stopped:
-            while players[current_player_idx].stopped and not all(p.stopped for p in players):
-                current_player_idx = (current_player_idx + 1) % len(players)
+        with PROFILER.section("turns"):
+            if not all_players_stopped:
+                while players[current_player_idx].stopped and not all(p.stopped for p in players):
+                    current_player_idx = (current_player_idx + 1) % len(players)
 
-        if all_players_stopped and not dealer_played:
-            if not dealer_is_playing:
-                dealer_is_playing = True
-                dealer.show_second_card = True
+                # A bot seat presses its own buttons once the cards have landed
+                bot = bots.get(players[current_player_idx].name)
+                if bot and not animator.busy():
+                    if bot_ready_at is None:
+                        bot_ready_at = now + (0 if autoplay or animator.fast else BOT_THINK_MS)
+                    elif now >= bot_ready_at:
+                        bot_ready_at = None
+                        current = players[current_player_idx]
+                        hand = current.current_hand()
+                        actions = engine.legal_actions(current, hand, TABLE_RULES)
+                        bot_moves.get(bot.choose(hand, dealer.hand[0], actions), player_stop)()
+
+            if all_players_stopped and not dealer_played and not animator.busy():
+                if not dealer_is_playing:
+                    dealer_is_playing = True
+                    dealer.show_second_card = True
+                    deck.reveal(dealer.hand[1])
+                    # Pause to make dealer's turn visible
+                    dealer_ready_at = now + (0 if animator.fast else DEALER_PAUSE_MS)
             
-            dealer_must_hit = dealer.calculate_score() < 17 or \
-                              (dealer.calculate_score() == 17 and any(c.rank == 'ace' for c in dealer.hand))
-            
-            if dealer_must_hit:
-                pygame.time.wait(400) # Pause to make dealer's turn visible
-                new_card = deck.draw()
-                if new_card:
-                    end_pos = get_player_card_pos(all_participants, len(players), len(dealer.hand), current_player_idx, True, scroll_offset)
-                    animate_card_deal(game_state, new_card, DECK_POS, end_pos)
-                    dealer.hit(new_card)
-            else:
-                if dealer.calculate_score() == 21 and len(dealer.hand) == 2:
-                    dealer.blackjack = True
-                dealer_played = True
-
-        draw_table(all_participants, current_player_idx, scroll_offset, dealer_is_playing, mouse_pos)
+                if now >= dealer_ready_at:
+                    if engine.dealer_must_hit(dealer, TABLE_RULES):
+                        new_card = deck.draw()
+                        end_pos = get_player_card_pos(all_participants, len(players), len(dealer.hand), current_player_idx, True, scroll_offset)
+                        animator.schedule(new_card, DECK_POS, end_pos, now, on_land=dealer_land)
+                    else:
+                        engine.finish_dealer(dealer)
+                        dealer_played = True
+
+        # The table scrolls to each seat as its turn comes; the wheel and
+        # [PGUP]/[PGDN] move it freely until the turn passes on. Cards in
+        # the air move with the table.
+        layout = table_layout(all_participants, current_player_idx, dealer_is_playing)
+        if layout.highlighted != followed_seat:
+            followed_seat = layout.highlighted
+            wanted_scroll = layout.follow(followed_seat, wanted_scroll, SEAT_VIEW_HEIGHT)
+        wanted_scroll = layout.clamp(wanted_scroll, SEAT_VIEW_HEIGHT)
+        if wanted_scroll != scroll_offset:
+            animator.shift(0, scroll_offset - wanted_scroll)
+            scroll_offset = wanted_scroll
+
+        draw_table(all_participants, current_player_idx, scroll_offset, dealer_is_playing, mouse_pos, tracker)
         if not all_players_stopped:
-            hit_button.draw(screen)
-            stop_button.draw(screen)
+            TABLE_SCENE.add(hit_button.image, hit_button.rect.topleft)
+            TABLE_SCENE.add(stop_button.image, stop_button.rect.topleft)
+            for button in extra_buttons:
+                TABLE_SCENE.add(button.image, button.rect.topleft)
         
         if dealer_played:
-            end_game_button.draw(screen)
+            TABLE_SCENE.add(end_game_button.image, end_game_button.rect.topleft)
+        for card, pos in animator.positions(now):
+            TABLE_SCENE.add(card_image(card) if card else card_back(), pos)
 
-        pygame.display.flip()
+        if PROFILER.enabled:
+            overlay = profiler_overlay()
+            TABLE_SCENE.add(overlay, (10, HEIGHT - overlay.get_height() - 10))
+        with PROFILER.section("present"):
+            TABLE_SCENE.present()
 
-        if end_game and dealer_played:
+        if (end_game or autoplay) and dealer_played:
             running = False
 
     dealer_score = dealer.calculate_score()
     results = []
     for player in players:
-        player_score = player.calculate_score()
-        res_text = ""
-        if player_score > 21:
-            player.balance -= player.bet
-            res_text = f"Bust! Lost {player.bet}"
-        elif dealer.blackjack and not player.blackjack:
-             player.balance -= player.bet
-             res_text = f"Dealer Black Jack! Lost {player.bet}"
-        elif dealer_score > 21 or player_score > dealer_score:
-            win_amount = int(player.bet * 1.5) if player.blackjack else player.bet
-            player.balance += win_amount
-            res_text = f"{'Black Jack! ' if player.blackjack else ''}Won {win_amount}"
-        elif player_score == dealer_score:
-            if player.blackjack and not dealer.blackjack:
-                win_amount = int(player.bet * 1.5)
-                player.balance += win_amount
-                res_text = f"Black Jack! Won {win_amount}"
-            else:
-                res_text = "Push"
-        else:
-            player.balance -= player.bet
-            res_text = f"Lost {player.bet}"
-        
-        player.history.append({"bet": player.bet, "result": res_text, "balance": player.balance})
-        player.save_data(player.name.split(" (Split)")[0])
-        results.append((player.name, f"{player_score} | {res_text} | Balance: {player.balance}"))
+        hands, insurance = engine.settle_player(player, dealer, TABLE_RULES)
+        if recorder:
+            recorder.settle(player, hands, insurance)
+        for i, (hand, outcome, amount) in enumerate(hands):
+            # Insurance is recorded with the first hand
+            recorded = amount + (insurance if i == 0 else 0)
+            player.balance += recorded
+            player.record_round(outcome, recorded, hand.stake())
+        for i, (hand, outcome, amount) in enumerate(hands):
+            name = f"{player.name} (Hand {i + 1})" if len(hands) > 1 else player.name
+            res_text = engine.result_text(outcome, amount)
+            if player.insurance and i == 0:
+                res_text += f" | Insurance {insurance:+d}"
+            results.append((name, f"{hand.calculate_score()} | {res_text} | Balance: {player.balance}"))
+    if recorder:
+        recorder.end_round()
+        recorder.flush()
+    save_round(players)
+    if autoplay:
+        return
     
     results.append(("Dealer", f"Score: {dealer_score}"))
 
     show_results = True
     def go_to_menu(): nonlocal show_results; show_results = False
-    def quit_game(): pygame.quit(); exit()
 
     button_width, button_spacing = 120, 20
     total_buttons_width = button_width * 2 + button_spacing
@@ -445,13 +806,12 @@ def main_game_loop(multiplayer=False, usernames=None):
     exit_button = Button(start_x + button_width + button_spacing, HEIGHT - 100, button_width, 50, "Exit", quit_game)
 
     while show_results:
-        if GAME_BG: screen.blit(GAME_BG, (0, 0)); screen.blit(OVERLAY, (0, 0))
-        else: screen.fill(BLACK)
+        screen.blit(table_background(), (0, 0))
         
         y_res_offset = 100
         for name, result in results:
             # Use FONT_MEDIUM for the results screen for consistency
-            text = FONT_MEDIUM.render(f"{name}: {result}", True, WHITE)
+            text = render_text(FONT_MEDIUM, f"{name}: {result}", WHITE)
             screen.blit(text, (WIDTH // 2 - text.get_width() // 2, y_res_offset))
             y_res_offset += 50
         
@@ -460,58 +820,140 @@ def main_game_loop(multiplayer=False, usernames=None):
         menu_button.draw(screen)
         exit_button.draw(screen)
         pygame.display.flip()
+        clock.tick(FPS)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT: quit_game()
             menu_button.handle_event(event)
             exit_button.handle_event(event)
 
+def replay_round(logged, speed=1.0):
+    # Steps through a logged round (eventlog.read_round) on the table, one
+    # card at a time. [RIGHT]/[LEFT] step, [SPACE] pauses, [+]/[-] change
+    # the speed, [ESC] leaves.
+    players = [Player(name) for name in logged.names]
+    dealer = Player("Dealer")
+    participants = players + [dealer]
+    steps = []
+    watch = lambda: steps.append([eventlog.snapshot(p) for p in participants])
+    eventlog.replay_round(logged, players=players, dealer=dealer, watch=watch)
+    watch()
+
+    TABLE_SCENE.background = table_background()
+    TABLE_SCENE.invalidate()
+    index, shown, playing = 0, None, True
+    next_step_at = pygame.time.get_ticks()
+    while True:
+        clock.tick(FPS)
+        now = pygame.time.get_ticks()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    playing = not playing
+                elif event.key == pygame.K_RIGHT:
+                    index, playing = min(index + 1, len(steps) - 1), False
+                elif event.key == pygame.K_LEFT:
+                    index, playing = max(index - 1, 0), False
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    speed *= 2
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    speed /= 2
+        if playing and now >= next_step_at:
+            index = min(index + 1, len(steps) - 1)
+            next_step_at = now + REPLAY_STEP_MS / speed
+        if index != shown:
+            for participant, state in zip(participants, steps[index]):
+                eventlog.restore(participant, state)
+            shown = index
+        current_idx = next((i for i, p in enumerate(players) if not p.stopped), len(players))
+        layout = table_layout(participants, current_idx, dealer.show_second_card)
+        draw_table(participants, current_idx, layout.follow(layout.highlighted, 0, SEAT_VIEW_HEIGHT),
+                   dealer.show_second_card)
+        status = render_text(FONT, f"Replay of round {logged.number}  step {index + 1}/{len(steps)}  x{speed:g}"
+                                   f"{'' if playing else '  paused'}", HIGHLIGHT_COLOR)
+        TABLE_SCENE.add(status, (50, 15))
+        TABLE_SCENE.present()
+
 # Player Data Functions
-def get_all_usernames():
-    if not os.path.exists(PLAYER_DATA_FILE): return []
-    with open(PLAYER_DATA_FILE, "r") as f:
-        try: data = json.load(f); return list(data.keys())
-        except json.JSONDecodeError: return []
+# Profiles live in a SQLite store (storage.py); the old JSON file is only
+# read once, to migrate it. A write-behind cache (profile_cache.py) sits in
+# front of it, so rounds are written to disk in batches
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = ProfileCache(PlayerStore(PLAYER_DB_FILE, PLAYER_DATA_FILE))
+        # Last line of defence if the game exits some other way
+        atexit.register(flush_player_data)
+    return _store
+
+@PROFILER.timed("flush_player_data")
+def flush_player_data():
+    if _store is not None:
+        _store.flush()
+
+def quit_game():
+    flush_player_data()
+    pygame.quit()
+    exit()
 
 def load_player_data(username):
-    if not os.path.exists(PLAYER_DATA_FILE): return {"balance": 20000, "history": []}
-    with open(PLAYER_DATA_FILE, "r") as f:
-        try: data = json.load(f)
-        except json.JSONDecodeError: data = {}
-    return data.get(username, {"balance": 20000, "history": []})
+    return get_store().load(username)
 
 def save_player_data(username, player_data):
-    data = {}
-    if os.path.exists(PLAYER_DATA_FILE):
-        with open(PLAYER_DATA_FILE, "r") as f:
-            try: data = json.load(f)
-            except json.JSONDecodeError: pass
-    data[username] = player_data
-    with open(PLAYER_DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    get_store().save(username, player_data)
+
+@PROFILER.timed("save_round")
+def save_round(players):
+    # One transaction for every player at the table
+    get_store().save_many([(player.name, player.profile()) for player in players])
+    for player in players:
+        player.pending = []
 
 # Utility functions
 def get_usernames(num_players):
+    # Under the prompt: the top players while the input is empty, then the
+    # names starting with what has been typed. [TAB] takes the highlighted
+    # name, [UP]/[DOWN] move the highlight.
     usernames = []
     current_input = ""
-    existing_users = get_all_usernames()
+    directory = get_store()
 
     for i in range(num_players):
         active = True
+        queried = None
         while active:
-            if GAME_BG: screen.blit(GAME_BG, (0, 0)); screen.blit(OVERLAY, (0, 0))
-            else: screen.fill(BLACK)
-
-            prompt = FONT.render(f"Player {i+1}, enter username (letters only, max 10): {current_input}", True, WHITE)
+            if queried != current_input:
+                # The directory is only asked again when the input changes
+                if current_input:
+                    title = "Matching players"
+                    entries = directory.search(current_input.lower(), USERNAME_SUGGESTIONS)
+                else:
+                    title = "Top players"
+                    entries = directory.leaderboard("balance", USERNAME_SUGGESTIONS)
+                queried, selected = current_input, 0
+
+            screen.blit(table_background(), (0, 0))
+
+            prompt = render_text(FONT, f"Player {i+1}, enter username (letters only, max 10): {current_input}", WHITE)
             screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 2 - 40))
 
-            if existing_users:
-                user_list_text = FONT.render("Existing Users: " + ", ".join(existing_users), True, WHITE)
-                screen.blit(user_list_text, (WIDTH // 2 - user_list_text.get_width() // 2, HEIGHT - 60))
+            if entries:
+                heading = render_text(FONT, f"{title} ([TAB] to pick, [UP]/[DOWN] to choose)", WHITE)
+                screen.blit(heading, (WIDTH // 2 - heading.get_width() // 2, HEIGHT // 2))
+                for row, entry in enumerate(entries):
+                    line = (f"{entry['name']}  |  Balance: {entry['balance']}  |  Rounds: {entry['rounds']}"
+                            f"  |  Net: {entry['net']:+d}")
+                    text = render_text(FONT, line, HIGHLIGHT_COLOR if row == selected else WHITE)
+                    screen.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 + 30 + row * 22))
 
             pygame.display.flip()
+            clock.tick(FPS)
             for event in pygame.event.get():
-                if event.type == pygame.QUIT: pygame.quit(); exit()
+                if event.type == pygame.QUIT: quit_game()
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_RETURN and current_input:
                         usernames.append(current_input.lower())
@@ -519,6 +961,12 @@ def get_usernames(num_players):
                         active = False
                     elif event.key == pygame.K_BACKSPACE:
                         current_input = current_input[:-1]
+                    elif event.key == pygame.K_TAB and entries:
+                        current_input = entries[selected]["name"]
+                    elif event.key == pygame.K_UP and entries:
+                        selected = (selected - 1) % len(entries)
+                    elif event.key == pygame.K_DOWN and entries:
+                        selected = (selected + 1) % len(entries)
                     elif len(current_input) < 10 and event.unicode.isalpha():
                         current_input += event.unicode
     return usernames
@@ -526,14 +974,14 @@ def get_usernames(num_players):
 def get_number_of_players():
     num_players_str = ""
     while True:
-        if GAME_BG: screen.blit(GAME_BG, (0, 0)); screen.blit(OVERLAY, (0, 0))
-        else: screen.fill(BLACK)
+        screen.blit(table_background(), (0, 0))
 
-        prompt = FONT.render(f"Enter number of players (2-6): {num_players_str}", True, WHITE)
+        prompt = render_text(FONT, f"Enter number of players (2-6): {num_players_str}", WHITE)
         screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 2))
         pygame.display.flip()
+        clock.tick(FPS)
         for event in pygame.event.get():
-            if event.type == pygame.QUIT: pygame.quit(); exit()
+            if event.type == pygame.QUIT: quit_game()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN and num_players_str.isdigit() and 2 <= int(num_players_str) <= 6:
                     return int(num_players_str)
@@ -545,15 +993,15 @@ def get_number_of_players():
 def get_bet(player_balance, player_name):
     bet_input = ""
     while True:
-        if GAME_BG: screen.blit(GAME_BG, (0, 0)); screen.blit(OVERLAY, (0, 0))
-        else: screen.fill(BLACK)
+        screen.blit(table_background(), (0, 0))
 
         prompt_text = f"{player_name} | Balance: {player_balance} | Enter your bet: {bet_input}"
-        prompt = FONT.render(prompt_text, True, WHITE)
+        prompt = render_text(FONT, prompt_text, WHITE)
         screen.blit(prompt, (WIDTH // 2 - prompt.get_width() // 2, HEIGHT // 2))
         pygame.display.flip()
+        clock.tick(FPS)
         for event in pygame.event.get():
-            if event.type == pygame.QUIT: pygame.quit(); exit()
+            if event.type == pygame.QUIT: quit_game()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN and bet_input.isdigit() and 1 <= int(bet_input) <= player_balance:
                     return int(bet_input)
@@ -565,26 +1013,36 @@ def get_bet(player_balance, player_name):
 # Main Menu
 def main_menu():
     running = True
+    shoe = Shoe(SHOE_DECKS, SHOE_PENETRATION, make_rng(SHOE_RNG))
     while running:
-        if MAIN_MENU_BG:
-            screen.blit(MAIN_MENU_BG, (0, 0))
-            screen.blit(OVERLAY, (0, 0))
+        background = menu_background()
+        if background:
+            screen.blit(background, (0, 0))
         else:
             screen.fill(BLACK)
 
-        title_text = FONT_LARGE.render("Black Jack Game", True, WHITE)
+        title_text = render_text(FONT_LARGE, "Black Jack Game", WHITE)
         screen.blit(title_text, (WIDTH // 2 - title_text.get_width() // 2, HEIGHT // 4))
 
-        single_player_text = FONT.render("Press [1] for Single Player", True, WHITE)
+        single_player_text = render_text(FONT, "Press [1] for Single Player", WHITE)
         screen.blit(single_player_text, (WIDTH // 2 - single_player_text.get_width() // 2, HEIGHT // 2 - 30))
 
-        multiplayer_text = FONT.render("Press [2] for Multiplayer", True, WHITE)
+        multiplayer_text = render_text(FONT, "Press [2] for Multiplayer", WHITE)
         screen.blit(multiplayer_text, (WIDTH // 2 - multiplayer_text.get_width() // 2, HEIGHT // 2 + 30))
 
-        quit_text = FONT.render("Press [ESC] to Quit", True, WHITE)
+        quit_text = render_text(FONT, "Press [ESC] to Quit", WHITE)
         screen.blit(quit_text, (WIDTH // 2 - quit_text.get_width() // 2, HEIGHT // 2 + 90))
 
         pygame.display.flip()
+        clock.tick(FPS)
+
+        # Startup timing: first menu frame, then all card faces decoded
+        STARTUP_TIMES.setdefault("menu_ms", (time.perf_counter() - STARTUP_BEGIN) * 1000)
+        CARD_IMAGES.poll()
+        if CARD_IMAGES.ready_ms is not None and "cards_ms" not in STARTUP_TIMES:
+            STARTUP_TIMES["cards_ms"] = (CARD_IMAGES.started - STARTUP_BEGIN) * 1000 + CARD_IMAGES.ready_ms
+            if "--startup-report" in sys.argv:
+                report_startup()
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
@@ -592,14 +1050,22 @@ def main_menu():
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1:
                     usernames = get_usernames(1)
-                    if usernames: main_game_loop(multiplayer=False, usernames=usernames)
+                    if usernames: main_game_loop(multiplayer=False, usernames=usernames, shoe=shoe)
                 elif event.key == pygame.K_2:
                     num_players = get_number_of_players()
                     if num_players:
                         usernames = get_usernames(num_players)
-                        if usernames: main_game_loop(multiplayer=True, usernames=usernames)
+                        if usernames: main_game_loop(multiplayer=True, usernames=usernames, shoe=shoe)
 
 # Entry Point
 if __name__ == "__main__":
-    main_menu()
+    if _args.replay is not None:
+        try:
+            logged = eventlog.read_round(_args.replay, _args.round)
+        except (OSError, ValueError, IndexError, struct.error) as e:
+            _rules_parser.error(f"cannot replay {_args.replay}: {e}")
+        replay_round(logged, _args.speed)
+    else:
+        main_menu()
+    flush_player_data()
     pygame.quit()
\ No newline at end of file
@@ -0,0 +1,67 @@
+import random
+
+import engine
+
+# Scripted players. A bot answers the two questions the game otherwise asks
+# a person: how much to bet (get_bet) and what to do with a hand (hit, stop,
+# or double, split and surrender when its strategy knows them). Bots are
+# also engine strategies, so the same object can be passed to
+# engine.play_player.
+#
+# In the game window, a seat whose username is one of BOT_USERNAMES is
+# played by that bot, e.g. enter "botbasic" as a player name.
+
+DEFAULT_BOT_BET = 100
+BASIC = "basic"
+STAND = "stand"
+RANDOM = "random"
+BOT_KINDS = [BASIC, STAND, RANDOM]
+BOT_USERNAMES = {"bot" + kind: kind for kind in BOT_KINDS}
+
+
+class Bot:
+    def __init__(self, strategy, bet_amount=DEFAULT_BOT_BET):
+        self.strategy = strategy
+        self.bet_amount = bet_amount
+
+    def bet(self, balance):
+        # Flat bets, all-in once the balance runs below the stake
+        return max(1, min(self.bet_amount, balance))
+
+    def decide(self, player, upcard):
+        if player.calculate_score() >= 21:
+            return engine.STOP
+        return self.strategy(player, upcard)
+
+    def choose(self, hand, upcard, actions):
+        choose = getattr(self.strategy, "choose", None)
+        if choose and actions:
+            return choose(hand, upcard, actions)
+        return self.decide(hand, upcard)
+
+    __call__ = decide
+
+
+class RandomStrategy:
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def __call__(self, player, upcard):
+        return engine.HIT if self.rng.random() < 0.5 else engine.STOP
+
+
+def make_bot(kind, bet_amount=DEFAULT_BOT_BET, rng=None, rules=None):
+    if kind == BASIC:
+        from strategy import get_advisor
+        return Bot(get_advisor(rules=rules), bet_amount)
+    if kind == STAND:
+        return Bot(engine.always_stop, bet_amount)
+    if kind == RANDOM:
+        return Bot(RandomStrategy(rng), bet_amount)
+    raise ValueError(f"Unknown bot {kind!r}, expected one of {', '.join(BOT_KINDS)}")
+
+
+def bot_for_username(username, rng=None, rules=None):
+    # The bot that plays this seat in the game window, or None for a person
+    kind = BOT_USERNAMES.get(username)
+    return make_bot(kind, rng=rng, rules=rules) if kind else None
@@ -0,0 +1,184 @@
+import math
+import random
+
+import engine
+import strategy
+
+# Card counting. A CountTracker watches a shoe (engine.Shoe observers) and
+# keeps the running count and the number of unseen cards of each point value
+# up to date as cards are dealt, one table lookup per card, so nothing is
+# ever recounted from the discards. From those it gives the true count and a
+# composition-dependent EV estimate for the next round.
+#
+# Cards dealt face down (the dealer's hole card) are only counted once the
+# shoe reveals them. Until then they are still unseen, as they are to a
+# player at the table.
+#
+# The EV estimate is linear in the shoe's composition: the EV of the full
+# shoe plus, for every point value, how far its share of the unseen cards
+# has moved times its effect of removal (the change in EV from taking one
+# card of that value out of a full shoe, worked out once with strategy.py's
+# recursion).
+
+HI_LO = "hilo"
+KO = "ko"
+OMEGA_II = "omega2"
+# Tag of each rank in engine.RANKS order: 2-9, 10, jack, queen, king, ace
+COUNT_SYSTEMS = {
+    HI_LO: [1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1, -1],
+    KO: [1, 1, 1, 1, 1, 1, 0, 0, -1, -1, -1, -1, -1],
+    OMEGA_II: [1, 1, 2, 2, 2, 1, 0, -1, -2, -2, -2, -2, 0],
+}
+SYSTEM_NAMES = {HI_LO: "Hi-Lo", KO: "KO", OMEGA_II: "Omega II"}
+# Unbalanced systems start below zero so the count ends at zero with the shoe
+UNBALANCED = {KO}
+POINT_VALUES = list(range(2, 12))
+CARDS_PER_DECK = len(engine.RANKS) * len(engine.SUITS)
+# The true count divides by at least a quarter deck so it stays bounded
+MIN_DECKS_LEFT = 0.25
+# simulate_by_count lumps true counts beyond this together
+BUCKET_LIMIT = 8
+
+_removal_effects = {}
+
+
+def deck_counts(decks):
+    # Cards of each point value (2-11) in a full shoe
+    per_deck = [engine.RANK_POINTS.count(points) * len(engine.SUITS) for points in POINT_VALUES]
+    return [count * decks for count in per_deck]
+
+
+def composition_probs(counts):
+    # Counts of each point value as a probability tuple for strategy.py
+    total = sum(counts)
+    return tuple((points, count / total) for points, count in zip(POINT_VALUES, counts) if count)
+
+
+def removal_effects(decks):
+    # (EV of the full shoe, EV change for removing one card of each value)
+    if decks not in _removal_effects:
+        full = deck_counts(decks)
+        base = strategy.round_ev(composition_probs(full))
+        effects = []
+        for i in range(len(POINT_VALUES)):
+            counts = list(full)
+            counts[i] -= 1
+            effects.append(strategy.round_ev(composition_probs(counts)) - base)
+        _removal_effects[decks] = (base, effects)
+    return _removal_effects[decks]
+
+
+class CountTracker:
+    def __init__(self, shoe, system=HI_LO):
+        if system not in COUNT_SYSTEMS:
+            raise ValueError(f"Unknown count system {system!r}, expected one of {', '.join(COUNT_SYSTEMS)}")
+        self.shoe = shoe
+        self.system = system
+        rank_tags = COUNT_SYSTEMS[system]
+        self.tags = [rank_tags[engine.RANKS.index(card.rank)] for card in engine.CARDS]
+        self.full = deck_counts(shoe.decks)
+        self.total = sum(self.full)
+        self.initial_count = 4 - 4 * shoe.decks if system in UNBALANCED else 0
+        self.base_ev, self.effects = removal_effects(shoe.decks)
+        self.shoe_shuffled()
+        # Joining mid-shoe: count what has already been dealt, once
+        for card_id in shoe.cards[:shoe.pos]:
+            self.count_card(engine.CARDS[card_id])
+        shoe.observers.append(self)
+
+    def detach(self):
+        if self in self.shoe.observers:
+            self.shoe.observers.remove(self)
+
+    # Shoe observer
+    def shoe_shuffled(self):
+        self.running = self.initial_count
+        self.unseen = list(self.full)
+        self.seen = 0
+
+    def card_dealt(self, card, face_up=True):
+        if face_up:
+            self.count_card(card)
+
+    def card_revealed(self, card):
+        self.count_card(card)
+
+    def count_card(self, card):
+        self.running += self.tags[card.id]
+        self.unseen[card.points - 2] -= 1
+        self.seen += 1
+
+    # Readings
+    def name(self):
+        return SYSTEM_NAMES[self.system]
+
+    def decks_left(self):
+        return (self.total - self.seen) / CARDS_PER_DECK
+
+    def true_count(self):
+        return self.running / max(self.decks_left(), MIN_DECKS_LEFT)
+
+    def probs(self):
+        # The unseen cards as a probability tuple for strategy.py
+        return composition_probs(self.unseen)
+
+    def ev_estimate(self):
+        # Estimated EV per unit bet of the next round with the best play
+        left = self.total - self.seen
+        if not left:
+            return self.base_ev
+        ev = self.base_ev
+        for full, unseen, effect in zip(self.full, self.unseen, self.effects):
+            ev += (full / self.total - unseen / left) * self.total * effect
+        return ev
+
+    def summary(self):
+        return f"{self.name()} RC {self.running:+d}  TC {self.true_count():+.1f}  EV {self.ev_estimate():+.2%}"
+
+
+def simulate_by_count(n, system=HI_LO, advisor=None, seed=None, decks=engine.DEFAULT_DECKS,
+                      penetration=engine.DEFAULT_PENETRATION, bet=engine.DEFAULT_SIM_BET):
+    # Plays n heads-up rounds from one shoe and groups the results by the
+    # true count (rounded, capped at BUCKET_LIMIT) before each deal:
+    # {true count: [result, summed EV estimate]}
+    advisor = advisor or strategy.get_advisor()
+    shoe = engine.Shoe(decks, penetration, random.Random(seed))
+    tracker = CountTracker(shoe, system)
+    player, dealer = engine.Player("Sim"), engine.Player("Dealer")
+    player.bet = bet
+    player.balance = math.inf
+    buckets = {}
+    for _ in range(n):
+        shoe.start_round()
+        true_count = max(-BUCKET_LIMIT, min(BUCKET_LIMIT, round(tracker.true_count())))
+        bucket = buckets.setdefault(true_count, [engine.SimulationResult(bet), 0.0])
+        bucket[1] += tracker.ev_estimate()
+        bucket[0].rounds += 1
+        for _player, outcome, amount in engine.play_round(shoe, [player], dealer, advisor):
+            bucket[0].add(outcome, amount)
+    return buckets
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Simulated EV by true count")
+    parser.add_argument("rounds", type=int, nargs="?", default=200000)
+    parser.add_argument("--system", choices=list(COUNT_SYSTEMS), default=HI_LO)
+    parser.add_argument("--decks", type=int, default=engine.DEFAULT_DECKS)
+    parser.add_argument("--penetration", type=float, default=engine.DEFAULT_PENETRATION)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    buckets = simulate_by_count(args.rounds, args.system, seed=args.seed, decks=args.decks,
+                                penetration=args.penetration)
+    elapsed = time.perf_counter() - start
+    print(f"{SYSTEM_NAMES[args.system]}, {args.decks} decks, basic strategy")
+    print(f"{'TC':>4}{'rounds':>10}{'share':>8}{'EV':>9}{'estimate':>10}")
+    for true_count in sorted(buckets):
+        result, estimates = buckets[true_count]
+        print(f"{true_count:>+4d}{result.rounds:>10}{result.rounds / args.rounds:>8.1%}"
+              f"{result.expected_value():>+9.2%}{estimates / result.rounds:>+10.2%}")
+    print(f"{args.rounds} rounds in {elapsed:.2f}s ({args.rounds / elapsed:,.0f} rounds/s)")
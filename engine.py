@@ -0,0 +1,685 @@
+import math
+import random
+from array import array
+
+from shuffling import DEFAULT_RNG, RNG_KINDS, make_rng
+
+# Headless Black Jack rules. Nothing in here touches pygame, so the same
+# dealing, scoring and settlement code drives both the game window and
+# the bulk round simulator below.
+
+SUITS = ['hearts', 'diamonds', 'clubs', 'spades']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'jack', 'queen', 'king', 'ace']
+STARTING_BALANCE = 20000
+DEFAULT_SIM_BET = 100
+MIN_DECKS, MAX_DECKS = 1, 8
+DEFAULT_DECKS = 6
+DEFAULT_PENETRATION = 0.75
+
+# Shoe reshuffle policies
+CUT_CARD = "cut_card"
+EVERY_ROUND = "every_round"
+
+# Player decisions
+HIT = "hit"
+STOP = "stop"
+DOUBLE = "double"
+SPLIT = "split"
+SURRENDER = "surrender"
+INSURANCE = "insurance"
+
+# When the dealer hits 17: never, soft 17 only, or any 17 holding an ace
+# (the game's own rule, and the default)
+STAND_17 = "s17"
+HIT_SOFT_17 = "h17"
+HIT_17_WITH_ACE = "ace17"
+DEALER_17_RULES = [STAND_17, HIT_SOFT_17, HIT_17_WITH_ACE]
+
+# Settlement outcomes
+BUST = "bust"
+DEALER_BLACKJACK = "dealer_blackjack"
+BLACKJACK = "blackjack"
+WIN = "win"
+PUSH = "push"
+LOSS = "loss"
+SURRENDERED = "surrender"
+# Stored on disk by position (see history.py): only ever append
+OUTCOMES = [BUST, DEALER_BLACKJACK, BLACKJACK, WIN, PUSH, LOSS, SURRENDERED]
+
+
+# Cards are small ints: card_id = suit_index * 13 + rank_index. Point values
+# and ace flags are looked up from tables built once, and the 52 Card
+# objects in CARDS are shared by every deck instead of being rebuilt.
+RANK_POINTS = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11]
+CARD_POINTS = [RANK_POINTS[i % len(RANKS)] for i in range(len(SUITS) * len(RANKS))]
+ACE_RANK = RANKS.index('ace')
+
+
+def card_id(rank, suit):
+    return SUITS.index(suit) * len(RANKS) + RANKS.index(rank)
+
+
+class Card:
+    __slots__ = ('id', 'rank', 'suit', 'points', 'is_ace')
+
+    def __init__(self, rank, suit):
+        self.id = card_id(rank, suit)
+        self.rank = rank
+        self.suit = suit
+        self.points = CARD_POINTS[self.id]
+        self.is_ace = self.id % len(RANKS) == ACE_RANK
+
+    def value(self):
+        return self.points
+
+
+CARDS = [Card(rank, suit) for suit in SUITS for rank in RANKS]
+
+
+class Shoe:
+    # A shoe of 1-8 decks held as a preallocated byte array of card ids with
+    # a moving draw index. Drawing never mutates the array, and the shoe is
+    # meant to live for a whole session: it is only reshuffled at the start
+    # of a round once the cut card has come out (or every round, for the
+    # EVERY_ROUND policy).
+    def __init__(self, decks=DEFAULT_DECKS, penetration=DEFAULT_PENETRATION, rng=None, reshuffle=CUT_CARD):
+        if not MIN_DECKS <= decks <= MAX_DECKS:
+            raise ValueError(f"A shoe holds {MIN_DECKS}-{MAX_DECKS} decks, not {decks}")
+        if not 0 < penetration <= 1:
+            raise ValueError(f"Penetration must be in (0, 1], not {penetration}")
+        if reshuffle not in (CUT_CARD, EVERY_ROUND):
+            raise ValueError(f"Unknown reshuffle policy {reshuffle!r}")
+        self.decks = decks
+        self.reshuffle = reshuffle
+        # Anything with shuffle(seq): random, a random.Random or one of the
+        # sources in shuffling.py
+        self.rng = rng or random
+        self.cards = array('B', range(len(CARDS))) * decks
+        self.cut = max(1, int(len(self.cards) * penetration))
+        self.pos = 0
+        self.shuffles = 0
+        # Observers (e.g. counting.CountTracker) are told about every card as
+        # it is dealt and every shuffle, via card_dealt(card, face_up),
+        # card_revealed(card) and shoe_shuffled()
+        self.observers = []
+        self.shuffle()
+
+    def shuffle(self):
+        self.rng.shuffle(self.cards)
+        self.pos = 0
+        self.shuffles += 1
+        for observer in self.observers:
+            observer.shoe_shuffled()
+
+    def needs_shuffle(self):
+        return self.pos >= self.cut
+
+    def start_round(self):
+        if self.reshuffle == EVERY_ROUND or self.needs_shuffle():
+            self.shuffle()
+
+    def remaining(self):
+        return len(self.cards) - self.pos
+
+    def draw(self, face_up=True):
+        # Running out mid-round only happens with a very deep cut card; the
+        # whole shoe is shuffled back in rather than leaving a hand short.
+        if self.pos >= len(self.cards):
+            self.shuffle()
+        card = CARDS[self.cards[self.pos]]
+        self.pos += 1
+        for observer in self.observers:
+            observer.card_dealt(card, face_up)
+        return card
+
+    def reveal(self, card):
+        # A card dealt face down (the dealer's hole card) is turned over
+        for observer in self.observers:
+            observer.card_revealed(card)
+
+
+class Deck(Shoe):
+    # A single deck dealt to the last card, as the game used originally
+    def __init__(self, rng=None):
+        super().__init__(1, 1.0, rng)
+
+
+class TableRules:
+    # House rules, shared by the game window and the simulators. The
+    # defaults are the rules the game has always played, plus doubling,
+    # splitting, late surrender and insurance.
+    def __init__(self, dealer_17=HIT_17_WITH_ACE, blackjack_payout=1.5, double_after_split=True, max_splits=3,
+                 resplit_aces=False, hit_split_aces=False, surrender=True, insurance=True):
+        if dealer_17 not in DEALER_17_RULES:
+            raise ValueError(f"Unknown dealer rule {dealer_17!r}, expected one of {', '.join(DEALER_17_RULES)}")
+        if blackjack_payout <= 0:
+            raise ValueError(f"Black Jack payout must be positive, not {blackjack_payout}")
+        if max_splits < 0:
+            raise ValueError(f"max_splits must be 0 or more, not {max_splits}")
+        self.dealer_17 = dealer_17
+        self.blackjack_payout = blackjack_payout
+        self.double_after_split = double_after_split
+        self.max_splits = max_splits
+        self.resplit_aces = resplit_aces
+        self.hit_split_aces = hit_split_aces
+        self.surrender = surrender
+        self.insurance = insurance
+
+    def dealer_hits(self, total, soft, has_ace):
+        if total != 17:
+            return total < 17
+        if self.dealer_17 == STAND_17:
+            return False
+        return soft if self.dealer_17 == HIT_SOFT_17 else has_ace
+
+    def key(self):
+        return (self.dealer_17, self.blackjack_payout, self.double_after_split, self.max_splits,
+                self.resplit_aces, self.hit_split_aces, self.surrender, self.insurance)
+
+    def __eq__(self, other):
+        return isinstance(other, TableRules) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+DEFAULT_RULES = TableRules()
+
+
+def add_rules_arguments(parser):
+    group = parser.add_argument_group("table rules")
+    group.add_argument("--dealer-17", choices=DEALER_17_RULES, default=HIT_17_WITH_ACE,
+                       help="s17: dealer stands on 17, h17: hits soft 17, ace17: hits any 17 with an ace")
+    group.add_argument("--blackjack-payout", type=float, default=1.5)
+    group.add_argument("--no-das", action="store_true", help="no doubling after a split")
+    group.add_argument("--max-splits", type=int, default=3)
+    group.add_argument("--resplit-aces", action="store_true")
+    group.add_argument("--hit-split-aces", action="store_true")
+    group.add_argument("--no-surrender", action="store_true")
+    group.add_argument("--no-insurance", action="store_true")
+
+
+def rules_from_args(args):
+    return TableRules(args.dealer_17, args.blackjack_payout, not args.no_das, args.max_splits,
+                      args.resplit_aces, args.hit_split_aces, not args.no_surrender, not args.no_insurance)
+
+
+class Hand:
+    # One hand of cards and the bet riding on it. A Player is its own first
+    # hand; splitting adds plain Hand objects to player.hands instead of
+    # copying the Player. bet is the stake before any double.
+    __slots__ = ('hand', 'total', 'soft_aces', 'has_ace', 'blackjack', 'bet', 'done', 'doubled',
+                 'surrendered', 'from_split', 'split_aces')
+
+    def __init__(self, bet=0):
+        self.bet = bet
+        self.reset()
+
+    def reset(self):
+        self.hand = []
+        self.total = 0
+        self.soft_aces = 0
+        self.has_ace = False
+        self.blackjack = False
+        self.done = False
+        self.doubled = False
+        self.surrendered = False
+        self.from_split = False
+        self.split_aces = False
+
+    def hit(self, card):
+        # The score is kept as a running total with aces counted as 11, plus
+        # how many of those aces can still drop to 1
+        self.hand.append(card)
+        self.total += card.points
+        if card.is_ace:
+            self.soft_aces += 1
+            self.has_ace = True
+        while self.total > 21 and self.soft_aces:
+            self.total -= 10
+            self.soft_aces -= 1
+        # Only the first two cards of an unsplit hand make a Black Jack; a
+        # doubled hand always has three
+        if self.total == 21 and len(self.hand) == 2 and not self.from_split:
+            self.blackjack = True
+
+    def calculate_score(self):
+        return self.total
+
+    def is_soft(self):
+        return self.soft_aces > 0
+
+    def stake(self):
+        return self.bet * 2 if self.doubled else self.bet
+
+    def is_natural(self):
+        return self.total == 21 and len(self.hand) == 2
+
+
+class Player(Hand):
+    # stopped means every one of the player's hands is finished
+    def __init__(self, name):
+        # reset_hand() does Hand's setup, so Hand.__init__ is not called
+        self.name = name
+        self.is_dealer = name == "Dealer"
+        self.balance = STARTING_BALANCE
+        self.bet = 0
+        self.reset_hand()
+
+    def reset_hand(self):
+        # Hand.reset() spelled out, as this runs for every seat every round
+        self.hand = []
+        self.total = 0
+        self.soft_aces = 0
+        self.has_ace = False
+        self.blackjack = False
+        self.done = False
+        self.doubled = False
+        self.surrendered = False
+        self.from_split = False
+        self.split_aces = False
+        self.stopped = False
+        self.show_second_card = False
+        self._hands = None
+        self.active = 0
+        self.insurance = 0
+
+    @property
+    def hands(self):
+        # Built on first use: [self] is a reference cycle, which would leave
+        # every short-lived Player to the garbage collector
+        if self._hands is None:
+            self._hands = [self]
+        return self._hands
+
+    def current_hand(self):
+        return self.hands[self.active]
+
+    def single_hand(self):
+        # True unless the player has split, without building hands
+        return self._hands is None or len(self._hands) == 1
+
+    def committed(self):
+        # Everything at stake this round: every hand plus insurance
+        if len(self.hands) == 1:
+            return self.stake() + self.insurance
+        return sum(hand.stake() for hand in self.hands) + self.insurance
+
+
+# Round rules
+def deal_initial(deck, participants):
+    # Two passes round the table, dealer last, exactly like the game window.
+    # The dealer's second card is the hole card, dealt face down.
+    for i in range(2):
+        for player in participants:
+            player.hit(deck.draw(face_up=not (i == 1 and player.is_dealer)))
+
+
+def dealer_must_hit(dealer, rules=DEFAULT_RULES):
+    return rules.dealer_hits(dealer.total, dealer.soft_aces > 0, dealer.has_ace)
+
+
+def finish_dealer(dealer):
+    if dealer.calculate_score() == 21 and len(dealer.hand) == 2:
+        dealer.blackjack = True
+
+
+def can_hit(hand, rules=DEFAULT_RULES):
+    # Split aces get one card each unless the rules let them be hit
+    return (not hand.done and hand.total < 21
+            and not (hand.split_aces and len(hand.hand) >= 2 and not rules.hit_split_aces))
+
+
+# Actions beyond hit and stop. Each checks the rules and that the balance
+# covers the extra stake.
+def can_double(player, hand, rules=DEFAULT_RULES):
+    return (len(hand.hand) == 2 and not hand.done and not hand.split_aces
+            and (rules.double_after_split or not hand.from_split)
+            and player.committed() + hand.bet <= player.balance)
+
+
+def can_split(player, hand, rules=DEFAULT_RULES):
+    return (len(hand.hand) == 2 and not hand.done and hand.hand[0].points == hand.hand[1].points
+            and len(player.hands) <= rules.max_splits and (rules.resplit_aces or not hand.split_aces)
+            and player.committed() + hand.bet <= player.balance)
+
+
+def can_surrender(player, hand, rules=DEFAULT_RULES):
+    return rules.surrender and len(player.hands) == 1 and len(hand.hand) == 2 and not hand.done
+
+
+def can_insure(player, upcard, rules=DEFAULT_RULES):
+    return (rules.insurance and upcard is not None and upcard.is_ace and not player.insurance
+            and len(player.hands) == 1 and len(player.hand) == 2 and not player.done
+            and player.committed() + player.bet // 2 <= player.balance and player.bet >= 2)
+
+
+def legal_actions(player, hand, rules=DEFAULT_RULES):
+    if hand.done or hand.total >= 21:
+        return []
+    actions = [HIT, STOP] if can_hit(hand, rules) else [STOP]
+    if can_double(player, hand, rules):
+        actions.append(DOUBLE)
+    if can_split(player, hand, rules):
+        actions.append(SPLIT)
+    if can_surrender(player, hand, rules):
+        actions.append(SURRENDER)
+    return actions
+
+
+def finish_hand(player, hand):
+    # Closes a hand and moves on to the player's next open one, if any
+    hand.done = True
+    while player.active < len(player.hands) and player.hands[player.active].done:
+        player.active += 1
+    if player.active == len(player.hands):
+        player.active -= 1
+        player.stopped = True
+
+
+def take_card(player, hand, card, rules=DEFAULT_RULES):
+    # Deals a card to one of the player's hands, closing the hand on 21 or
+    # more, after a double, and on split aces that can be neither hit nor
+    # split again
+    hand.hit(card)
+    if (hand.total >= 21 or hand.doubled
+            or (hand.split_aces and not can_hit(hand, rules) and not can_split(player, hand, rules))):
+        finish_hand(player, hand)
+
+
+def split_hand(player, hand):
+    # Moves the second card to a new hand right after this one; each then
+    # needs a card (take_card)
+    first, second = hand.hand
+    new = Hand(hand.bet)
+    hand.reset()
+    for split in (hand, new):
+        split.from_split = True
+        split.split_aces = first.is_ace
+    hand.hit(first)
+    new.hit(second)
+    player.hands.insert(player.hands.index(hand) + 1, new)
+    return new
+
+
+def surrender(player, hand):
+    hand.surrendered = True
+    finish_hand(player, hand)
+
+
+def insure(player):
+    player.insurance = player.bet // 2
+
+
+def settle(hand, dealer, rules=DEFAULT_RULES):
+    # Returns (outcome, balance change) for one finished hand
+    stake = hand.stake()
+    player_score = hand.calculate_score()
+    dealer_score = dealer.calculate_score()
+    if hand.surrendered:
+        # Late surrender: a dealer Black Jack still takes the whole bet.
+        # Half is lost otherwise, rounded in the house's favour.
+        if dealer.is_natural():
+            return DEALER_BLACKJACK, -stake
+        return SURRENDERED, -(stake - stake // 2)
+    if player_score > 21:
+        return BUST, -stake
+    elif dealer.blackjack and not hand.blackjack:
+        return DEALER_BLACKJACK, -stake
+    elif dealer_score > 21 or player_score > dealer_score:
+        if hand.blackjack:
+            return BLACKJACK, int(stake * rules.blackjack_payout)
+        return WIN, stake
+    elif player_score == dealer_score:
+        if hand.blackjack and not dealer.blackjack:
+            return BLACKJACK, int(stake * rules.blackjack_payout)
+        return PUSH, 0
+    else:
+        return LOSS, -stake
+
+
+def settle_insurance(player, dealer):
+    # Insurance pays 2:1 if the dealer's first two cards make 21
+    if not player.insurance:
+        return 0
+    return 2 * player.insurance if dealer.is_natural() else -player.insurance
+
+
+def settle_player(player, dealer, rules=DEFAULT_RULES):
+    # ([(hand, outcome, balance change)] for every hand, insurance result)
+    return ([(hand,) + settle(hand, dealer, rules) for hand in player.hands],
+            settle_insurance(player, dealer))
+
+
+def result_text(outcome, amount):
+    if outcome == BUST:
+        return f"Bust! Lost {-amount}"
+    elif outcome == DEALER_BLACKJACK:
+        return f"Dealer Black Jack! Lost {-amount}"
+    elif outcome == BLACKJACK:
+        return f"Black Jack! Won {amount}"
+    elif outcome == WIN:
+        return f"Won {amount}"
+    elif outcome == PUSH:
+        return "Push"
+    elif outcome == SURRENDERED:
+        return f"Surrendered, lost {-amount}"
+    return f"Lost {-amount}"
+
+
+# Strategies take (hand, dealer_upcard) and return HIT or STOP. One that
+# also has choose(hand, upcard, actions) is asked that instead, with the
+# legal actions, and may double, split or surrender; one with
+# insurance(player, upcard) is asked whether to insure against an ace.
+# They are plain classes rather than closures so they can be pickled.
+#
+# A recorder (eventlog.RoundRecorder) passed to play_round is told each
+# action as it is applied and the settlement, for the round log.
+class StandOn:
+    def __init__(self, threshold=17):
+        self.threshold = threshold
+
+    def __call__(self, player, upcard):
+        return HIT if player.calculate_score() < self.threshold else STOP
+
+
+def always_stop(player, upcard):
+    return STOP
+
+
+def play_player(deck, player, upcard, strategy, rules=DEFAULT_RULES, recorder=None):
+    # Mirrors the game window: no hitting on 21 or more, and an action the
+    # rules do not allow right now stands
+    choose = getattr(strategy, "choose", None)
+    insurance = getattr(strategy, "insurance", None)
+    if insurance and can_insure(player, upcard, rules) and insurance(player, upcard):
+        insure(player)
+        if recorder:
+            recorder.action(player, INSURANCE)
+    if choose is None:
+        # Hit or stop only, so the player keeps the one hand
+        while player.total < 21:
+            action = HIT if strategy(player, upcard) == HIT else STOP
+            if action == HIT:
+                player.hit(deck.draw())
+            if recorder:
+                recorder.action(player, action)
+            if action == STOP:
+                break
+        player.done = player.stopped = True
+        return
+    while not player.stopped:
+        hand = player.hands[player.active]
+        if hand.total >= 21:
+            finish_hand(player, hand)
+            continue
+        # The legal actions are worked out once per decision
+        actions = legal_actions(player, hand, rules)
+        action = choose(hand, upcard, actions)
+        if action not in actions:
+            action = STOP
+        if action == HIT:
+            take_card(player, hand, deck.draw(), rules)
+        elif action == DOUBLE:
+            hand.doubled = True
+            take_card(player, hand, deck.draw(), rules)
+        elif action == SPLIT:
+            new = split_hand(player, hand)
+            take_card(player, hand, deck.draw(), rules)
+            take_card(player, new, deck.draw(), rules)
+        elif action == SURRENDER:
+            surrender(player, hand)
+        else:
+            action = STOP
+            finish_hand(player, hand)
+        if recorder:
+            recorder.action(player, action)
+
+
+def play_dealer(deck, dealer, rules=DEFAULT_RULES):
+    dealer.show_second_card = True
+    if len(dealer.hand) > 1:
+        deck.reveal(dealer.hand[1])
+    # dealer_must_hit() inlined
+    while rules.dealer_hits(dealer.total, dealer.soft_aces > 0, dealer.has_ace):
+        dealer.hit(deck.draw())
+    finish_dealer(dealer)
+
+
+def play_round(deck, players, dealer, strategy, rules=DEFAULT_RULES, recorder=None):
+    # Plays one full round headless and returns [(player, outcome, amount)],
+    # one entry per hand; insurance is counted with a player's first hand.
+    # strategy may also be a list with one strategy per player.
+    strategies = strategy if isinstance(strategy, list) else [strategy] * len(players)
+    if recorder:
+        recorder.start_round(players, rules)
+    deck.start_round()
+    seated = players + [dealer]
+    for player in seated:
+        player.reset_hand()
+    deal_initial(deck, seated)
+    upcard = dealer.hand[0] if dealer.hand else None
+    for player, play in zip(players, strategies):
+        play_player(deck, player, upcard, play, rules, recorder)
+    play_dealer(deck, dealer, rules)
+    results = []
+    for player in players:
+        if not recorder and not player.insurance and player.single_hand():
+            # The usual case, one hand and no side bet, is settled directly
+            outcome, amount = settle(player, dealer, rules)
+            player.balance += amount
+            results.append((player, outcome, amount))
+            continue
+        hands, insurance = settle_player(player, dealer, rules)
+        if recorder:
+            recorder.settle(player, hands, insurance)
+        for i, (hand, outcome, amount) in enumerate(hands):
+            amount += insurance if i == 0 else 0
+            player.balance += amount
+            results.append((player, outcome, amount))
+    if recorder:
+        recorder.end_round()
+    return results
+
+
+class SimulationResult:
+    def __init__(self, bet=DEFAULT_SIM_BET):
+        self.bet = bet
+        # Hands counts split hands separately; EV is per round started
+        self.rounds = 0
+        self.hands = 0
+        self.net = 0
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+
+    def add(self, outcome, amount):
+        self.hands += 1
+        self.net += amount
+        self.outcomes[outcome] += 1
+
+    def merge(self, other):
+        self.rounds += other.rounds
+        self.hands += other.hands
+        self.net += other.net
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] += count
+        return self
+
+    def rate(self, outcome):
+        return self.outcomes[outcome] / self.hands if self.hands else 0.0
+
+    def expected_value(self):
+        # Average return per unit bet; the house edge is the negative of this
+        rounds = self.rounds or self.hands
+        return self.net / (rounds * self.bet) if rounds else 0.0
+
+    def summary(self):
+        lines = [f"Rounds: {self.rounds}", f"Hands: {self.hands}", f"EV per unit bet: {self.expected_value():+.4f}"]
+        for outcome in OUTCOMES:
+            lines.append(f"{outcome}: {self.rate(outcome):.4f}")
+        return "\n".join(lines)
+
+
+def simulate_rounds(n, strategy=None, seed=None, num_players=1, bet=DEFAULT_SIM_BET,
+                    decks=DEFAULT_DECKS, penetration=DEFAULT_PENETRATION, reshuffle=CUT_CARD, rules=DEFAULT_RULES,
+                    recorder=None, rng_kind=DEFAULT_RNG):
+    # Plays n rounds from one shoe, set up like the game's by default. Use
+    # decks=1, reshuffle=EVERY_ROUND for a fresh single deck every round.
+    # rng_kind picks the shuffle's random source (see shuffling.py).
+    strategy = strategy or StandOn()
+    rng = make_rng(rng_kind, seed)
+    shoe = Shoe(decks, penetration, rng, reshuffle)
+    if recorder:
+        recorder.attach(shoe)
+    players = [Player(f"Sim {i + 1}") for i in range(num_players)]
+    dealer = Player("Dealer")
+    for player in players:
+        player.bet = bet
+        # Never short of money to double or split with
+        player.balance = math.inf
+    result = SimulationResult(bet)
+    for _ in range(n):
+        result.rounds += num_players
+        for player, outcome, amount in play_round(shoe, players, dealer, strategy, rules, recorder):
+            result.add(outcome, amount)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Headless Black Jack round simulator")
+    parser.add_argument("rounds", type=int, nargs="?", default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--stand-on", type=int, default=17)
+    parser.add_argument("--decks", type=int, default=DEFAULT_DECKS)
+    parser.add_argument("--penetration", type=float, default=DEFAULT_PENETRATION)
+    parser.add_argument("--reshuffle", choices=[CUT_CARD, EVERY_ROUND], default=CUT_CARD)
+    parser.add_argument("--rng", choices=RNG_KINDS, default=DEFAULT_RNG, help="random source for shuffling")
+    parser.add_argument("--basic", action="store_true", help="play basic strategy for these rules")
+    parser.add_argument("--log", default=None, help="write every round to this round log (see eventlog.py)")
+    add_rules_arguments(parser)
+    args = parser.parse_args()
+    rules = rules_from_args(args)
+    if args.basic:
+        from strategy import get_advisor
+        play = get_advisor(rules=rules)
+    else:
+        play = StandOn(args.stand_on)
+
+    recorder = None
+    if args.log:
+        from eventlog import MAX_SEATS, RoundRecorder
+        if args.players > MAX_SEATS:
+            parser.error(f"--log records at most {MAX_SEATS} players")
+        recorder = RoundRecorder(args.log)
+    start = time.perf_counter()
+    result = simulate_rounds(args.rounds, play, args.seed, args.players, decks=args.decks,
+                             penetration=args.penetration, reshuffle=args.reshuffle, rules=rules,
+                             recorder=recorder, rng_kind=args.rng)
+    elapsed = time.perf_counter() - start
+    if recorder:
+        recorder.close()
+    print(result.summary())
+    print(f"{args.rounds} rounds in {elapsed:.2f}s ({args.rounds / elapsed:,.0f} rounds/s)")
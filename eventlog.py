@@ -0,0 +1,501 @@
+import math
+import os
+import struct
+
+import engine
+from history import OUTCOME_CODES, OUTCOMES_BY_CODE
+from parallel import run_jobs
+from protocol import pack_text, unpack_text
+
+# Round log. Every round is kept as a compact binary record of what actually
+# happened: the cards in the order they were drawn, each player's decisions
+# and the settlement of every hand. Together with the shoe order, written at
+# every shuffle, that is enough to play the round again with the engine.
+#
+# The file is MAGIC and a version byte, then records of a 3-byte header
+# (kind uint8, body length uint16) and a packed big-endian body:
+#
+#   SHUFFLE  decks, cut, card ids in shoe order (once per shoe)
+#   RULES    the table rules for the rounds that follow
+#   SEATS    the player names for the rounds that follow
+#   ROUND    shoe position at the end of the round, bets, draws (one byte
+#            each, card id plus FACE_DOWN for the hole card), actions (one
+#            byte each, seat << 4 | action code) and one settlement row per
+#            hand (plus one for insurance)
+#
+# A heads-up round is about 30 bytes. RULES and SEATS are only written when
+# they change, so a session's log is mostly ROUND records.
+#
+# Replay (replay_round, replay_log) deals a round's logged cards again in
+# order and feeds each seat its logged decisions through engine.play_round,
+# then compares the settlement with the logged one. With other rules the
+# same decisions are replayed and anything that pays differently is
+# reported; if the dealer needs more cards than were logged they come from
+# the rest of the logged shoe. Rounds only depend on the shoe and seating
+# before them, so a log is split into chunks that replay in parallel.
+#
+#     python eventlog.py round_log.bin                          # check every payout
+#     python eventlog.py round_log.bin --new-rules --dealer-17 s17 --workers 4
+#     python eventlog.py round_log.bin --show 12                # one round's events
+
+MAGIC = b"BJRL"
+VERSION = 1
+ROUND_LOG_FILE = "round_log.bin"
+DEFAULT_CHUNK_ROUNDS = 100000
+MAX_EXAMPLES = 10
+
+# Record kinds
+SHUFFLE = 1
+RULES = 2
+SEATS = 3
+ROUND = 4
+
+FILE_HEAD = len(MAGIC) + 1
+RECORD_HEAD = struct.Struct("!BH")
+SHUFFLE_HEAD = struct.Struct("!BH")     # decks, cut
+RULES_BODY = struct.Struct("!BdBB")     # dealer 17 rule, Black Jack payout, flags, max splits
+ROUND_HEAD = struct.Struct("!HBHHB")    # shoe position, seats, draws, actions, settlement rows
+SETTLE_ROW = struct.Struct("!BBi")      # seat << 4 | hand, outcome code, balance change
+
+FACE_DOWN = 0x80
+ACTIONS = [engine.HIT, engine.STOP, engine.DOUBLE, engine.SPLIT, engine.SURRENDER, engine.INSURANCE]
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+# Settlement row hand index for a seat's insurance
+INSURANCE_HAND = 15
+# Seats and hands share a byte with an action code or hand index, so a
+# logged table has at most MAX_SEATS seats and MAX_HANDS hands per seat
+MAX_SEATS = 16
+MAX_HANDS = INSURANCE_HAND
+RULE_FLAGS = ["double_after_split", "resplit_aces", "hit_split_aces", "surrender", "insurance"]
+
+
+def pack_rules(rules):
+    flags = sum(1 << i for i, name in enumerate(RULE_FLAGS) if getattr(rules, name))
+    return RULES_BODY.pack(engine.DEALER_17_RULES.index(rules.dealer_17), rules.blackjack_payout, flags,
+                           rules.max_splits)
+
+
+def unpack_rules(body):
+    dealer_17, payout, flags, max_splits = RULES_BODY.unpack(body)
+    switches = {name: bool(flags & (1 << i)) for i, name in enumerate(RULE_FLAGS)}
+    return engine.TableRules(engine.DEALER_17_RULES[dealer_17], payout, max_splits=max_splits, **switches)
+
+
+class RoundRecorder:
+    # Writes the round log. It watches the shoe (engine.Shoe observers) for
+    # shuffles and draws; the table tells it about each round's start, every
+    # action and the settlement. Appends to an existing log.
+    def __init__(self, path=ROUND_LOG_FILE):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, "rb") as f:
+                check_header(f.read(FILE_HEAD), path)
+        self.file = open(path, "ab")
+        if not exists:
+            self.file.write(MAGIC + bytes((VERSION,)))
+        self.shoe = None
+        self.rules = None
+        self.names = None
+        self.seats = {}
+        self.recording = False
+        self.rounds = 0
+
+    def write(self, kind, body):
+        self.file.write(RECORD_HEAD.pack(kind, len(body)) + body)
+
+    def attach(self, shoe):
+        # Joining a shoe mid-way logs its order as it stands
+        if self.shoe is not None:
+            self.shoe.observers.remove(self)
+        self.shoe = shoe
+        shoe.observers.append(self)
+        self.shoe_shuffled()
+
+    def close(self):
+        if self.shoe is not None:
+            self.shoe.observers.remove(self)
+            self.shoe = None
+        self.file.close()
+
+    def flush(self):
+        self.file.flush()
+
+    # Shoe observer
+    def shoe_shuffled(self):
+        shoe = self.shoe
+        self.write(SHUFFLE, SHUFFLE_HEAD.pack(shoe.decks, shoe.cut) + shoe.cards.tobytes())
+
+    def card_dealt(self, card, face_up=True):
+        if self.recording:
+            self.draws.append(card.id if face_up else card.id | FACE_DOWN)
+
+    def card_revealed(self, card):
+        pass
+
+    # Round events
+    def start_round(self, players, rules):
+        if len(players) > MAX_SEATS:
+            raise ValueError(f"The round log holds at most {MAX_SEATS} seats, not {len(players)}")
+        if rules.max_splits + 1 > MAX_HANDS:
+            raise ValueError(f"The round log holds at most {MAX_HANDS} hands per seat, "
+                             f"not {rules.max_splits + 1} (max_splits {rules.max_splits})")
+        names = tuple(player.name for player in players)
+        if names != self.names:
+            self.write(SEATS, bytes((len(names),)) + b"".join(pack_text(name) for name in names))
+            self.names = names
+        if rules != self.rules:
+            self.write(RULES, pack_rules(rules))
+            self.rules = rules
+        self.seats = {id(player): seat for seat, player in enumerate(players)}
+        self.bets = [player.bet for player in players]
+        self.draws = bytearray()
+        self.actions = bytearray()
+        self.settlements = []
+        self.recording = True
+
+    def action(self, player, action):
+        self.actions.append(self.seats[id(player)] << 4 | ACTION_CODES[action])
+
+    def settle(self, player, hands, insurance):
+        # hands and insurance as returned by engine.settle_player
+        seat = self.seats[id(player)] << 4
+        for i, (hand, outcome, amount) in enumerate(hands):
+            self.settlements.append(SETTLE_ROW.pack(seat | i, OUTCOME_CODES[outcome], amount))
+        if player.insurance:
+            self.settlements.append(SETTLE_ROW.pack(seat | INSURANCE_HAND, 0, insurance))
+
+    def end_round(self):
+        self.write(ROUND, ROUND_HEAD.pack(self.shoe.pos, len(self.bets), len(self.draws), len(self.actions),
+                                          len(self.settlements))
+                   + struct.pack(f"!{len(self.bets)}I", *self.bets) + bytes(self.draws) + bytes(self.actions)
+                   + b"".join(self.settlements))
+        self.recording = False
+        self.rounds += 1
+
+
+def check_header(head, path):
+    if head[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a round log")
+    if head[len(MAGIC)] != VERSION:
+        raise ValueError(f"{path} is round log version {head[len(MAGIC)]}, expected {VERSION}")
+
+
+class LoggedRound:
+    __slots__ = ('number', 'names', 'rules', 'order', 'end_pos', 'bets', 'draws', 'actions', 'settlements')
+
+    def results(self):
+        # Logged [(seat, outcome, balance change)] per hand, with insurance
+        # counted with the seat's first hand as engine.play_round does
+        results = []
+        for seat_hand, code, amount in SETTLE_ROW.iter_unpack(self.settlements):
+            seat = seat_hand >> 4
+            if seat_hand & 15 == INSURANCE_HAND:
+                first = next(i for i, result in enumerate(results) if result[0] == seat)
+                results[first] = (seat, results[first][1], results[first][2] + amount)
+            else:
+                results.append((seat, OUTCOMES_BY_CODE[code], amount))
+        return results
+
+    def seat_actions(self):
+        actions = [[] for _ in self.bets]
+        for byte in self.actions:
+            actions[byte >> 4].append(ACTIONS[byte & 15])
+        return actions
+
+    def events(self):
+        # Readable lines, for --show
+        lines = [f"Round {self.number}: " + ", ".join(f"{name} bets {bet}" for name, bet in zip(self.names, self.bets))]
+        lines.append("Draws: " + " ".join(("(" + engine.CARDS[byte & 0x7F].rank + ")") if byte & FACE_DOWN
+                                           else engine.CARDS[byte].rank for byte in self.draws))
+        for byte in self.actions:
+            lines.append(f"{self.names[byte >> 4]}: {ACTIONS[byte & 15]}")
+        for seat, outcome, amount in self.results():
+            lines.append(f"{self.names[seat]}: {engine.result_text(outcome, amount)}")
+        return lines
+
+
+def iter_rounds(data, start, end, state, first_number=0):
+    # LoggedRounds from data[start:end]; state holds the shoe order, rules
+    # and names in force at start and is kept up to date
+    pos = start
+    number = first_number
+    while pos < end:
+        kind, length = RECORD_HEAD.unpack_from(data, pos)
+        pos += RECORD_HEAD.size
+        body = data[pos:pos + length]
+        pos += length
+        if kind == ROUND:
+            shoe_pos, seats, draws, actions, rows = ROUND_HEAD.unpack_from(body)
+            offset = ROUND_HEAD.size
+            logged = LoggedRound()
+            logged.number = number
+            logged.names, logged.rules, logged.order = state["names"], state["rules"], state["order"]
+            logged.end_pos = shoe_pos
+            logged.bets = struct.unpack_from(f"!{seats}I", body, offset)
+            offset += 4 * seats
+            logged.draws = body[offset:offset + draws]
+            offset += draws
+            logged.actions = body[offset:offset + actions]
+            logged.settlements = body[offset + actions:offset + actions + rows * SETTLE_ROW.size]
+            number += 1
+            yield logged
+        elif kind == SHUFFLE:
+            state["order"] = body[SHUFFLE_HEAD.size:]
+        elif kind == RULES:
+            state["rules"] = unpack_rules(body)
+        elif kind == SEATS:
+            names, offset = [], 1
+            for _ in range(body[0]):
+                name, offset = unpack_text(body, offset)
+                names.append(name)
+            state["names"] = tuple(names)
+
+
+def new_state():
+    return {"order": b"", "rules": engine.DEFAULT_RULES, "names": ()}
+
+
+def read_log(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    check_header(data, path)
+    return data
+
+
+def read_rounds(path):
+    data = read_log(path)
+    return iter_rounds(data, FILE_HEAD, len(data), new_state())
+
+
+def read_shuffles(path):
+    # Every logged shoe order, as bytes of card ids
+    data = read_log(path)
+    pos = FILE_HEAD
+    while pos < len(data):
+        kind, length = RECORD_HEAD.unpack_from(data, pos)
+        pos += RECORD_HEAD.size
+        if kind == SHUFFLE:
+            yield data[pos + SHUFFLE_HEAD.size:pos + length]
+        pos += length
+
+
+def read_round(path, number):
+    for logged in read_rounds(path):
+        if logged.number == number:
+            return logged
+    raise IndexError(f"{path} has no round {number}")
+
+
+class ReplayShoe:
+    # Deals a logged round's cards again in order, then the rest of the
+    # logged shoe if the replay wants more. watch() is called before every
+    # card, which is how a visual replay steps through the round.
+    def __init__(self, logged, watch=None):
+        self.cards = [byte & 0x7F for byte in logged.draws]
+        self.logged = len(self.cards)
+        self.order = logged.order
+        self.next_pos = logged.end_pos
+        self.pos = 0
+        self.watch = watch
+        self.observers = []
+
+    def start_round(self):
+        pass
+
+    def draw(self, face_up=True):
+        if self.watch:
+            self.watch()
+        if self.pos == len(self.cards):
+            # Round the logged shoe again if even that runs out
+            self.cards.append(self.order[self.next_pos % len(self.order)])
+            self.next_pos += 1
+        card = engine.CARDS[self.cards[self.pos]]
+        self.pos += 1
+        return card
+
+    def reveal(self, card):
+        pass
+
+
+class SeatReplay:
+    # Engine strategy that plays one seat's logged decisions in order
+    def __init__(self, actions):
+        self.actions = actions
+        self.next = 0
+
+    def insurance(self, player, upcard):
+        if self.next < len(self.actions) and self.actions[self.next] == engine.INSURANCE:
+            self.next += 1
+            return True
+        return False
+
+    def choose(self, hand, upcard, actions):
+        if self.next == len(self.actions):
+            return engine.STOP
+        self.next += 1
+        return self.actions[self.next - 1]
+
+    def __call__(self, hand, upcard):
+        return self.choose(hand, upcard, None)
+
+
+def replay_round(logged, rules=None, players=None, dealer=None, watch=None):
+    # Plays a logged round again; returns ([(seat, outcome, balance change)]
+    # per hand like LoggedRound.results, the number of cards it took)
+    players = players or [engine.Player(name) for name in logged.names]
+    dealer = dealer or engine.Player("Dealer")
+    balances = [player.balance for player in players]
+    for player, bet in zip(players, logged.bets):
+        player.bet = bet
+        # The logged balance allowed every logged double and split
+        player.balance = math.inf
+    shoe = ReplayShoe(logged, watch)
+    strategies = [SeatReplay(actions) for actions in logged.seat_actions()]
+    seats = {id(player): seat for seat, player in enumerate(players)}
+    results = engine.play_round(shoe, players, dealer, strategies, rules or logged.rules)
+    for player, balance in zip(players, balances):
+        player.balance = balance
+    return [(seats[id(player)], outcome, amount) for player, outcome, amount in results], shoe.pos
+
+
+def snapshot(player):
+    # What the table shows of a player, for stepping through a replay
+    return ([(list(hand.hand), hand.doubled, hand.surrendered, hand.done) for hand in player.hands],
+            player.active, player.stopped, player.insurance, player.show_second_card)
+
+
+def restore(player, state):
+    hands, active, stopped, insurance, show_second_card = state
+    player.reset_hand()
+    for i, (cards, doubled, surrendered, done) in enumerate(hands):
+        hand = player
+        if i:
+            hand = engine.Hand(player.bet)
+            player.hands.append(hand)
+        for card in cards:
+            hand.hit(card)
+        hand.doubled, hand.surrendered, hand.done = doubled, surrendered, done
+    player.active, player.stopped, player.insurance, player.show_second_card = active, stopped, insurance, show_second_card
+
+
+class ReplayReport:
+    def __init__(self):
+        self.rounds = 0
+        self.hands = 0
+        self.logged_net = 0
+        self.replayed_net = 0
+        # Rounds that settled differently, and rounds that took a different
+        # number of cards (expected when the dealer's rule changes)
+        self.changed = 0
+        self.diverged = 0
+        self.examples = []
+
+    def add(self, logged, replayed, cards):
+        expected = logged.results()
+        self.rounds += 1
+        self.hands += len(replayed)
+        self.logged_net += sum(amount for seat, outcome, amount in expected)
+        self.replayed_net += sum(amount for seat, outcome, amount in replayed)
+        if cards != len(logged.draws):
+            self.diverged += 1
+        if replayed != expected:
+            self.changed += 1
+            if len(self.examples) < MAX_EXAMPLES:
+                self.examples.append((logged.number, expected, replayed))
+
+    def merge(self, other):
+        self.rounds += other.rounds
+        self.hands += other.hands
+        self.logged_net += other.logged_net
+        self.replayed_net += other.replayed_net
+        self.changed += other.changed
+        self.diverged += other.diverged
+        self.examples = (self.examples + other.examples)[:MAX_EXAMPLES]
+        return self
+
+    def summary(self):
+        lines = [f"Rounds: {self.rounds}  Hands: {self.hands}",
+                 f"Net logged: {self.logged_net:+d}  replayed: {self.replayed_net:+d}",
+                 f"Rounds settled differently: {self.changed}  took other cards: {self.diverged}"]
+        for number, expected, replayed in self.examples:
+            lines.append(f"  round {number}: logged {expected} replayed {replayed}")
+        return "\n".join(lines)
+
+
+def replay_range(data, start, end, state, first_number, rules=None):
+    report = ReplayReport()
+    dealer = engine.Player("Dealer")
+    names, players = None, None
+    for logged in iter_rounds(data, start, end, state, first_number):
+        if logged.names != names:
+            names, players = logged.names, [engine.Player(name) for name in logged.names]
+        replayed, cards = replay_round(logged, rules, players, dealer)
+        report.add(logged, replayed, cards)
+    return report
+
+
+def plan_chunks(data, chunk_rounds):
+    # [(start, end, state at start, first round number)] per chunk of rounds
+    plans = []
+    state = new_state()
+    pos = FILE_HEAD
+    number = 0
+    while pos < len(data):
+        kind, length = RECORD_HEAD.unpack_from(data, pos)
+        end = pos + RECORD_HEAD.size + length
+        if kind == ROUND:
+            if number % chunk_rounds == 0:
+                plans.append((pos, dict(state), number))
+            number += 1
+        else:
+            for _ in iter_rounds(data, pos, end, state):
+                pass
+        pos = end
+    ends = [start for start, state, first in plans[1:]] + [len(data)]
+    return [(start, end, state, first) for (start, state, first), end in zip(plans, ends)]
+
+
+def _replay_chunk(job):
+    path, start, end, state, first, rules = job
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return replay_range(data, 0, len(data), state, first, rules)
+
+
+def replay_log(path, rules=None, workers=1, chunk_rounds=DEFAULT_CHUNK_ROUNDS):
+    # Replays every round in the log, under the logged rules unless rules
+    # are given, and returns a ReplayReport
+    data = read_log(path)
+    if workers == 1:
+        return replay_range(data, FILE_HEAD, len(data), new_state(), 0, rules)
+    jobs = [(path, start, end, state, first, rules) for start, end, state, first in plan_chunks(data, chunk_rounds)]
+    report = ReplayReport()
+    for chunk in run_jobs(_replay_chunk, jobs, workers):
+        report.merge(chunk)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Replay a round log and check its payouts")
+    parser.add_argument("log", nargs="?", default=ROUND_LOG_FILE)
+    parser.add_argument("--show", type=int, default=None, help="print one round's events instead")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-rounds", type=int, default=DEFAULT_CHUNK_ROUNDS)
+    parser.add_argument("--new-rules", action="store_true", help="replay under the rules given below, not the logged ones")
+    engine.add_rules_arguments(parser)
+    args = parser.parse_args()
+
+    if args.show is not None:
+        print("\n".join(read_round(args.log, args.show).events()))
+    else:
+        start = time.perf_counter()
+        report = replay_log(args.log, engine.rules_from_args(args) if args.new_rules else None, args.workers,
+                            args.chunk_rounds)
+        elapsed = time.perf_counter() - start
+        print(report.summary())
+        print(f"{report.rounds} rounds in {elapsed:.2f}s ({report.rounds / elapsed:,.0f} rounds/s)")
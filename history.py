@@ -0,0 +1,121 @@
+import time
+from collections import deque
+
+import engine
+
+# Structured round history. A record is a small dict
+#   {"bet", "outcome", "payout", "balance", "ts"}
+# where outcome is one of the engine outcomes and payout the signed balance
+# change. PlayerStats keeps the rolling aggregates (win rate, net, streaks)
+# up to date one record at a time, so nothing ever re-reads a whole history.
+
+# Outcomes are stored on disk as small integer codes. The order of
+# engine.OUTCOMES is therefore part of the file format: only append to it.
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(engine.OUTCOMES)}
+OUTCOMES_BY_CODE = list(engine.OUTCOMES)
+WINNING = {engine.BLACKJACK, engine.WIN}
+LOSING = {engine.BUST, engine.DEALER_BLACKJACK, engine.LOSS, engine.SURRENDERED}
+RECENT_ROUNDS = 5
+
+
+def make_record(bet, outcome, payout, balance, ts=None):
+    return {"bet": bet, "outcome": outcome, "payout": payout, "balance": balance,
+            "ts": time.time() if ts is None else ts}
+
+
+def parse_result(result):
+    # Reads an old free-text result ("Bust! Lost 50", "Black Jack! Won 33",
+    # "Push", ...) back into (outcome, payout)
+    parts = result.split()
+    amount = int(parts[-1]) if parts and parts[-1].isdigit() else 0
+    if result.startswith("Bust"):
+        return engine.BUST, -amount
+    if result.startswith("Dealer Black Jack"):
+        return engine.DEALER_BLACKJACK, -amount
+    if result.startswith("Black Jack"):
+        return engine.BLACKJACK, amount
+    if result.startswith("Won"):
+        return engine.WIN, amount
+    if result.startswith("Lost"):
+        return engine.LOSS, -amount
+    return engine.PUSH, 0
+
+
+def record_from_legacy(entry):
+    outcome, payout = parse_result(entry.get("result", ""))
+    return make_record(entry.get("bet", 0), outcome, payout, entry.get("balance", 0), ts=0)
+
+
+def summary_line(record):
+    # Short form used by the hover tooltip: "Won 33", "Lost 50", "Push"
+    payout = record["payout"]
+    if record["outcome"] == engine.PUSH:
+        return "Push"
+    return f"Won {payout}" if payout > 0 else f"Lost {-payout}"
+
+
+class PlayerStats:
+    FIELDS = ("rounds", "wins", "losses", "pushes", "net", "streak", "best_streak", "worst_streak")
+
+    def __init__(self, rounds=0, wins=0, losses=0, pushes=0, net=0, streak=0, best_streak=0, worst_streak=0):
+        self.rounds = rounds
+        self.wins = wins
+        self.losses = losses
+        self.pushes = pushes
+        self.net = net
+        # streak > 0 counts wins in a row, < 0 losses in a row
+        self.streak = streak
+        self.best_streak = best_streak
+        self.worst_streak = worst_streak
+
+    def add(self, record):
+        outcome = record["outcome"]
+        self.rounds += 1
+        self.net += record["payout"]
+        if outcome in WINNING:
+            self.wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.best_streak = max(self.best_streak, self.streak)
+        elif outcome in LOSING:
+            self.losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            self.worst_streak = min(self.worst_streak, self.streak)
+        else:
+            self.pushes += 1
+
+    def win_rate(self):
+        return self.wins / self.rounds if self.rounds else 0.0
+
+    def as_row(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def summary(self):
+        streak = f"W{self.streak}" if self.streak > 0 else f"L{-self.streak}" if self.streak < 0 else "-"
+        return f"Rounds {self.rounds} | Win {self.win_rate():.0%} | Net {self.net:+d} | Streak {streak}"
+
+
+class ProfilePlayer(engine.Player):
+    # A seated player plus their profile. Only the rolling stats and the last
+    # few rounds are kept in memory; rounds played since the last save wait
+    # in pending until the store appends them.
+    def __init__(self, name):
+        super().__init__(name)
+        self.stats = PlayerStats()
+        self.recent = deque(maxlen=RECENT_ROUNDS)
+        self.pending = []
+
+    def load_profile(self, profile):
+        self.balance = profile["balance"]
+        self.stats = profile["stats"]
+        self.recent = deque(profile["recent"], maxlen=RECENT_ROUNDS)
+        self.pending = []
+
+    def record_round(self, outcome, amount, bet=None):
+        # One record per hand; bet is the hand's stake after any double
+        record = make_record(self.bet if bet is None else bet, outcome, amount, self.balance)
+        self.stats.add(record)
+        self.recent.append(record)
+        self.pending.append(record)
+
+    def profile(self):
+        return {"balance": self.balance, "pending": self.pending}
@@ -0,0 +1,54 @@
+# Seat geometry for the game window. The table is a column of seat rows,
+# each a name line with the seat's cards under it. TableLayout works out
+# where every row starts once and keeps that until the number of seats or
+# the highlighted seat changes (the highlighted name line is taller), so
+# finding where a card goes is a lookup and finding the rows on screen is a
+# bisect, however many seats there are. Needs no pygame; positions are
+# plain pixels in table coordinates, before scrolling.
+
+import bisect
+
+
+class TableLayout:
+    def __init__(self, top, name_height, highlight_name_height, card_height, gap):
+        self.top = top
+        self.name_height = name_height
+        self.highlight_name_height = highlight_name_height
+        self.cards_height = card_height + gap
+        self.seats = 0
+        self.highlighted = None
+        self.tops = []
+        self.bottom = top
+
+    def update(self, seats, highlighted):
+        if (seats, highlighted) != (self.seats, self.highlighted):
+            self.seats, self.highlighted = seats, highlighted
+            tops, y = [], self.top
+            for seat in range(seats):
+                tops.append(y)
+                y += self.card_y(seat) + self.cards_height
+            self.tops, self.bottom = tops, y
+        return self
+
+    def card_y(self, seat):
+        # Top of the seat's cards, relative to the top of its row
+        return self.highlight_name_height if seat == self.highlighted else self.name_height
+
+    def row(self, seat):
+        top = self.tops[seat]
+        return top, self.tops[seat + 1] if seat + 1 < self.seats else self.bottom
+
+    def visible(self, view_top, view_bottom):
+        # Seats whose rows overlap the given span of the table
+        first = max(bisect.bisect_right(self.tops, view_top) - 1, 0)
+        return range(first, bisect.bisect_left(self.tops, view_bottom))
+
+    def clamp(self, scroll, view_height):
+        return min(max(scroll, 0), max(self.bottom - view_height, 0))
+
+    def follow(self, seat, scroll, view_height):
+        # The nearest scroll that shows all of the seat's row, keeping the
+        # margin above the first row when scrolling up
+        top, bottom = self.row(seat)
+        scroll = max(min(scroll, top - self.top), bottom - view_height)
+        return self.clamp(scroll, view_height)
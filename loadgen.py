@@ -0,0 +1,220 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import engine
+from bots import BOT_KINDS, BOT_USERNAMES, make_bot
+from history import ProfilePlayer
+from profile_cache import ProfileCache, DEFAULT_FLUSH_ROUNDS
+from profiler import PhaseTimer
+from storage import PlayerStore
+
+# Load generator: many full tables of bots played headless, round after
+# round, through the same rules (engine.py), profile records (history.py)
+# and storage (profile_cache.py + storage.py) as the game. Every round is
+# timed phase by phase, and throughput and memory are reported at regular
+# intervals, so a slowdown or a leak in the round loop or the storage layer
+# shows up as a changed number here.
+#
+# --gui instead plays bot-only rounds through the real game loop
+# (blackjack.main_game_loop) on a dummy display, which times whole rounds.
+
+PHASES = ["bet", "deal", "players", "dealer", "settle", "persist"]
+DEFAULT_TABLES = 50
+DEFAULT_SEATS = 6
+DEFAULT_ROUNDS = 200
+
+
+class BotTable:
+    def __init__(self, table_id, seats, kinds, store, seed, rules=engine.DEFAULT_RULES):
+        self.rng = random.Random(f"{seed}:{table_id}")
+        self.rules = rules
+        self.shoe = engine.Shoe(rng=self.rng)
+        self.store = store
+        self.dealer = engine.Player("Dealer")
+        self.players = []
+        self.bots = []
+        for seat in range(seats):
+            kind = kinds[(table_id * seats + seat) % len(kinds)]
+            player = ProfilePlayer(f"t{table_id}s{seat}{kind}")
+            if store:
+                player.load_profile(store.load(player.name))
+            self.players.append(player)
+            self.bots.append(make_bot(kind, rng=self.rng, rules=rules))
+
+    def play_round(self, timers):
+        clock = time.perf_counter
+        start = clock()
+        for player, bot in zip(self.players, self.bots):
+            if player.balance < 1:
+                player.balance = engine.STARTING_BALANCE  # rebuy
+            player.bet = bot.bet(player.balance)
+        mark = clock()
+        timers["bet"].add(mark - start)
+
+        start = mark
+        self.shoe.start_round()
+        for player in self.players:
+            player.reset_hand()
+        self.dealer.reset_hand()
+        engine.deal_initial(self.shoe, self.players + [self.dealer])
+        mark = clock()
+        timers["deal"].add(mark - start)
+
+        start = mark
+        upcard = self.dealer.hand[0]
+        for player, bot in zip(self.players, self.bots):
+            engine.play_player(self.shoe, player, upcard, bot, self.rules)
+        mark = clock()
+        timers["players"].add(mark - start)
+
+        start = mark
+        engine.play_dealer(self.shoe, self.dealer, self.rules)
+        mark = clock()
+        timers["dealer"].add(mark - start)
+
+        start = mark
+        for player in self.players:
+            hands, insurance = engine.settle_player(player, self.dealer, self.rules)
+            for i, (hand, outcome, amount) in enumerate(hands):
+                amount += insurance if i == 0 else 0
+                player.balance += amount
+                player.record_round(outcome, amount, hand.stake())
+        mark = clock()
+        timers["settle"].add(mark - start)
+
+        start = mark
+        if self.store:
+            self.store.save_many([(player.name, player.profile()) for player in self.players])
+        for player in self.players:
+            player.pending = []
+        timers["persist"].add(clock() - start)
+
+
+def rss_mb():
+    # Current resident set size, where /proc is available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def memory_line():
+    line = f"rss {rss_mb():7.1f} MB"
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        line += f"  heap {current / 2 ** 20:7.2f} MB (peak {peak / 2 ** 20:.2f})"
+    return line
+
+
+def run_headless(tables, seats, rounds, kinds, store, seed, report_every, rules=engine.DEFAULT_RULES):
+    rng = random.Random(seed)
+    timers = {phase: PhaseTimer(rng) for phase in PHASES}
+    bot_tables = [BotTable(i, seats, kinds, store, seed, rules) for i in range(tables)]
+    baseline = None
+    start = time.perf_counter()
+    last_report, last_rounds = start, 0
+    for round_no in range(1, rounds + 1):
+        for table in bot_tables:
+            table.play_round(timers)
+        if round_no % report_every == 0 or round_no == rounds:
+            now = time.perf_counter()
+            played = round_no * tables
+            rate = (played - last_rounds) / (now - last_report)
+            print(f"round {round_no:>7}  {played:>10,} table-rounds  {rate:>10,.0f} rounds/s  {memory_line()}")
+            last_report, last_rounds = now, played
+            if baseline is None:
+                # Growth is measured from the first report, after warm-up
+                baseline = (rss_mb(), tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None)
+    elapsed = time.perf_counter() - start
+    if store:
+        flush_start = time.perf_counter()
+        store.flush()
+        timers["persist"].add(time.perf_counter() - flush_start)
+    return timers, elapsed, baseline
+
+
+def run_gui(rounds, kinds, seed, report_every):
+    # Bot-only rounds through the real game loop on a dummy display
+    import blackjack
+    usernames = [username for username, kind in BOT_USERNAMES.items() if kind in kinds]
+    shoe = engine.Shoe(rng=random.Random(seed))
+    timers = {"round": PhaseTimer(random.Random(seed))}
+    baseline = None
+    start = time.perf_counter()
+    for round_no in range(1, rounds + 1):
+        round_start = time.perf_counter()
+        blackjack.main_game_loop(len(usernames) > 1, usernames, shoe, autoplay=True)
+        timers["round"].add(time.perf_counter() - round_start)
+        if round_no % report_every == 0 or round_no == rounds:
+            print(f"round {round_no:>7}  {round_no / (time.perf_counter() - start):>8.1f} rounds/s  {memory_line()}")
+            if baseline is None:
+                baseline = (rss_mb(), tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None)
+    elapsed = time.perf_counter() - start
+    blackjack.flush_player_data()
+    return timers, elapsed, baseline
+
+
+def report(timers, elapsed, table_rounds, baseline):
+    print(f"\n{table_rounds:,} table-rounds in {elapsed:.2f}s ({table_rounds / elapsed:,.0f} rounds/s)")
+    print(f"{'phase':<10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}{'share':>8}")
+    total = sum(timer.total for timer in timers.values()) or 1.0
+    for phase, timer in timers.items():
+        print(f"{phase:<10}{timer.mean() * 1e6:>10.1f}{timer.percentile(0.5) * 1e6:>10.1f}"
+              f"{timer.percentile(0.99) * 1e6:>10.1f}{timer.max * 1e6:>10.1f}{timer.total / total:>8.1%}")
+    if baseline:
+        rss_start, snapshot = baseline
+        print(f"\nMemory growth since first report: rss {rss_mb() - rss_start:+.1f} MB")
+        if snapshot:
+            stats = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+            print("Largest Python heap growth:")
+            for stat in stats[:5]:
+                print(f"  {stat}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bot load generator for the round loop and storage")
+    parser.add_argument("--tables", type=int, default=DEFAULT_TABLES)
+    parser.add_argument("--seats", type=int, default=DEFAULT_SEATS)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="rounds per table")
+    parser.add_argument("--bots", nargs="+", choices=BOT_KINDS, default=BOT_KINDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report-every", type=int, default=50)
+    parser.add_argument("--db", default=None, help="player store to use (default: a temporary one)")
+    parser.add_argument("--no-store", action="store_true", help="skip persistence entirely")
+    parser.add_argument("--flush-rounds", type=int, default=DEFAULT_FLUSH_ROUNDS)
+    parser.add_argument("--tracemalloc", action="store_true", help="also track the Python heap (slower)")
+    parser.add_argument("--gui", action="store_true", help="play through the game window's loop instead")
+    engine.add_rules_arguments(parser)
+    args = parser.parse_args()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    workdir = tempfile.mkdtemp(prefix="loadgen-")
+    try:
+        if args.gui:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            import blackjack
+            blackjack.PLAYER_DB_FILE = args.db or os.path.join(workdir, "players.db")
+            blackjack.PLAYER_DATA_FILE = None
+            blackjack.ROUND_LOG_FILE = os.path.join(workdir, "round_log.bin")
+            timers, elapsed, baseline = run_gui(args.rounds, args.bots, args.seed, args.report_every)
+            report(timers, elapsed, args.rounds, baseline)
+        else:
+            store = None
+            if not args.no_store:
+                store = ProfileCache(PlayerStore(args.db or os.path.join(workdir, "players.db"), legacy_json=None),
+                                     max_profiles=args.tables * args.seats, flush_rounds=args.flush_rounds)
+            timers, elapsed, baseline = run_headless(args.tables, args.seats, args.rounds, args.bots, store,
+                                                     args.seed, args.report_every, engine.rules_from_args(args))
+            report(timers, elapsed, args.tables * args.rounds, baseline)
+            if store:
+                store.store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
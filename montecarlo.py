@@ -0,0 +1,267 @@
+import math
+
+import numpy as np
+
+import engine
+
+# Vectorized Monte Carlo for heads-up rounds (one player against the dealer).
+# Each row of a chunk is one round dealt from its own freshly shuffled single
+# deck (engine.simulate_rounds with decks=1, reshuffle=EVERY_ROUND), and every
+# phase of the round is played for the whole chunk at once with array
+# operations. Scoring and settlement follow engine.py exactly: aces drop
+# from 11 to 1, the dealer hits soft or ace 17s as the engine.TableRules
+# say, and only a two-card 21 is a Black Jack. A player's Black Jack pays
+# int(bet * blackjack_payout) and pushes a dealer one; any other 21 pays
+# even money, pushes a dealer 21 and loses to a dealer Black Jack. Only hit
+# and stop are played, so the other table rules do not come into it.
+
+DEFAULT_CHUNK = 500000
+Z_95 = 1.96
+
+# Point value of each of the 52 cards, indexed by card id
+DECK_VALUES = np.array(engine.CARD_POINTS, dtype=np.int8)
+DECK_SIZE = len(DECK_VALUES)
+# No heads-up round can use more cards than this: the smallest cards add up
+# to more than both hands can hold before standing or busting.
+MAX_CARDS_PER_ROUND = 24
+
+
+def deal_uniforms(rng, n):
+    # The random numbers behind n shuffles, one row per deck position. Every
+    # strategy replays the same numbers, so all of them see identical decks.
+    return rng.random((MAX_CARDS_PER_ROUND, n), dtype=np.float32)
+
+
+class Shoes:
+    # One unshuffled deck per round, stored card-major so that row i holds
+    # position i of every deck. Cards are shuffled lazily: drawing from a
+    # deck performs the next Fisher-Yates step for that deck only, so the
+    # cost follows the number of cards actually dealt rather than 52.
+    def __init__(self, uniforms):
+        self.uniforms = uniforms
+        self.n = n = uniforms.shape[1]
+        self.cards = np.repeat(DECK_VALUES[:, None], n, axis=1)
+        self.flat = self.cards.reshape(-1)
+        self.pos = np.zeros(n, dtype=np.int64)
+
+    def draw(self, rows=None):
+        # Returns the next card of each deck in `rows` (all decks if None)
+        if rows is None:
+            rows = np.arange(self.n, dtype=np.int64)
+        pos = self.pos[rows]
+        remaining = (DECK_SIZE - pos).astype(np.float32)
+        swap = pos + (self.uniforms[pos, rows] * remaining).astype(np.int64)
+        swap = np.minimum(swap, DECK_SIZE - 1)
+        here = pos * self.n + rows
+        there = swap * self.n + rows
+        picked = self.flat[there]
+        self.flat[there] = self.flat[here]
+        self.flat[here] = picked
+        self.pos[rows] = pos + 1
+        return picked
+
+
+class Hands:
+    # Running totals for a column of hands; aces are counted as 11 in
+    # `total` while `soft` says how many of them can still drop to 1.
+    def __init__(self, n):
+        self.total = np.zeros(n, dtype=np.int16)
+        self.soft = np.zeros(n, dtype=np.int8)
+        self.has_ace = np.zeros(n, dtype=bool)
+
+    def add(self, values):
+        is_ace = values == 11
+        self.total += values
+        self.soft += is_ace
+        self.has_ace |= is_ace
+        # A single card can need two reductions, e.g. soft 21 plus an ace
+        for _ in range(2):
+            drop = (self.total > 21) & (self.soft > 0)
+            self.total -= 10 * drop
+            self.soft -= drop
+
+    def add_rows(self, rows, values):
+        is_ace = values == 11
+        total = self.total[rows] + values
+        soft = self.soft[rows] + is_ace
+        self.has_ace[rows] |= is_ace
+        for _ in range(2):
+            drop = (total > 21) & (soft > 0)
+            total -= 10 * drop
+            soft -= drop
+        self.total[rows] = total
+        self.soft[rows] = soft
+
+
+def dealer_must_hit(dealer, rules=engine.DEFAULT_RULES, rows=None):
+    # engine.TableRules.dealer_hits for a column of hands
+    total = dealer.total if rows is None else dealer.total[rows]
+    if rules.dealer_17 == engine.STAND_17:
+        return total < 17
+    if rules.dealer_17 == engine.HIT_SOFT_17:
+        on_17 = (dealer.soft if rows is None else dealer.soft[rows]) > 0
+    else:
+        on_17 = dealer.has_ace if rows is None else dealer.has_ace[rows]
+    return (total < 17) | ((total == 17) & on_17)
+
+
+def hit_table_of(strategy):
+    # Turns a strategy into a lookup table hit[total, soft, dealer upcard]
+    # so the whole chunk can decide at once. Understands "hit below N"
+    # strategies and strategy.StrategyAdvisor tables.
+    table = np.zeros((32, 2, 12), dtype=bool)
+    if isinstance(strategy, int):
+        strategy = engine.StandOn(strategy)
+    if isinstance(strategy, engine.StandOn):
+        table[:min(strategy.threshold, 21)] = True
+        return f"stand on {strategy.threshold}", table
+    if strategy is engine.always_stop:
+        return "always stop", table
+    if hasattr(strategy, "table"):
+        for (total, soft, upcard), (action, ev) in strategy.table.items():
+            table[total, int(soft), upcard] = action == engine.HIT
+        return "basic strategy", table
+    raise ValueError(f"Unsupported strategy for vectorized simulation: {strategy!r}")
+
+
+def play_chunk(uniforms, hit_table, bet=engine.DEFAULT_SIM_BET, rules=engine.DEFAULT_RULES):
+    # Plays one round per column of `uniforms` and returns
+    # (payout per round, bust mask, push mask)
+    shoes = Shoes(uniforms)
+    n = shoes.n
+    player, dealer = Hands(n), Hands(n)
+    player.add(shoes.draw())
+    upcard = shoes.draw()
+    dealer.add(upcard)
+    player.add(shoes.draw())
+    dealer.add(shoes.draw())
+    player_bj = player.total == 21
+    dealer_bj = dealer.total == 21
+
+    active = np.arange(n)
+    while len(active):
+        total = player.total[active]
+        active = active[(total < 21) & hit_table[total, (player.soft[active] > 0).astype(np.intp), upcard[active]]]
+        if len(active):
+            player.add_rows(active, shoes.draw(active))
+
+    active = np.flatnonzero(dealer_must_hit(dealer, rules))
+    while len(active):
+        dealer.add_rows(active, shoes.draw(active))
+        active = active[dealer_must_hit(dealer, rules, active)]
+
+    ps, ds = player.total, dealer.total
+    bust = ps > 21
+    dealer_wins_bj = ~bust & dealer_bj & ~player_bj
+    rest = ~bust & ~dealer_wins_bj
+    wins = rest & ((ds > 21) | (ps > ds))
+    ties = rest & ~wins & (ps == ds)
+    bj_tie = ties & player_bj & ~dealer_bj
+    push = ties & ~bj_tie
+    blackjack_pay = int(bet * rules.blackjack_payout)
+
+    payout = np.full(n, -bet, dtype=np.int32)
+    payout[wins] = bet
+    payout[wins & player_bj] = blackjack_pay
+    payout[bj_tie] = blackjack_pay
+    payout[push] = 0
+    return payout, bust, push
+
+
+class StrategyStats:
+    def __init__(self, name, bet):
+        self.name = name
+        self.bet = bet
+        self.hands = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.busts = 0
+        self.pushes = 0
+
+    def add(self, payout, bust, push):
+        units = payout / self.bet
+        self.hands += len(payout)
+        self.total += float(units.sum())
+        self.total_sq += float((units * units).sum())
+        self.busts += int(bust.sum())
+        self.pushes += int(push.sum())
+
+    def merge(self, other):
+        self.hands += other.hands
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.busts += other.busts
+        self.pushes += other.pushes
+        return self
+
+    def expected_value(self):
+        return self.total / self.hands if self.hands else 0.0
+
+    def ev_interval(self, z=Z_95):
+        if self.hands < 2:
+            return (0.0, 0.0)
+        mean = self.expected_value()
+        variance = max(self.total_sq / self.hands - mean * mean, 0.0)
+        half = z * math.sqrt(variance / self.hands)
+        return (mean - half, mean + half)
+
+    def rate_interval(self, count, z=Z_95):
+        if not self.hands:
+            return (0.0, 0.0, 0.0)
+        p = count / self.hands
+        half = z * math.sqrt(p * (1 - p) / self.hands)
+        return (p, p - half, p + half)
+
+    def summary(self):
+        low, high = self.ev_interval()
+        bust, bust_low, bust_high = self.rate_interval(self.busts)
+        push, push_low, push_high = self.rate_interval(self.pushes)
+        return (f"{self.name}: EV {self.expected_value():+.5f} [{low:+.5f}, {high:+.5f}] | "
+                f"bust {bust:.5f} [{bust_low:.5f}, {bust_high:.5f}] | "
+                f"push {push:.5f} [{push_low:.5f}, {push_high:.5f}]")
+
+
+def simulate(n, strategies=None, seed=None, bet=engine.DEFAULT_SIM_BET, chunk=DEFAULT_CHUNK,
+             rules=engine.DEFAULT_RULES):
+    # Every strategy plays the same decks, so differences between them are
+    # not swamped by dealing noise.
+    strategies = strategies or [engine.StandOn()]
+    rng = np.random.default_rng(seed)
+    tables = [hit_table_of(s) for s in strategies]
+    stats = [StrategyStats(name, bet) for name, table in tables]
+    remaining = n
+    while remaining > 0:
+        size = min(chunk, remaining)
+        uniforms = deal_uniforms(rng, size)
+        for (name, table), stat in zip(tables, stats):
+            stat.add(*play_chunk(uniforms, table, bet, rules))
+        remaining -= size
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Vectorized Black Jack Monte Carlo")
+    parser.add_argument("hands", type=int, nargs="?", default=10000000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--stand-on", type=int, nargs="*", default=[17])
+    parser.add_argument("--basic", action="store_true", help="also play the basic-strategy advisor")
+    parser.add_argument("--bet", type=int, default=engine.DEFAULT_SIM_BET)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    engine.add_rules_arguments(parser)
+    args = parser.parse_args()
+    rules = engine.rules_from_args(args)
+
+    strategies = [engine.StandOn(t) for t in args.stand_on]
+    if args.basic:
+        from strategy import get_advisor
+        strategies.append(get_advisor(rules=rules))
+
+    start = time.perf_counter()
+    results = simulate(args.hands, strategies, args.seed, args.bet, args.chunk, rules)
+    elapsed = time.perf_counter() - start
+    for stat in results:
+        print(stat.summary())
+    print(f"{args.hands:,} hands x {len(results)} strategies in {elapsed:.2f}s")
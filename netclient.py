@@ -0,0 +1,204 @@
+import asyncio
+import queue
+import threading
+
+import protocol
+
+# Client side of the table server. TableClient is the asyncio connection
+# used by both the load test (netload.py) and the window below. The window
+# is a thin renderer: the server owns the shoe, the rules and the balances,
+# and the window only draws the latest STATE it received and sends the
+# player's bets and actions.
+
+
+class TableClient:
+    def __init__(self, name):
+        self.name = name
+        self.reader = None
+        self.writer = None
+        self.table = None
+        self.seat = None
+        self.state = None
+        self.seq = 0
+
+    async def connect(self, host=protocol.DEFAULT_HOST, port=protocol.DEFAULT_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(protocol.hello(self.name))
+        kind, message = await self.receive()
+        if kind != protocol.WELCOME:
+            self.close()
+            raise ConnectionError(message.get("message", f"Unexpected reply {kind}"))
+        self.table, self.seat = message["table"], message["seat"]
+
+    async def receive(self):
+        kind, body = await protocol.read_message(self.reader)
+        message = protocol.decode(kind, body)
+        if kind == protocol.STATE:
+            self.state = message
+        return kind, message
+
+    def send(self, encode, *args):
+        # Returns the sequence number the server will echo back in STATE
+        self.seq += 1
+        self.writer.write(encode(self.seq, *args))
+        return self.seq
+
+    def bet(self, amount):
+        return self.send(protocol.bet, amount)
+
+    def hit(self):
+        return self.send(protocol.hit)
+
+    def stop(self):
+        return self.send(protocol.stop)
+
+    def my_turn(self):
+        return (self.state is not None and self.state["phase"] == protocol.PLAYING
+                and self.state["turn"] == self.seat)
+
+    def my_seat(self):
+        return self.state["seats"][self.seat] if self.state else None
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+class NetworkThread(threading.Thread):
+    # Runs a TableClient on its own asyncio loop so the window never waits
+    # on the socket. Everything the server sends is put on inbox; the window
+    # sends through call(), which hands the work to the network loop.
+    def __init__(self, name, host, port):
+        super().__init__(daemon=True)
+        self.client = TableClient(name)
+        self.host = host
+        self.port = port
+        self.inbox = queue.Queue()
+        self.loop = None
+
+    def run(self):
+        asyncio.run(self.main())
+
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        try:
+            await self.client.connect(self.host, self.port)
+        except (OSError, ConnectionError) as e:
+            self.inbox.put((protocol.ERROR, {"code": 0, "message": f"Could not join: {e}"}))
+            return
+        self.inbox.put((protocol.WELCOME, {"table": self.client.table, "seat": self.client.seat}))
+        try:
+            while True:
+                self.inbox.put(await self.client.receive())
+        except (asyncio.IncompleteReadError, ConnectionError, protocol.ProtocolError):
+            self.inbox.put((protocol.ERROR, {"code": 0, "message": "Disconnected from the server"}))
+
+    def call(self, method, *args):
+        if self.loop:
+            self.loop.call_soon_threadsafe(method, *args)
+
+
+def card_label(card_id):
+    from engine import CARDS
+    card = CARDS[card_id]
+    rank = card.rank if card.rank.isdigit() else card.rank[0].upper()
+    return rank + card.suit[0]
+
+
+def run_window(name, host=protocol.DEFAULT_HOST, port=protocol.DEFAULT_PORT):
+    # Imported here so the load test never needs pygame or a display
+    import pygame
+    import blackjack as ui
+    from engine import CARDS
+
+    network = NetworkThread(name, host, port)
+    network.start()
+    client = network.client
+    status = f"Connecting to {host}:{port}..."
+    last_result = ""
+
+    buttons = [ui.Button(50 + i * 110, ui.HEIGHT - 60, 100, 40, f"Bet {amount}",
+                         lambda amount=amount: network.call(client.bet, amount))
+               for i, amount in enumerate((50, 100, 500))]
+    hit_button = ui.Button(ui.WIDTH - 230, ui.HEIGHT - 60, 80, 40, "Hit", lambda: network.call(client.hit))
+    stop_button = ui.Button(ui.WIDTH - 140, ui.HEIGHT - 60, 80, 40, "Stop", lambda: network.call(client.stop))
+
+    def draw_cards(card_ids, x, y):
+        for card_id in card_ids:
+            image = ui.card_back() if card_id == protocol.HIDDEN_CARD else ui.card_image(CARDS[card_id])
+            ui.screen.blit(image, (x, y))
+            x += 40
+
+    running = True
+    while running:
+        while not network.inbox.empty():
+            kind, message = network.inbox.get()
+            if kind == protocol.WELCOME:
+                status = f"Table {message['table']}, seat {message['seat'] + 1}"
+            elif kind == protocol.RESULT:
+                mine = [row for row in message["rows"] if row["seat"] == client.seat]
+                if mine:
+                    last_result = f"Last round: {mine[0]['outcome']} {mine[0]['payout']:+d}, balance {mine[0]['balance']}"
+            elif kind == protocol.ERROR:
+                status = message["message"]
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+            state = client.state
+            if state and state["phase"] == protocol.BETTING and client.my_seat() and not client.my_seat()["bet"]:
+                for button in buttons:
+                    button.handle_event(event)
+            if client.my_turn():
+                hit_button.handle_event(event)
+                stop_button.handle_event(event)
+
+        ui.screen.blit(ui.table_background(), (0, 0))
+        ui.screen.blit(ui.render_text(ui.FONT_MEDIUM, status, ui.WHITE), (50, 15))
+        state = client.state
+        if state:
+            dealer = state["dealer"]
+            ui.screen.blit(ui.render_text(ui.FONT, f"Dealer: {dealer['total'] or ''}", ui.WHITE), (50, 45))
+            draw_cards(dealer["cards"], 50, 65)
+
+            y = 220
+            for idx, seat in enumerate(state["seats"]):
+                if seat is None or idx == client.seat:
+                    continue
+                cards = " ".join(card_label(card_id) for card_id in seat["cards"])
+                turn = "  <- playing" if state["phase"] == protocol.PLAYING and state["turn"] == idx else ""
+                line = f"{seat['name']}  bet {seat['bet']}  {cards} ({seat['total']}){turn}"
+                color = ui.HIGHLIGHT_COLOR if turn else ui.WHITE
+                ui.screen.blit(ui.render_text(ui.FONT, line, color), (50, y))
+                y += 22
+
+            seat = client.my_seat()
+            if seat:
+                color = ui.HIGHLIGHT_COLOR if client.my_turn() else ui.WHITE
+                label = f"{seat['name']} | Balance: {seat['balance']} | Bet: {seat['bet']} | Score: {seat['total']}"
+                ui.screen.blit(ui.render_text(ui.FONT_MEDIUM, label, color), (50, ui.HEIGHT - 250))
+                draw_cards(seat["cards"], 50, ui.HEIGHT - 225)
+                if state["phase"] == protocol.BETTING and not seat["bet"]:
+                    for button in buttons:
+                        button.draw(ui.screen)
+                if client.my_turn():
+                    hit_button.draw(ui.screen)
+                    stop_button.draw(ui.screen)
+        if last_result:
+            ui.screen.blit(ui.render_text(ui.FONT, last_result, ui.WHITE), (50, ui.HEIGHT - 80))
+        pygame.display.flip()
+        ui.clock.tick(ui.FPS)
+
+    network.call(client.close)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Join a Black Jack table server")
+    parser.add_argument("name")
+    parser.add_argument("--host", default=protocol.DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=protocol.DEFAULT_PORT)
+    args = parser.parse_args()
+    run_window(args.name, args.host, args.port)
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import protocol
+from engine import StandOn
+from netclient import TableClient
+from profiler import percentile
+from server import SEATS_PER_TABLE
+
+# Loopback load test for the table server. Starts server.py in its own
+# process, connects N simulated players from this one, and lets them play
+# with a human-ish think time before every bet and action (stand on 17).
+# Reports the p50/p99 latency from sending an action to seeing the STATE
+# that applied it, and the server's CPU use, from which it estimates how
+# many tables of this activity one core can carry. A refused bet or action
+# is retried from the latest STATE; a bot refused MAX_REFUSALS times in a
+# row, or too broke to bet, leaves the table.
+
+DEFAULT_PLAYERS = 1000
+DEFAULT_SECONDS = 20.0
+DEFAULT_THINK_MS = 250
+DEFAULT_BET = 100
+CONNECT_BATCH = 100
+MAX_REFUSALS = 3
+
+
+class Bot:
+    def __init__(self, name, think_ms, latencies, refused, rng):
+        self.client = TableClient(name)
+        self.think_ms = think_ms
+        self.latencies = latencies
+        self.refused = refused
+        self.rng = rng
+        self.strategy = StandOn(17)
+        self.pending = None  # (seq, kind, sent time)
+        self.refusals = 0  # in a row
+
+    async def think(self):
+        if self.think_ms:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_ms) / 1000)
+
+    async def play(self, stop_at):
+        client = self.client
+        while time.perf_counter() < stop_at:
+            kind, message = await client.receive()
+            if kind == protocol.ERROR and self.pending:
+                # Refused: nothing will echo the seq, so decide again from the last STATE
+                self.refused[self.pending[1]] += 1
+                self.pending = None
+                self.refusals += 1
+                if self.refusals >= MAX_REFUSALS:
+                    return self.leave()
+            elif kind != protocol.STATE:
+                continue
+            elif self.pending and message["actor"] == client.seat and message["seq"] == self.pending[0]:
+                self.latencies[self.pending[1]].append(time.perf_counter() - self.pending[2])
+                self.pending = None
+                self.refusals = 0
+            if self.pending:
+                continue
+            seat = client.my_seat()
+            if client.state["phase"] == protocol.BETTING and not seat["bet"]:
+                if not seat["balance"]:
+                    return self.leave()
+                await self.think()
+                self.pending = (client.bet(min(DEFAULT_BET, seat["balance"])), "bet", time.perf_counter())
+            elif client.my_turn():
+                await self.think()
+                if seat["total"] < self.strategy.threshold:
+                    self.pending = (client.hit(), "hit", time.perf_counter())
+                else:
+                    self.pending = (client.stop(), "stop", time.perf_counter())
+
+    def leave(self):
+        self.refused["dropped"] += 1
+        self.client.close()
+
+
+async def server_stats(port):
+    reader, writer = await asyncio.open_connection(protocol.DEFAULT_HOST, port)
+    writer.write(protocol.stats_request())
+    kind, body = await protocol.read_message(reader)
+    writer.close()
+    return protocol.decode(kind, body)
+
+
+def start_server(seats, seed):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    process = subprocess.Popen([sys.executable, script, "--port", "0", "--seats", str(seats), "--seed", str(seed)],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Listening on"):
+        process.kill()
+        raise RuntimeError(f"Server did not start: {line!r}")
+    return process, int(line.rsplit(":", 1)[1])
+
+
+async def run(players, seconds, think_ms, port, seed):
+    rng = random.Random(seed)
+    latencies = {"bet": [], "hit": [], "stop": []}
+    refused = {"bet": 0, "hit": 0, "stop": 0, "dropped": 0}
+    bots = [Bot(f"load{i}", think_ms, latencies, refused, rng) for i in range(players)]
+    for start in range(0, players, CONNECT_BATCH):
+        await asyncio.gather(*(bot.client.connect(protocol.DEFAULT_HOST, port)
+                               for bot in bots[start:start + CONNECT_BATCH]))
+    before = await server_stats(port)
+    stop_at = time.perf_counter() + seconds
+    tasks = [asyncio.create_task(bot.play(stop_at)) for bot in bots]
+    await asyncio.sleep(seconds)
+    after = await server_stats(port)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for bot in bots:
+        bot.client.close()
+    return before, after, latencies, refused
+
+
+def report(players, think_ms, before, after, latencies, refused):
+    wall = after["wall_seconds"] - before["wall_seconds"]
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+    rounds = after["rounds"] - before["rounds"]
+    actions = after["actions"] - before["actions"]
+    utilization = cpu / wall if wall else 0.0
+    tables = after["tables"]
+    everything = [sample for samples in latencies.values() for sample in samples]
+    print(f"{players} players at {tables} tables, think time ~{think_ms} ms, {wall:.1f}s measured")
+    print(f"Server: {rounds / wall:,.1f} rounds/s, {actions / wall:,.0f} actions/s, "
+          f"{utilization:.1%} of one core")
+    if utilization:
+        print(f"Estimated capacity: {tables / utilization:,.0f} tables per core at this pace")
+    print(f"{'action':<8}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, samples in list(latencies.items()) + [("all", everything)]:
+        print(f"{kind:<8}{len(samples):>8}{percentile(samples, 0.5) * 1000:>10.2f}"
+              f"{percentile(samples, 0.99) * 1000:>10.2f}{max(samples, default=0) * 1000:>10.2f}")
+    print(f"Refused: {refused['bet']} bets, {refused['hit']} hits, {refused['stop']} stops; "
+          f"{refused['dropped']} bots left the table")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Loopback load test for the table server")
+    parser.add_argument("--players", type=int, default=DEFAULT_PLAYERS)
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS)
+    parser.add_argument("--think-ms", type=int, default=DEFAULT_THINK_MS)
+    parser.add_argument("--seats", type=int, default=SEATS_PER_TABLE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=None, help="use an already running server")
+    args = parser.parse_args()
+
+    process = None
+    port = args.port
+    if port is None:
+        process, port = start_server(args.seats, args.seed)
+    try:
+        before, after, latencies, refused = asyncio.run(run(args.players, args.seconds, args.think_ms, port,
+                                                            args.seed))
+        report(args.players, args.think_ms, before, after, latencies, refused)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
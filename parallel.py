@@ -0,0 +1,112 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+
+# Spreads a simulation over a process pool. The work is cut into chunks of a
+# fixed size whatever the number of workers, every chunk gets its own RNG
+# seeded from (seed, chunk index), and results are merged in chunk order.
+# The same seed therefore gives identical totals on 1 or 64 cores.
+
+DEFAULT_CHUNK_ROUNDS = 50000
+DEFAULT_CHUNK_HANDS = 1000000
+
+
+def chunk_seed(seed, index):
+    # Independent, reproducible stream for one chunk of an engine run
+    return f"{seed}:{index}"
+
+
+def plan_chunks(n, chunk_size):
+    sizes = [chunk_size] * (n // chunk_size)
+    if n % chunk_size:
+        sizes.append(n % chunk_size)
+    return sizes
+
+
+def _engine_chunk(job):
+    size, strategy, seed, num_players, bet = job
+    return engine.simulate_rounds(size, strategy, seed, num_players, bet)
+
+
+def _numpy_chunk(job):
+    import montecarlo
+    size, strategies, seed_sequence, bet = job
+    return montecarlo.simulate(size, strategies, seed_sequence, bet)
+
+
+def run_jobs(function, jobs, workers):
+    if workers == 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, which keeps merging deterministic
+        return list(pool.map(function, jobs))
+
+
+def simulate_parallel(n, strategy=None, seed=None, workers=None, num_players=1,
+                      bet=engine.DEFAULT_SIM_BET, chunk_size=DEFAULT_CHUNK_ROUNDS):
+    # Parallel engine.simulate_rounds. The strategy has to be picklable.
+    strategy = strategy or engine.StandOn()
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    workers = workers or os.cpu_count()
+    jobs = [(size, strategy, chunk_seed(seed, index), num_players, bet)
+            for index, size in enumerate(plan_chunks(n, chunk_size))]
+    result = engine.SimulationResult(bet)
+    for chunk in run_jobs(_engine_chunk, jobs, workers):
+        result.merge(chunk)
+    result.seed = seed
+    return result
+
+
+def simulate_vectorized_parallel(n, strategies=None, seed=None, workers=None,
+                                 bet=engine.DEFAULT_SIM_BET, chunk_size=DEFAULT_CHUNK_HANDS):
+    # Parallel montecarlo.simulate, one NumPy SeedSequence child per chunk
+    import numpy as np
+
+    strategies = strategies or [engine.StandOn()]
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    workers = workers or os.cpu_count()
+    sizes = plan_chunks(n, chunk_size)
+    children = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(size, strategies, child, bet) for size, child in zip(sizes, children)]
+    merged = None
+    for chunk in run_jobs(_numpy_chunk, jobs, workers):
+        if merged is None:
+            merged = chunk
+        else:
+            for total, part in zip(merged, chunk):
+                total.merge(part)
+    return merged
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Multi-core Black Jack simulation")
+    parser.add_argument("rounds", type=int, nargs="?", default=1000000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count()],
+                        help="one or more worker counts; several values print a scaling table")
+    parser.add_argument("--stand-on", type=int, default=17)
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy simulator in each worker")
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        if args.vectorized:
+            stats = simulate_vectorized_parallel(args.rounds, [engine.StandOn(args.stand_on)], args.seed, workers)
+            summary = "\n".join(stat.summary() for stat in stats)
+        else:
+            result = simulate_parallel(args.rounds, engine.StandOn(args.stand_on), args.seed, workers, args.players)
+            summary = f"seed {result.seed}\n{result.summary()}"
+        elapsed = time.perf_counter() - start
+        rate = args.rounds / elapsed
+        baseline = baseline or rate
+        print(summary)
+        print(f"{workers} workers: {elapsed:.2f}s, {rate:,.0f} rounds/s, {rate / baseline:.2f}x")
@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict, deque
+
+from history import PlayerStats, RECENT_ROUNDS
+from storage import DEFAULT_DIRECTORY_LIMIT, LEADERBOARD_ORDERS
+
+# Process-wide write-behind cache in front of a PlayerStore. Loads are served
+# from memory after the first read of each profile, and the username list is
+# read from disk once. Saved rounds only update the cached copy and mark it
+# dirty; dirty profiles are written together in one transaction every
+# flush_rounds rounds or flush_seconds seconds, whichever comes first, and
+# whenever flush() is called (the game calls it on quit). It has the same
+# load / save / save_many / usernames / leaderboard / search interface as
+# PlayerStore. Directory queries lay the unsaved profiles over the store's
+# results rather than flushing, so they see the latest balances without
+# costing a write.
+#
+# Flushing happens at round boundaries, on the thread that saves the round,
+# because a sqlite3 connection belongs to the thread that opened it.
+
+DEFAULT_MAX_PROFILES = 64
+DEFAULT_FLUSH_ROUNDS = 25
+DEFAULT_FLUSH_SECONDS = 60.0
+
+
+class ProfileCache:
+    def __init__(self, store, max_profiles=DEFAULT_MAX_PROFILES,
+                 flush_rounds=DEFAULT_FLUSH_ROUNDS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.store = store
+        self.max_profiles = max_profiles
+        self.flush_rounds = flush_rounds
+        self.flush_seconds = flush_seconds
+        self.profiles = OrderedDict()
+        self.dirty = set()
+        self.names = None
+        self.rounds_since_flush = 0
+        self.last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+
+    def usernames(self):
+        if self.names is None:
+            self.names = self.store.usernames()
+        return list(self.names)
+
+    def leaderboard(self, order="balance", limit=DEFAULT_DIRECTORY_LIMIT):
+        if order not in LEADERBOARD_ORDERS:
+            raise ValueError(f"unknown leaderboard order {order!r}")
+        # The stored ranks of unsaved profiles are stale, so each one can
+        # push at most one other player out of the stored top limit
+        entries = self.store.leaderboard(order, limit + len(self.dirty))
+        return self.overlay(entries, self.dirty, lambda entry: (-entry[order], entry["name"]), limit)
+
+    def search(self, prefix, limit=DEFAULT_DIRECTORY_LIMIT):
+        entries = self.store.search(prefix, limit)
+        unsaved = [name for name in self.dirty if name.startswith(prefix)]
+        return self.overlay(entries, unsaved, lambda entry: entry["name"], limit)
+
+    def overlay(self, entries, names, key, limit):
+        # Directory entries with the cached copies of names in place of (or
+        # as well as) the stored ones, re-sorted by key
+        if not names:
+            return entries[:limit]
+        merged = {entry["name"]: entry for entry in entries}
+        for name in names:
+            profile = self.profiles[name]
+            merged[name] = {"name": name, "balance": profile["balance"],
+                            "rounds": profile["stats"].rounds, "net": profile["stats"].net}
+        return sorted(merged.values(), key=key)[:limit]
+
+    def entry(self, name):
+        profile = self.profiles.get(name)
+        if profile is not None:
+            self.profiles.move_to_end(name)
+            self.hits += 1
+            return profile
+        self.misses += 1
+        stored = self.store.load(name)
+        profile = {"balance": stored["balance"], "stats": stored["stats"],
+                   "recent": deque(stored["recent"], maxlen=RECENT_ROUNDS), "pending": []}
+        self.profiles[name] = profile
+        self.evict()
+        return profile
+
+    def evict(self):
+        while len(self.profiles) > self.max_profiles:
+            name = next(iter(self.profiles))
+            if name in self.dirty:
+                # Never drop unsaved rounds: write everything out first
+                self.flush()
+            del self.profiles[name]
+
+    def load(self, name):
+        # Hands out copies, so callers can update theirs freely until they save
+        profile = self.entry(name)
+        return {"balance": profile["balance"], "stats": PlayerStats(*profile["stats"].as_row()),
+                "recent": list(profile["recent"])}
+
+    def save(self, name, profile):
+        self.save_many([(name, profile)])
+
+    def save_many(self, profiles):
+        # Called once per round with every player at the table
+        for name, profile in profiles:
+            cached = self.entry(name)
+            cached["balance"] = profile["balance"]
+            for record in profile.get("pending", []):
+                cached["stats"].add(record)
+                cached["recent"].append(record)
+                cached["pending"].append(record)
+            self.dirty.add(name)
+            if self.names is not None and name not in self.names:
+                self.names.append(name)
+        self.rounds_since_flush += 1
+        if (self.rounds_since_flush >= self.flush_rounds
+                or time.monotonic() - self.last_flush >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            self.store.save_many([(name, self.profiles[name]) for name in self.dirty])
+            for name in self.dirty:
+                self.profiles[name]["pending"] = []
+            self.dirty.clear()
+            self.flushes += 1
+        self.rounds_since_flush = 0
+        self.last_flush = time.monotonic()
+
+    def stats(self):
+        return {"profiles": len(self.profiles), "dirty": len(self.dirty), "hits": self.hits,
+                "misses": self.misses, "flushes": self.flushes}
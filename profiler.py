@@ -0,0 +1,217 @@
+import cProfile
+import json
+import os
+import random
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Opt-in instrumentation. Named sections are timed with
+#     with PROFILER.section("draw_table"): ...
+# or the @PROFILER.timed("name") decorator, counters are bumped with
+# PROFILER.count(name), and the game loop calls PROFILER.frame() once per
+# frame for FPS and frame-time percentiles. Every section is also kept as a
+# Chrome trace event (open the exported file in chrome://tracing or
+# Perfetto) unless it is marked trace=False, which suits calls made many
+# times a frame. cProfile can run alongside for a function-level view.
+#
+# Disabled, timed() hands back the undecorated function and section()
+# returns one shared no-op context, so instrumented code costs next to
+# nothing. Nothing here needs pygame.
+
+MAX_TRACE_EVENTS = 200000
+FRAME_WINDOW = 600
+RESERVOIR_SIZE = 4096
+TRACE_FILE = "profile_trace.json"
+STATS_FILE = "profile_stats.txt"
+CPROFILE_FILE = "profile.prof"
+
+NULL_SECTION = nullcontext()
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PhaseTimer:
+    # Count, total and max of every sample, plus a fixed-size reservoir for
+    # percentiles, so memory stays flat however long the run is
+    def __init__(self, rng=None, size=RESERVOIR_SIZE):
+        self.rng = rng or random.Random(0)
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.samples) < self.size:
+            self.samples.append(seconds)
+        else:
+            slot = self.rng.randrange(self.count)
+            if slot < self.size:
+                self.samples[slot] = seconds
+
+    def percentile(self, q):
+        return percentile(self.samples, q)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Section:
+    __slots__ = ('profiler', 'name', 'trace', 'start')
+
+    def __init__(self, profiler, name, trace=True):
+        self.profiler = profiler
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.trace)
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled=False, use_cprofile=False):
+        self.enabled = enabled
+        self.timers = {}
+        self.counters = {}
+        self.frame_times = deque(maxlen=FRAME_WINDOW)
+        self.last_frame = None
+        self.frames = 0
+        self.trace = []
+        self.dropped_events = 0
+        self.origin = time.perf_counter()
+        self.cprofile = None
+        if enabled and use_cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    # Instrumentation
+    def section(self, name, trace=True):
+        return Section(self, name, trace) if self.enabled else NULL_SECTION
+
+    def timed(self, name=None, trace=True):
+        def decorate(func):
+            if not self.enabled:
+                return func
+            label = name or func.__name__
+
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(label, start, time.perf_counter(), trace)
+            wrapper.__name__ = func.__name__
+            wrapper.__wrapped__ = func
+            return wrapper
+        return decorate
+
+    def counted(self, name, func):
+        # Wraps func to bump a counter on every call; only used when enabled
+        counters = self.counters
+
+        def wrapper(*args, **kwargs):
+            counters[name] = counters.get(name, 0) + 1
+            return func(*args, **kwargs)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, start, end, trace=True):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = PhaseTimer()
+        timer.add(end - start)
+        if not trace:
+            return
+        if len(self.trace) < MAX_TRACE_EVENTS:
+            self.trace.append((name, start, end))
+        else:
+            self.dropped_events += 1
+
+    def frame(self):
+        # Call once per frame; the time between calls is the frame time
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times.append(now - self.last_frame)
+        self.last_frame = now
+        self.frames += 1
+
+    # Reporting
+    def fps(self):
+        total = sum(self.frame_times)
+        return len(self.frame_times) / total if total else 0.0
+
+    def frame_percentiles(self, qs=(0.5, 0.95, 0.99)):
+        # Milliseconds over the last FRAME_WINDOW frames
+        return [percentile(self.frame_times, q) * 1000 for q in qs]
+
+    def overlay_lines(self):
+        p50, p95, p99 = self.frame_percentiles()
+        lines = [f"FPS {self.fps():.0f}  frame p50 {p50:.1f} p95 {p95:.1f} p99 {p99:.1f} ms"]
+        busiest = sorted(self.timers.items(), key=lambda item: item[1].total, reverse=True)[:4]
+        for name, timer in busiest:
+            lines.append(f"{name} {timer.mean() * 1000:.2f} ms x{timer.count}")
+        return lines
+
+    def summary(self):
+        lines = [f"Frames: {self.frames}, FPS {self.fps():.1f}",
+                 "Frame time p50/p95/p99: " + " / ".join(f"{ms:.2f}" for ms in self.frame_percentiles()) + " ms",
+                 "",
+                 f"{'section':<20}{'count':>9}{'total ms':>11}{'mean ms':>10}{'p99 ms':>9}{'max ms':>9}"]
+        for name, timer in sorted(self.timers.items(), key=lambda item: item[1].total, reverse=True):
+            lines.append(f"{name:<20}{timer.count:>9}{timer.total * 1000:>11.1f}{timer.mean() * 1000:>10.3f}"
+                         f"{timer.percentile(0.99) * 1000:>9.3f}{timer.max * 1000:>9.3f}")
+        if self.counters:
+            lines.append("")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<20}{value:>9}")
+        if self.dropped_events:
+            lines.append(f"\n{self.dropped_events} trace events dropped after the first {MAX_TRACE_EVENTS}")
+        return "\n".join(lines)
+
+    def export_trace(self, path=TRACE_FILE):
+        # Chrome trace event format, complete ("X") events in microseconds
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "pid": pid, "tid": 0,
+                   "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+                  for name, start, end in self.trace]
+        events += [{"name": name, "ph": "C", "pid": pid, "tid": 0,
+                    "ts": (time.perf_counter() - self.origin) * 1e6, "args": {"value": value}}
+                   for name, value in self.counters.items()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export(self, trace_path=TRACE_FILE, stats_path=STATS_FILE, cprofile_path=CPROFILE_FILE):
+        # Writes every report for the session; returns the paths written
+        if not self.enabled:
+            return []
+        written = []
+        self.export_trace(trace_path)
+        written.append(trace_path)
+        with open(stats_path, "w") as f:
+            f.write(self.summary() + "\n")
+        written.append(stats_path)
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(cprofile_path)
+            written.append(cprofile_path)
+        return written
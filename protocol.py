@@ -0,0 +1,210 @@
+import struct
+
+from history import OUTCOME_CODES, OUTCOMES_BY_CODE
+
+# Wire protocol between the table server (server.py) and its clients. Every
+# message is a 3-byte header, body length (uint16) then message type
+# (uint8), followed by a packed big-endian body. Cards travel as their
+# engine card id in a single byte, so a full six-seat table snapshot is a
+# couple of hundred bytes.
+#
+# Player actions carry a sequence number chosen by the client. The STATE
+# broadcast that an action causes echoes the acting seat and that number,
+# which is how a client knows its action has been applied (and how the load
+# test measures action latency).
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Client -> server
+HELLO = 1         # name
+BET = 2           # seq, amount
+HIT = 3           # seq
+STOP = 4          # seq
+STATS = 5         # (empty) server counters, for load tests
+
+# Server -> client
+WELCOME = 16      # table id, seat
+STATE = 17        # table snapshot
+RESULT = 18       # settlement of a finished round
+ERROR = 19        # code, message
+STATS_REPLY = 20
+
+# Table phases
+BETTING = 0
+PLAYING = 1
+
+# Error codes
+BAD_MESSAGE = 1
+NOT_YOUR_TURN = 2
+BAD_BET = 3
+NAME_IN_USE = 4
+
+HEADER = struct.Struct("!HB")
+ACTION = struct.Struct("!I")
+BET_BODY = struct.Struct("!II")
+WELCOME_BODY = struct.Struct("!IB")
+STATE_HEAD = struct.Struct("!IBBBI")
+SEAT_HEAD = struct.Struct("!iIBB")
+RESULT_ROW = struct.Struct("!BBii")
+STATS_BODY = struct.Struct("!IIIIdd")
+
+MAX_NAME_BYTES = 32
+HIDDEN_CARD = 255  # the dealer's hole card before it is turned over
+NO_SEAT = 255
+SEAT_STOPPED, SEAT_BLACKJACK, SEAT_IN_ROUND = 1, 2, 4
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def frame(kind, body=b""):
+    return HEADER.pack(len(body), kind) + body
+
+
+async def read_message(reader):
+    # Returns (kind, body); raises asyncio.IncompleteReadError on disconnect
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    body = await reader.readexactly(length) if length else b""
+    return kind, body
+
+
+def pack_text(text, limit=255):
+    data = text.encode("utf-8")[:limit]
+    return bytes((len(data),)) + data
+
+
+def unpack_text(body, offset):
+    length = body[offset]
+    end = offset + 1 + length
+    return body[offset + 1:end].decode("utf-8", "replace"), end
+
+
+def pack_cards(card_ids):
+    return bytes((len(card_ids),)) + bytes(card_ids)
+
+
+def unpack_cards(body, offset):
+    count = body[offset]
+    end = offset + 1 + count
+    return list(body[offset + 1:end]), end
+
+
+# Client messages
+def hello(name):
+    return frame(HELLO, pack_text(name, MAX_NAME_BYTES))
+
+
+def bet(seq, amount):
+    return frame(BET, BET_BODY.pack(seq, amount))
+
+
+def hit(seq):
+    return frame(HIT, ACTION.pack(seq))
+
+
+def stop(seq):
+    return frame(STOP, ACTION.pack(seq))
+
+
+def stats_request():
+    return frame(STATS)
+
+
+# Server messages
+def welcome(table_id, seat):
+    return frame(WELCOME, WELCOME_BODY.pack(table_id, seat))
+
+
+def error(code, message):
+    return frame(ERROR, bytes((code,)) + pack_text(message))
+
+
+def state(table_id, phase, turn, actor, seq, dealer_cards, dealer_total, seats):
+    # seats: one entry per seat, None when empty, otherwise
+    # (name, balance, bet, flags, total, card_ids)
+    parts = [STATE_HEAD.pack(table_id, phase, turn, actor, seq),
+             pack_cards(dealer_cards), bytes((dealer_total,)), bytes((len(seats),))]
+    for seat in seats:
+        if seat is None:
+            parts.append(b"\x00")
+            continue
+        name, balance, amount, flags, total, cards = seat
+        parts.append(b"\x01")
+        parts.append(pack_text(name, MAX_NAME_BYTES))
+        parts.append(SEAT_HEAD.pack(balance, amount, flags, total))
+        parts.append(pack_cards(cards))
+    return frame(STATE, b"".join(parts))
+
+
+def result(table_id, rows):
+    # rows: (seat, outcome, payout, balance)
+    body = ACTION.pack(table_id) + bytes((len(rows),))
+    body += b"".join(RESULT_ROW.pack(seat, OUTCOME_CODES[outcome], payout, balance)
+                     for seat, outcome, payout, balance in rows)
+    return frame(RESULT, body)
+
+
+def stats_reply(tables, players, rounds, actions, cpu_seconds, wall_seconds):
+    return frame(STATS_REPLY, STATS_BODY.pack(tables, players, rounds, actions, cpu_seconds, wall_seconds))
+
+
+# Decoding, into plain dicts
+def decode(kind, body):
+    try:
+        if kind == HELLO:
+            return {"name": unpack_text(body, 0)[0]}
+        if kind == BET:
+            seq, amount = BET_BODY.unpack(body)
+            return {"seq": seq, "amount": amount}
+        if kind in (HIT, STOP):
+            return {"seq": ACTION.unpack(body)[0]}
+        if kind == STATS:
+            return {}
+        if kind == WELCOME:
+            table_id, seat = WELCOME_BODY.unpack(body)
+            return {"table": table_id, "seat": seat}
+        if kind == STATE:
+            return decode_state(body)
+        if kind == RESULT:
+            return decode_result(body)
+        if kind == ERROR:
+            return {"code": body[0], "message": unpack_text(body, 1)[0]}
+        if kind == STATS_REPLY:
+            return dict(zip(("tables", "players", "rounds", "actions", "cpu_seconds", "wall_seconds"),
+                            STATS_BODY.unpack(body)))
+    except (struct.error, IndexError) as e:
+        raise ProtocolError(f"Malformed message of type {kind}: {e}")
+    raise ProtocolError(f"Unknown message type {kind}")
+
+
+def decode_state(body):
+    table_id, phase, turn, actor, seq = STATE_HEAD.unpack_from(body, 0)
+    dealer_cards, offset = unpack_cards(body, STATE_HEAD.size)
+    dealer_total = body[offset]
+    count = body[offset + 1]
+    offset += 2
+    seats = []
+    for _ in range(count):
+        occupied = body[offset]
+        offset += 1
+        if not occupied:
+            seats.append(None)
+            continue
+        name, offset = unpack_text(body, offset)
+        balance, amount, flags, total = SEAT_HEAD.unpack_from(body, offset)
+        cards, offset = unpack_cards(body, offset + SEAT_HEAD.size)
+        seats.append({"name": name, "balance": balance, "bet": amount, "flags": flags,
+                      "total": total, "cards": cards})
+    return {"table": table_id, "phase": phase, "turn": turn, "actor": actor, "seq": seq,
+            "dealer": {"cards": dealer_cards, "total": dealer_total}, "seats": seats}
+
+
+def decode_result(body):
+    table_id = ACTION.unpack_from(body, 0)[0]
+    rows = []
+    for i in range(body[ACTION.size]):
+        seat, code, payout, balance = RESULT_ROW.unpack_from(body, ACTION.size + 1 + i * RESULT_ROW.size)
+        rows.append({"seat": seat, "outcome": OUTCOMES_BY_CODE[code], "payout": payout, "balance": balance})
+    return {"table": table_id, "rows": rows}
@@ -0,0 +1,359 @@
+import asyncio
+import random
+import signal
+import time
+
+import engine
+import protocol
+from history import make_record
+
+# Networked table server. One asyncio event loop runs any number of tables;
+# every table plays the same rules as the game window (engine.py), dealing
+# from its own shoe. Clients connect, say HELLO with a name, and are seated
+# at the first table with a free seat. A round starts once everyone seated
+# has bet (or BET_TIMEOUT_S after the first bet), players act in seat order,
+# and the dealer plays and the round settles as soon as the last player
+# stops. Each change is broadcast to the table as one STATE message, encoded
+# once and written to every seat.
+#
+# With --db, balances and round history are kept in the same SQLite store as
+# the game window, behind the write-behind profile cache.
+
+SEATS_PER_TABLE = 6
+BET_TIMEOUT_S = 15.0
+ACTION_TIMEOUT_S = 30.0
+
+
+class Seat:
+    __slots__ = ('player', 'writer', 'in_round')
+
+    def __init__(self, player, writer):
+        self.player = player
+        self.writer = writer
+        self.in_round = False
+
+
+class Table:
+    def __init__(self, server, table_id, seats=SEATS_PER_TABLE, rng=None):
+        self.server = server
+        self.id = table_id
+        self.shoe = engine.Shoe(rng=rng)
+        self.dealer = engine.Player("Dealer")
+        self.seats = [None] * seats
+        self.phase = protocol.BETTING
+        self.turn = protocol.NO_SEAT
+        self.timer = None
+        self.leavers = []  # players who left after stopping, settled with the round
+
+    def free_seat(self):
+        for idx, seat in enumerate(self.seats):
+            if seat is None:
+                return idx
+        return None
+
+    def occupied(self):
+        return [(idx, seat) for idx, seat in enumerate(self.seats) if seat is not None]
+
+    # Messages
+    def snapshot(self, actor=protocol.NO_SEAT, seq=0):
+        dealer = self.dealer
+        if dealer.show_second_card or not dealer.hand:
+            dealer_cards = [card.id for card in dealer.hand]
+            dealer_total = dealer.calculate_score() if dealer.hand else 0
+        else:
+            dealer_cards = [dealer.hand[0].id] + [protocol.HIDDEN_CARD] * (len(dealer.hand) - 1)
+            dealer_total = dealer.hand[0].points
+        seats = []
+        for seat in self.seats:
+            if seat is None:
+                seats.append(None)
+                continue
+            player = seat.player
+            flags = ((protocol.SEAT_STOPPED if player.stopped else 0)
+                     | (protocol.SEAT_BLACKJACK if player.blackjack else 0)
+                     | (protocol.SEAT_IN_ROUND if seat.in_round else 0))
+            seats.append((player.name, player.balance, player.bet, flags, min(player.total, 255),
+                          [card.id for card in player.hand]))
+        return protocol.state(self.id, self.phase, self.turn, actor, seq, dealer_cards, dealer_total, seats)
+
+    def broadcast(self, message):
+        for _, seat in self.occupied():
+            seat.writer.write(message)
+
+    def broadcast_state(self, actor=protocol.NO_SEAT, seq=0):
+        self.broadcast(self.snapshot(actor, seq))
+
+    def set_timer(self, delay, callback):
+        if self.timer:
+            self.timer.cancel()
+        self.timer = asyncio.get_running_loop().call_later(delay, callback) if callback else None
+
+    # Seating
+    def join(self, player, writer):
+        idx = self.free_seat()
+        self.seats[idx] = Seat(player, writer)
+        writer.write(protocol.welcome(self.id, idx))
+        self.broadcast_state()
+        return idx
+
+    def leave(self, idx):
+        seat = self.seats[idx]
+        self.seats[idx] = None
+        if self.phase == protocol.PLAYING and seat.in_round and seat.player.stopped:
+            # The hand is already played out: it is settled against the dealer
+            # with everyone else's when the round finishes
+            self.leavers.append(seat.player)
+        elif self.phase == protocol.PLAYING and seat.in_round:
+            # The hand is forfeited: the stake is lost and saved now, and the
+            # seat counts as stopped so the table keeps moving
+            player = seat.player
+            outcome = engine.BUST if player.total > 21 else engine.LOSS
+            player.balance -= player.bet
+            self.server.save_results([(player, make_record(player.bet, outcome, -player.bet, player.balance))])
+            player.stopped = True
+            seat.in_round = False
+            if self.turn == idx:
+                self.advance()
+                return
+        elif self.phase == protocol.BETTING:
+            seat.player.bet = 0
+            if self.all_bets_in():
+                self.start_round()
+                return
+        self.broadcast_state()
+
+    # Round flow
+    def all_bets_in(self):
+        seated = self.occupied()
+        return bool(seated) and all(seat.player.bet > 0 for _, seat in seated)
+
+    def place_bet(self, idx, seq, amount):
+        player = self.seats[idx].player
+        if self.phase != protocol.BETTING or player.bet:
+            return protocol.error(protocol.BAD_BET, "Bets are closed")
+        if not 0 < amount <= player.balance:
+            return protocol.error(protocol.BAD_BET, f"Bet must be between 1 and {player.balance}")
+        player.bet = amount
+        if self.all_bets_in():
+            self.start_round(idx, seq)
+        else:
+            if self.timer is None:
+                self.set_timer(BET_TIMEOUT_S, self.start_round)
+            self.broadcast_state(idx, seq)
+        return None
+
+    def start_round(self, actor=protocol.NO_SEAT, seq=0):
+        self.set_timer(0, None)
+        playing = [seat for _, seat in self.occupied() if seat.player.bet > 0]
+        if not playing:
+            return
+        self.shoe.start_round()
+        for _, seat in self.occupied():
+            seat.player.reset_hand()
+            seat.in_round = seat.player.bet > 0
+        self.dealer.reset_hand()
+        engine.deal_initial(self.shoe, [seat.player for seat in playing] + [self.dealer])
+        for seat in playing:
+            if seat.player.calculate_score() >= 21:
+                seat.player.stopped = True
+        self.phase = protocol.PLAYING
+        self.turn = protocol.NO_SEAT
+        self.advance(actor, seq)
+
+    def advance(self, actor=protocol.NO_SEAT, seq=0):
+        # Moves the turn to the next seat still playing, or finishes the round
+        for idx, seat in self.occupied():
+            if seat.in_round and not seat.player.stopped:
+                self.turn = idx
+                self.set_timer(ACTION_TIMEOUT_S, lambda: self.act(idx, 0, engine.STOP))
+                self.broadcast_state(actor, seq)
+                return
+        self.finish_round(actor, seq)
+
+    def act(self, idx, seq, decision):
+        if self.phase != protocol.PLAYING or self.turn != idx:
+            return protocol.error(protocol.NOT_YOUR_TURN, "Not your turn")
+        player = self.seats[idx].player
+        if decision == engine.HIT:
+            player.hit(self.shoe.draw())
+            if player.calculate_score() >= 21:
+                player.stopped = True
+        else:
+            player.stopped = True
+        if player.stopped:
+            self.advance(idx, seq)
+        else:
+            self.set_timer(ACTION_TIMEOUT_S, lambda: self.act(idx, 0, engine.STOP))
+            self.broadcast_state(idx, seq)
+        return None
+
+    def settle(self, player, settled):
+        outcome, amount = engine.settle(player, self.dealer)
+        player.balance += amount
+        settled.append((player, make_record(player.bet, outcome, amount, player.balance)))
+        return outcome, amount
+
+    def finish_round(self, actor=protocol.NO_SEAT, seq=0):
+        self.set_timer(0, None)
+        engine.play_dealer(self.shoe, self.dealer)
+        rows = []
+        settled = []
+        for idx, seat in self.occupied():
+            if not seat.in_round:
+                continue
+            player = seat.player
+            outcome, amount = self.settle(player, settled)
+            rows.append((idx, outcome, amount, player.balance))
+        for player in self.leavers:
+            self.settle(player, settled)
+        self.server.round_finished(settled)
+        # A player who left mid-round can sit down again once their result is saved
+        self.server.names.difference_update(player.name for player in self.leavers)
+        self.leavers = []
+        self.broadcast(protocol.result(self.id, rows))
+        # The finished hands stay on the table until the next deal
+        for _, seat in self.occupied():
+            seat.player.bet = 0
+            seat.in_round = False
+        self.phase = protocol.BETTING
+        self.turn = protocol.NO_SEAT
+        self.broadcast_state(actor, seq)
+
+
+class TableServer:
+    def __init__(self, seats_per_table=SEATS_PER_TABLE, store=None, seed=None):
+        self.seats_per_table = seats_per_table
+        self.store = store
+        self.seed = seed
+        self.tables = {}
+        self.open_tables = []  # ids of tables with a free seat, oldest first
+        self.names = set()
+        self.rounds = 0
+        self.actions = 0
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    def new_table(self):
+        table_id = len(self.tables)
+        rng = random.Random(f"{self.seed}:{table_id}") if self.seed is not None else None
+        table = Table(self, table_id, self.seats_per_table, rng)
+        self.tables[table_id] = table
+        self.open_tables.append(table_id)
+        return table
+
+    def seat(self, name, writer):
+        player = engine.Player(name)
+        if self.store:
+            player.balance = self.store.load(name)["balance"]
+        table = self.tables[self.open_tables[0]] if self.open_tables else self.new_table()
+        idx = table.join(player, writer)
+        if table.free_seat() is None:
+            self.open_tables.remove(table.id)
+        return table, idx
+
+    def unseat(self, table, idx):
+        table.leave(idx)
+        if table.id not in self.open_tables:
+            self.open_tables.append(table.id)
+
+    def round_finished(self, settled):
+        self.rounds += 1
+        self.save_results(settled)
+
+    def save_results(self, settled):
+        if self.store:
+            self.store.save_many([(player.name, {"balance": player.balance, "pending": [record]})
+                                  for player, record in settled])
+
+    def stats(self):
+        return protocol.stats_reply(len(self.tables), len(self.names), self.rounds, self.actions,
+                                    time.process_time() - self.cpu_started, time.perf_counter() - self.started)
+
+    async def handle(self, reader, writer):
+        table = None
+        name = None
+        try:
+            kind, body = await protocol.read_message(reader)
+            if kind == protocol.STATS:
+                writer.write(self.stats())
+                return
+            if kind != protocol.HELLO:
+                writer.write(protocol.error(protocol.BAD_MESSAGE, "Say HELLO first"))
+                return
+            name = protocol.decode(kind, body)["name"]
+            if not name or name in self.names:
+                writer.write(protocol.error(protocol.NAME_IN_USE, f"Name {name!r} is not available"))
+                name = None
+                return
+            self.names.add(name)
+            table, idx = self.seat(name, writer)
+            while True:
+                kind, body = await protocol.read_message(reader)
+                message = protocol.decode(kind, body)
+                self.actions += 1
+                if kind == protocol.BET:
+                    reply = table.place_bet(idx, message["seq"], message["amount"])
+                elif kind == protocol.HIT:
+                    reply = table.act(idx, message["seq"], engine.HIT)
+                elif kind == protocol.STOP:
+                    reply = table.act(idx, message["seq"], engine.STOP)
+                elif kind == protocol.STATS:
+                    reply = self.stats()
+                else:
+                    reply = protocol.error(protocol.BAD_MESSAGE, f"Unexpected message type {kind}")
+                if reply:
+                    writer.write(reply)
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except protocol.ProtocolError as e:
+            writer.write(protocol.error(protocol.BAD_MESSAGE, str(e)))
+        finally:
+            if table is not None:
+                self.unseat(table, idx)
+            if name is not None and not (table is not None and any(player.name == name for player in table.leavers)):
+                self.names.discard(name)
+            writer.close()
+
+    async def serve(self, host=protocol.DEFAULT_HOST, port=protocol.DEFAULT_PORT, ready=None):
+        # Runs until SIGINT or SIGTERM, then returns so the caller can flush
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: stopped.done() or stopped.set_result(None))
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. Windows; Ctrl+C still raises KeyboardInterrupt
+        if ready:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await stopped
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Networked Black Jack table server")
+    parser.add_argument("--host", default=protocol.DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=protocol.DEFAULT_PORT)
+    parser.add_argument("--seats", type=int, default=SEATS_PER_TABLE)
+    parser.add_argument("--seed", default=None)
+    parser.add_argument("--db", default=None, help="keep balances in this SQLite player store")
+    args = parser.parse_args()
+
+    store = None
+    if args.db:
+        from profile_cache import ProfileCache
+        from storage import PlayerStore
+        store = ProfileCache(PlayerStore(args.db, legacy_json=None))
+    table_server = TableServer(args.seats, store, args.seed)
+    try:
+        asyncio.run(table_server.serve(args.host, args.port,
+                                       ready=lambda port: print(f"Listening on {args.host}:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store:
+            store.flush()
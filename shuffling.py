@@ -0,0 +1,121 @@
+import hashlib
+import hmac
+import os
+import random
+from array import array
+
+# Random sources for shuffling a shoe. engine.Shoe takes any object with a
+# shuffle(seq) method as its rng; the sources here also have
+# permutations(count, size), which returns count independent shuffles of
+# range(size) as one NumPy array with a row per shuffle (for bulk work such
+# as the fairness audit in audit.py). NumPy is only needed for PCG64 and
+# for permutations().
+#
+#   mt      the standard library's Mersenne Twister (what the game has
+#           always used)
+#   pcg64   NumPy's PCG64; shuffles a shoe in place and makes batches of
+#           permutations in one vectorized call
+#   crypto  HMAC-SHA256 in counter mode, seeded. Without a seed the key
+#           comes from os.urandom; with one, every shuffle can be
+#           reproduced by whoever holds the seed.
+
+MT = "mt"
+PCG64 = "pcg64"
+CRYPTO = "crypto"
+RNG_KINDS = [MT, PCG64, CRYPTO]
+DEFAULT_RNG = MT
+
+
+class BatchPermutations:
+    # Fallback batch mode for sources that can only shuffle one sequence at
+    # a time: it runs the same shuffle() the shoe would
+    def permutations(self, count, size):
+        import numpy as np
+
+        batch = np.empty((count, size), dtype=np.uint16)
+        base = array('H', range(size))
+        for row in range(count):
+            deck = array('H', base)
+            self.shuffle(deck)
+            batch[row] = np.frombuffer(deck, dtype=np.uint16)
+        return batch
+
+
+class MersenneTwister(BatchPermutations, random.Random):
+    kind = MT
+
+
+class CryptoDRBG(BatchPermutations, random.Random):
+    # random.Random built on getrandbits(), so shuffle() draws its indexes
+    # from the HMAC stream with the standard library's unbiased rejection
+    kind = CRYPTO
+    BLOCKS = 64
+
+    def seed(self, a=None, version=2):
+        if a is None:
+            material = os.urandom(32)
+        elif isinstance(a, (bytes, bytearray)):
+            material = bytes(a)
+        else:
+            material = str(a).encode()
+        self.key = hashlib.sha256(material).digest()
+        self.counter = 0
+        self.buffer = b""
+        self.offset = 0
+
+    def random_bytes(self, n):
+        if self.offset + n > len(self.buffer):
+            blocks = [hmac.digest(self.key, (self.counter + i).to_bytes(16, "big"), "sha256")
+                      for i in range(max(self.BLOCKS, n // 32 + 1))]
+            self.counter += len(blocks)
+            self.buffer = self.buffer[self.offset:] + b"".join(blocks)
+            self.offset = 0
+        chunk = self.buffer[self.offset:self.offset + n]
+        self.offset += n
+        return chunk
+
+    def getrandbits(self, k):
+        if k == 0:
+            return 0
+        value = int.from_bytes(self.random_bytes((k + 7) // 8), "big")
+        return value >> (-k % 8)
+
+    def random(self):
+        return self.getrandbits(53) * 2.0 ** -53
+
+    def getstate(self):
+        return self.key, self.counter, self.buffer, self.offset
+
+    def setstate(self, state):
+        self.key, self.counter, self.buffer, self.offset = state
+
+
+class PCG64Shuffler:
+    kind = PCG64
+
+    def __init__(self, seed=None):
+        import numpy as np
+
+        self.np = np
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+
+    def shuffle(self, seq):
+        if isinstance(seq, array):
+            # In place through a view of the shoe's own buffer
+            self.generator.shuffle(self.np.frombuffer(seq, dtype=seq.typecode))
+        else:
+            order = self.generator.permutation(len(seq))
+            seq[:] = [seq[i] for i in order]
+
+    def permutations(self, count, size):
+        base = self.np.broadcast_to(self.np.arange(size, dtype=self.np.uint16), (count, size))
+        return self.generator.permuted(base, axis=1)
+
+
+RNG_CLASSES = {MT: MersenneTwister, PCG64: PCG64Shuffler, CRYPTO: CryptoDRBG}
+
+
+def make_rng(kind=DEFAULT_RNG, seed=None):
+    if kind not in RNG_CLASSES:
+        raise ValueError(f"Unknown RNG {kind!r}, expected one of {', '.join(RNG_KINDS)}")
+    return RNG_CLASSES[kind](seed)
@@ -0,0 +1,322 @@
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+import engine
+from parallel import run_jobs
+from strategy import DEALER_NATURAL, UPCARDS, add_card
+
+# Exact composition-dependent EV for hit or stop. Where strategy.py assumes
+# an infinite shoe, this takes the cards the player has not seen (counts of
+# each point value 2-11, e.g. a counting.CountTracker's unseen list) and
+# removes every card as it is drawn: the player's hits, then the dealer's
+# hole card and hits. The rules are engine.py's: aces count 11 until the
+# hand would bust, the dealer hits below 17 and on 17 holding any ace (or as
+# the engine.TableRules given say), a dealer natural beats every total a
+# player can still decide on, and any other 21s push. Only hit and stop are
+# solved; a player's own Black Jack is paid before there is a decision, so
+# the precomputed tables value it with natural_ev() instead.
+#
+# The player's side is a memoized recursion over the cards drawn so far.
+# The dealer's side would be the expensive part, a fresh recursion for every
+# composition the player can reach, so instead the dealer's possible draws
+# from each upcard are listed once as multisets (with the number of
+# orderings that reach each one). The chance of a multiset under a
+# composition is a product of falling factorials, so the dealer's outcome
+# for every player state is a single matrix product in log space.
+#
+# Solved decisions are kept in an LRU cache of a fixed size.
+#
+#     python solver.py --decks 1 2 6 --workers 4 --dealer-17 s17
+#
+# precomputes full-shoe tables (every two-card hand against every upcard,
+# those three cards removed) for several shoe sizes at once under the given
+# table rules, one process per (shoe size, upcard).
+
+DEFAULT_CACHE_SIZE = 4096
+POINT_VALUES = list(range(2, 12))
+ACE = POINT_VALUES.index(11)
+FINALS = [17, 18, 19, 20, 21, 22, DEALER_NATURAL]  # 22 stands for any bust
+# Stands in for log(0) where -inf would turn a matrix product into NaN
+LOG_ZERO = -1e30
+SOLVER_TABLE_FILE = "solver_tables.json"
+
+
+def stand_payoffs(total):
+    # What standing on total pays against each final dealer total
+    payoffs = []
+    for final in FINALS:
+        if final == 22 or total > final:
+            payoffs.append(1.0)
+        elif total < final:
+            payoffs.append(-1.0)
+        else:
+            payoffs.append(0.0)
+    return payoffs
+
+
+STAND_PAYOFFS = np.array([stand_payoffs(total) for total in range(22)])
+
+
+def shoe_counts(decks):
+    per_deck = [engine.RANK_POINTS.count(points) * len(engine.SUITS) for points in POINT_VALUES]
+    return [count * decks for count in per_deck]
+
+
+def remove_cards(counts, points_list):
+    counts = list(counts)
+    for points in points_list:
+        if not counts[points - 2]:
+            raise ValueError(f"No card worth {points} left to remove")
+        counts[points - 2] -= 1
+    return counts
+
+
+def log_falling(size, depth):
+    # log(x * (x-1) * ... * (x-j+1)) for x < size, j < depth; LOG_ZERO when j > x
+    table = np.full((size, depth), LOG_ZERO)
+    for x in range(size):
+        table[x, 0] = 0.0
+        for j in range(1, min(depth, x + 1)):
+            table[x, j] = table[x, j - 1] + math.log(x - j + 1)
+    return table
+
+
+def hand_state(upcard, drawn):
+    # (total, soft aces, has an ace) of the dealer's upcard plus drawn counts
+    total = upcard + sum(points * count for points, count in zip(POINT_VALUES, drawn))
+    aces = (upcard == 11) + drawn[ACE]
+    while total > 21 and aces:
+        total -= 10
+        aces -= 1
+    return total, aces, upcard == 11 or drawn[ACE] > 0
+
+
+def dealer_hands(upcard, caps, rules=engine.DEFAULT_RULES):
+    # Every set of cards the dealer can draw after the upcard and stop on, as
+    # {drawn counts: (final, number of orderings)}. A hand's state does not
+    # depend on the order of its cards, so the orderings are counted level
+    # by level: a multiset is reached from each one-card-smaller multiset
+    # the dealer would still hit.
+    finished = {}
+    level = {(0,) * len(POINT_VALUES): 1}
+    while level:
+        next_level = {}
+        for drawn, ways in level.items():
+            total, soft, has_ace = hand_state(upcard, drawn)
+            if total > 21 or not rules.dealer_hits(total, soft > 0, has_ace):
+                natural = total == 21 and sum(drawn) == 1
+                finished[drawn] = (DEALER_NATURAL if natural else min(total, 22), ways)
+                continue
+            for i, cap in enumerate(caps):
+                if drawn[i] < cap:
+                    grown = drawn[:i] + (drawn[i] + 1,) + drawn[i + 1:]
+                    next_level[grown] = next_level.get(grown, 0) + ways
+        level = next_level
+    return finished
+
+
+class DealerTable:
+    # dealer_hands() for one upcard as arrays. Each hand is a row of one-hot
+    # columns: for every point value, how many of it were drawn; how many
+    # cards were drawn in all; and a constant column holding its log number
+    # of orderings. final_probs() builds the matching columns for each
+    # composition, so one matrix product gives every log probability.
+    def __init__(self, upcard, caps, rules=engine.DEFAULT_RULES):
+        hands = dealer_hands(upcard, caps, rules)
+        drawn = np.array(list(hands), dtype=np.int64)
+        rows = np.arange(len(drawn))
+        self.depths = list(drawn.max(axis=0) + 1)
+        self.max_cards = int(drawn.sum(axis=1).max())
+        columns = sum(self.depths) + self.max_cards + 2
+        self.onehot = np.zeros((len(drawn), columns))
+        offset = 0
+        for i, depth in enumerate(self.depths):
+            self.onehot[rows, offset + drawn[:, i]] = 1.0
+            offset += depth
+        self.onehot[rows, offset + drawn.sum(axis=1)] = 1.0
+        self.onehot[:, -1] = np.log([ways for final, ways in hands.values()])
+        self.onehot = self.onehot.T.copy()
+        self.finals = np.zeros((len(drawn), len(FINALS)))
+        self.finals[rows, [FINALS.index(final) for final, ways in hands.values()]] = 1.0
+
+    def final_probs(self, counts, log_ff):
+        # Dealer final distribution (rows of FINALS) for each row of counts
+        left = counts.sum(axis=1)
+        # Dividing by left * (left-1) * ... per card drawn; a hand too long
+        # for the cards left already has weight 0, so its divisor stays 1
+        divisors = log_ff[left, :self.max_cards + 1]
+        divisors = -np.where(divisors <= LOG_ZERO, 0.0, divisors)
+        features = np.concatenate([log_ff[counts[:, i], :depth] for i, depth in enumerate(self.depths)]
+                                  + [divisors, np.ones((len(counts), 1))], axis=1)
+        weights = features @ self.onehot
+        np.exp(weights, out=weights)
+        probs = weights @ self.finals
+        # The engine reshuffles if the cards run out mid-hand; those rare
+        # hands are left out and the rest renormalized
+        return probs / probs.sum(axis=1, keepdims=True)
+
+
+class CompositionSolver:
+    # decks is the largest shoe the solver will see; it bounds the dealer
+    # tables, which are built once per upcard on first use
+    def __init__(self, decks=1, cache_size=DEFAULT_CACHE_SIZE, rules=engine.DEFAULT_RULES):
+        self.decks = decks
+        self.rules = rules
+        self.payoffs = STAND_PAYOFFS
+        self.caps = shoe_counts(decks)
+        self.tables = {}
+        self.log_ff = log_falling(sum(self.caps) + 1, max(self.caps) + 1)
+        self.solved = lru_cache(maxsize=cache_size)(self._solve)
+
+    def dealer_table(self, upcard):
+        if upcard not in self.tables:
+            self.tables[upcard] = DealerTable(upcard, remove_cards(self.caps, [upcard]), self.rules)
+        return self.tables[upcard]
+
+    def _solve(self, total, soft, upcard, unseen):
+        # Lists the player's states (cards drawn since this decision) one
+        # card at a time, gets every state's stand EV in one go, then works
+        # back from the longest hands to pick hit or stop in each
+        index = {(0,) * len(POINT_VALUES): 0}
+        totals, softs, left = [total], [soft], [sum(unseen)]
+        # children[state]: (probability, child state or -1 for a bust) per value left
+        children = []
+        level = [0]
+        drawn_list = list(index)
+        while level:
+            next_level = []
+            for state in level:
+                drawn = drawn_list[state]
+                branches = []
+                children.append(branches)
+                if totals[state] >= 21 or not left[state]:
+                    continue
+                for i, points in enumerate(POINT_VALUES):
+                    count = unseen[i] - drawn[i]
+                    if count <= 0:
+                        continue
+                    new_total, new_soft = add_card(totals[state], softs[state], points)
+                    child = -1
+                    if new_total <= 21:
+                        grown = drawn[:i] + (drawn[i] + 1,) + drawn[i + 1:]
+                        child = index.get(grown)
+                        if child is None:
+                            child = index[grown] = len(drawn_list)
+                            drawn_list.append(grown)
+                            totals.append(new_total)
+                            softs.append(new_soft)
+                            left.append(left[state] - 1)
+                            next_level.append(child)
+                    branches.append((count / left[state], child))
+            level = next_level
+
+        # A hand that cannot bust on its next card and would stand on 16 or
+        # less only wins standing if the dealer busts, so hitting is never
+        # worse: any total it reaches wins then too, and drawing an unseen
+        # card first leaves the dealer's chances as they were. Those states
+        # (bar this decision's own) skip the stand EV.
+        stands = [state for state in range(len(drawn_list))
+                  if state == 0 or not (totals[state] <= 11 or (softs[state] and totals[state] <= 16))]
+        counts = np.array(unseen, dtype=np.int64) - np.array([drawn_list[state] for state in stands], dtype=np.int64)
+        probs = self.dealer_table(upcard).final_probs(counts, self.log_ff)
+        standing = [None] * len(drawn_list)
+        for state, ev in zip(stands, (probs * self.payoffs[[totals[state] for state in stands]]).sum(axis=1).tolist()):
+            standing[state] = ev
+        # States were numbered in order of cards drawn, so going backwards
+        # every child is valued before its parent
+        best = [0.0] * len(drawn_list)
+        hitting = -1.0
+        for state in range(len(drawn_list) - 1, -1, -1):
+            branches = children[state]
+            if not branches:
+                best[state] = standing[state]
+                continue
+            hitting = sum(p * (best[child] if child >= 0 else -1.0) for p, child in branches)
+            best[state] = hitting if standing[state] is None else max(standing[state], hitting)
+        return standing[0], hitting if children[0] else -1.0
+
+    def solve(self, total, soft, upcard, unseen):
+        # (action, stand EV, hit EV) for a hand of total (soft: an ace still
+        # counted as 11) against the upcard's points, given the counts of
+        # each point value 2-11 the player has not seen (the dealer's hole
+        # card is among them)
+        unseen = tuple(unseen)
+        if any(count > cap for count, cap in zip(unseen, self.caps)):
+            raise ValueError(f"More cards than a {self.decks}-deck shoe holds")
+        standing, hitting = self.solved(total, 1 if soft else 0, upcard, unseen)
+        return (engine.HIT if hitting > standing else engine.STOP), standing, hitting
+
+    def advise(self, total, soft, upcard, unseen):
+        # (action, ev), like strategy.StrategyAdvisor.advise
+        action, standing, hitting = self.solve(total, soft, upcard, unseen)
+        return action, max(standing, hitting)
+
+    def advise_player(self, player, upcard, unseen):
+        return self.advise(player.calculate_score(), player.is_soft(), upcard.points, unseen)
+
+
+def two_card_hands():
+    # Every unordered pair of point values
+    return [(first, second) for first in POINT_VALUES for second in POINT_VALUES if first <= second]
+
+
+def natural_ev(upcard, unseen, rules=engine.DEFAULT_RULES):
+    # A player Black Jack pays the Black Jack payout unless the hole card
+    # gives the dealer one too, which pushes
+    hole = 21 - upcard
+    dealer_natural = unseen[POINT_VALUES.index(hole)] / sum(unseen) if hole in POINT_VALUES else 0.0
+    return rules.blackjack_payout * (1 - dealer_natural)
+
+
+def _solve_upcard(job):
+    decks, upcard, cache_size, rules = job
+    solver = CompositionSolver(decks, cache_size, rules)
+    rows = []
+    for first, second in two_card_hands():
+        try:
+            unseen = remove_cards(shoe_counts(decks), [upcard, first, second])
+        except ValueError:
+            continue  # e.g. a fifth ace in a single deck
+        total, soft = add_card(*add_card(0, 0, first), second)
+        if total == 21:
+            rows.append([first, second, upcard, engine.STOP, natural_ev(upcard, unseen, rules), -1.0])
+            continue
+        action, standing, hitting = solver.solve(total, soft > 0, upcard, unseen)
+        rows.append([first, second, upcard, action, standing, hitting])
+    return decks, rows
+
+
+def precompute_tables(decks_list, workers=None, cache_size=DEFAULT_CACHE_SIZE, rules=engine.DEFAULT_RULES):
+    # {decks: [[first, second, upcard, action, stand EV, hit EV], ...]},
+    # one job per (shoe size, upcard) spread over a process pool
+    jobs = [(decks, upcard, cache_size, rules) for decks in decks_list for upcard in UPCARDS]
+    tables = {decks: [] for decks in decks_list}
+    for decks, rows in run_jobs(_solve_upcard, jobs, workers or os.cpu_count()):
+        tables[decks].extend(rows)
+    return tables
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description="Exact composition-dependent hit/stop tables")
+    parser.add_argument("--decks", type=int, nargs="+", default=[1, 2, 6])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    parser.add_argument("--output", default=SOLVER_TABLE_FILE)
+    engine.add_rules_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tables = precompute_tables(args.decks, args.workers, args.cache_size, engine.rules_from_args(args))
+    elapsed = time.perf_counter() - start
+    with open(args.output, "w") as f:
+        json.dump({str(decks): rows for decks, rows in tables.items()}, f)
+    hands = sum(len(rows) for rows in tables.values())
+    print(f"{hands} hands for {', '.join(map(str, args.decks))} deck shoes in {elapsed:.1f}s "
+          f"with {args.workers} workers, written to {args.output}")
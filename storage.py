@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+
+from engine import STARTING_BALANCE
+from history import (OUTCOME_CODES, OUTCOMES_BY_CODE, RECENT_ROUNDS, PlayerStats,
+                     parse_result, record_from_legacy)
+
+# SQLite-backed player store. A player is one row holding the balance and
+# the rolling aggregates from history.PlayerStats; history is an append-only
+# table of structured records. Saving a round inserts that round's records
+# and updates the aggregates in one transaction, so a crash leaves either
+# the old or the new profile, never a half-written one. Loading a profile
+# reads the aggregates and the last few records only; older history is read
+# a page at a time. The old player_data.json is imported once, the first
+# time the database is opened.
+#
+# The players table doubles as the player directory: indexes on balance,
+# net and rounds give top-N leaderboards, and the name key gives prefix
+# search, each an index seek plus the rows returned, however many profiles
+# there are. The directory columns are kept current by the same save that
+# appends the history.
+
+PLAYER_DB_FILE = "player_data.db"
+LEGACY_JSON_FILE = "player_data.json"
+SCHEMA_VERSION = 2
+DEFAULT_PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    balance INTEGER NOT NULL,
+    rounds INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    pushes INTEGER NOT NULL DEFAULT 0,
+    net INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    best_streak INTEGER NOT NULL DEFAULT 0,
+    worst_streak INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL REFERENCES players(name),
+    bet INTEGER NOT NULL,
+    outcome INTEGER NOT NULL,
+    payout INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_by_name ON history (name, id);
+CREATE INDEX IF NOT EXISTS players_by_balance ON players (balance DESC, name);
+CREATE INDEX IF NOT EXISTS players_by_net ON players (net DESC, name);
+CREATE INDEX IF NOT EXISTS players_by_rounds ON players (rounds DESC, name);
+"""
+
+STATS_COLUMNS = ", ".join(PlayerStats.FIELDS)
+DIRECTORY_FIELDS = ("name", "balance", "rounds", "net")
+DIRECTORY_COLUMNS = ", ".join(DIRECTORY_FIELDS)
+LEADERBOARD_ORDERS = ("balance", "net", "rounds")
+DEFAULT_DIRECTORY_LIMIT = 10
+
+
+def new_profile():
+    return {"balance": STARTING_BALANCE, "stats": PlayerStats(), "recent": []}
+
+
+def entry_from_row(row):
+    return dict(zip(DIRECTORY_FIELDS, row))
+
+
+def prefix_end(prefix):
+    # Smallest string above every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def record_from_row(row):
+    record_id, bet, outcome, payout, balance, ts = row
+    return {"id": record_id, "bet": bet, "outcome": OUTCOMES_BY_CODE[outcome],
+            "payout": payout, "balance": balance, "ts": ts}
+
+
+class PlayerStore:
+    def __init__(self, path=PLAYER_DB_FILE, legacy_json=LEGACY_JSON_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.meta_table_exists() and self.meta("schema_version") == "1":
+            self.migrate_v1()
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        if legacy_json:
+            self.migrate_json(legacy_json)
+
+    def close(self):
+        self.conn.close()
+
+    def meta_table_exists(self):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'meta'").fetchone() is not None
+
+    def meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_v1(self):
+        # Version 1 kept free-text results; rebuild both tables in the new
+        # layout and recompute every player's aggregates
+        old_players = self.conn.execute("SELECT name, balance FROM players ORDER BY rowid").fetchall()
+        old_history = self.conn.execute("SELECT name, bet, result, balance FROM history ORDER BY id").fetchall()
+        with self.conn:
+            self.conn.execute("DROP TABLE history")
+            self.conn.execute("DROP TABLE players")
+            self.conn.executescript(SCHEMA)
+            histories = {name: [] for name, _ in old_players}
+            for name, bet, result, balance in old_history:
+                outcome, payout = parse_result(result)
+                histories.setdefault(name, []).append(
+                    {"bet": bet, "outcome": outcome, "payout": payout, "balance": balance, "ts": 0})
+            balances = dict(old_players)
+            for name, records in histories.items():
+                self._insert_player(name, balances.get(name, STARTING_BALANCE))
+                self._append(name, balances.get(name, STARTING_BALANCE), records)
+            self.conn.execute("UPDATE meta SET value = ? WHERE key = 'schema_version'", (str(SCHEMA_VERSION),))
+
+    def migrate_json(self, json_path):
+        # One-time import of the old whole-file JSON store
+        if self.meta("migrated_json") or not os.path.exists(json_path):
+            return
+        with open(json_path, "r") as f:
+            try: data = json.load(f)
+            except json.JSONDecodeError: data = {}
+        with self.conn:
+            for name, profile in data.items():
+                balance = profile.get("balance", STARTING_BALANCE)
+                self._insert_player(name, balance)
+                self._append(name, balance, [record_from_legacy(entry) for entry in profile.get("history", [])])
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('migrated_json', ?)", (json_path,))
+
+    def usernames(self):
+        return [name for (name,) in self.conn.execute("SELECT name FROM players ORDER BY rowid")]
+
+    def leaderboard(self, order="balance", limit=DEFAULT_DIRECTORY_LIMIT):
+        # Top players by balance, net winnings or rounds played, as
+        # {"name", "balance", "rounds", "net"} entries
+        if order not in LEADERBOARD_ORDERS:
+            raise ValueError(f"unknown leaderboard order {order!r}")
+        rows = self.conn.execute(
+            f"SELECT {DIRECTORY_COLUMNS} FROM players ORDER BY {order} DESC, name LIMIT ?", (limit,))
+        return [entry_from_row(row) for row in rows]
+
+    def search(self, prefix, limit=DEFAULT_DIRECTORY_LIMIT):
+        # Players whose name starts with prefix, in name order. A range on
+        # the name key rather than LIKE, so it is an index seek.
+        if not prefix:
+            rows = self.conn.execute(f"SELECT {DIRECTORY_COLUMNS} FROM players ORDER BY name LIMIT ?", (limit,))
+        else:
+            rows = self.conn.execute(
+                f"SELECT {DIRECTORY_COLUMNS} FROM players WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+                (prefix, prefix_end(prefix), limit))
+        return [entry_from_row(row) for row in rows]
+
+    def load(self, name):
+        # Balance, aggregates and the last few rounds; O(1) in history length
+        row = self.conn.execute(f"SELECT balance, {STATS_COLUMNS} FROM players WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return new_profile()
+        recent = self.load_history(name, RECENT_ROUNDS)
+        recent.reverse()
+        return {"balance": row[0], "stats": PlayerStats(*row[1:]), "recent": recent}
+
+    def load_history(self, name, limit=DEFAULT_PAGE_SIZE, before_id=None):
+        # One page of records, newest first. Pass the smallest id of a page
+        # as before_id to get the page after it.
+        if before_id is None:
+            rows = self.conn.execute(
+                "SELECT id, bet, outcome, payout, balance, ts FROM history WHERE name = ? "
+                "ORDER BY id DESC LIMIT ?", (name, limit))
+        else:
+            rows = self.conn.execute(
+                "SELECT id, bet, outcome, payout, balance, ts FROM history WHERE name = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?", (name, before_id, limit))
+        return [record_from_row(row) for row in rows]
+
+    def iter_history(self, name, page_size=DEFAULT_PAGE_SIZE):
+        # Lazily walks a player's whole history, newest first
+        before_id = None
+        while True:
+            page = self.load_history(name, page_size, before_id)
+            if not page:
+                return
+            yield from page
+            before_id = page[-1]["id"]
+
+    def save(self, name, profile):
+        self.save_many([(name, profile)])
+
+    def save_many(self, profiles):
+        # Commits every (name, profile) pair together, e.g. a whole round.
+        # profile["pending"] holds the records added since the last save.
+        with self.conn:
+            for name, profile in profiles:
+                self._insert_player(name, profile["balance"])
+                self._append(name, profile["balance"], profile.get("pending", []))
+
+    def _insert_player(self, name, balance):
+        self.conn.execute("INSERT OR IGNORE INTO players (name, balance) VALUES (?, ?)", (name, balance))
+
+    def _append(self, name, balance, records):
+        if records:
+            self.conn.executemany(
+                "INSERT INTO history (name, bet, outcome, payout, balance, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                [(name, r["bet"], OUTCOME_CODES[r["outcome"]], r["payout"], r["balance"], r["ts"]) for r in records])
+        row = self.conn.execute(f"SELECT {STATS_COLUMNS} FROM players WHERE name = ?", (name,)).fetchone()
+        stats = PlayerStats(*row)
+        for record in records:
+            stats.add(record)
+        assignments = ", ".join(f"{field} = ?" for field in PlayerStats.FIELDS)
+        self.conn.execute(f"UPDATE players SET balance = ?, {assignments} WHERE name = ?",
+                          (balance, *stats.as_row(), name))
@@ -0,0 +1,284 @@
+import json
+import os
+from functools import lru_cache
+
+import engine
+
+# Basic-strategy advisor for the game's own rules. The dealer's final-total
+# distribution for each upcard is worked out once by exact recursion over an
+# infinite shoe, then every (player total, soft, dealer upcard) state gets a
+# best action and its EV. The finished table is saved to disk so later runs
+# only have to load it, and advice is a single dict lookup.
+#
+# The rules match engine.py: by default the dealer hits below 17 and on 17
+# with any ace, only a two-card 21 before any split is a Black Jack (pays
+# 3:2 and pushes a dealer natural), any other 21 pushes a dealer 21 but
+# loses to a dealer natural, and a player on 21 cannot hit. Other
+# engine.TableRules change the dealer's rule and the payout.
+#
+# Doubling, splitting and surrendering are worked out from the hit/stand
+# table when an advisor is made: a double is one card then standing for
+# twice the stake, a split is two hands each started from one card of the
+# pair (resplits are not counted), and late surrender loses half the bet
+# unless the dealer turns out to hold a natural. Insurance is never taken.
+
+STRATEGY_CACHE_FILE = "strategy_table.json"
+# Bump when the rules or the table layout change so stale caches are rebuilt
+TABLE_VERSION = 3
+BLACKJACK_PAYOUT = 1.5
+
+# Probability of drawing each point value from an infinite shoe
+INFINITE_SHOE = tuple(sorted(
+    (points, engine.RANK_POINTS.count(points) / len(engine.RANK_POINTS))
+    for points in set(engine.RANK_POINTS)
+))
+UPCARDS = list(range(2, 12))
+# 22 stands for any bust and DEALER_NATURAL for a two-card 21, which beats
+# every player total but a Black Jack
+DEALER_NATURAL = 23
+DEALER_FINALS = [17, 18, 19, 20, 21, 22, DEALER_NATURAL]
+
+
+def add_card(total, soft, points):
+    # Adds a card to a (total, soft) hand the way engine.Player.hit does
+    total += points
+    if points == 11:
+        soft += 1
+    while total > 21 and soft:
+        total -= 10
+        soft -= 1
+    return total, soft
+
+
+@lru_cache(maxsize=None)
+def dealer_distribution(total, soft, has_ace, probs=INFINITE_SHOE, rules=engine.DEFAULT_RULES):
+    # Probability of each final dealer total from this hand
+    if total > 21:
+        return {22: 1.0}
+    if not rules.dealer_hits(total, soft > 0, has_ace):
+        return {total: 1.0}
+    finals = {}
+    for points, p in probs:
+        new_total, new_soft = add_card(total, soft, points)
+        for final, q in dealer_distribution(new_total, new_soft, has_ace or points == 11, probs, rules).items():
+            finals[final] = finals.get(final, 0.0) + p * q
+    return finals
+
+
+def dealer_upcard_distribution(upcard, probs=INFINITE_SHOE, rules=engine.DEFAULT_RULES):
+    # Final totals with the dealer's naturals counted apart from other 21s
+    total, soft = add_card(0, 0, upcard)
+    finals = dict(dealer_distribution(total, soft, upcard == 11, probs, rules))
+    natural = sum(p for points, p in probs if points + upcard == 21)
+    if natural:
+        finals[21] -= natural
+        finals[DEALER_NATURAL] = natural
+    return finals
+
+
+def stand_ev(total, finals, payout=BLACKJACK_PAYOUT, natural=False):
+    if total > 21:
+        return -1.0
+    ev = 0.0
+    for final, p in finals.items():
+        if natural:
+            # Player Black Jack: pushes a dealer natural, beats everything else
+            ev += 0.0 if final == DEALER_NATURAL else p * payout
+        elif final == 22 or total > final:
+            ev += p
+        elif total < final:
+            ev -= p
+    return ev
+
+
+def solve_upcard(upcard, probs=INFINITE_SHOE, rules=engine.DEFAULT_RULES):
+    # Returns {(total, soft): (action, ev)} for one dealer upcard
+    finals = dealer_upcard_distribution(upcard, probs, rules)
+
+    @lru_cache(maxsize=None)
+    def best(total, soft):
+        standing = stand_ev(total, finals, rules.blackjack_payout)
+        if total >= 21:
+            return engine.STOP, standing
+        hitting = 0.0
+        for points, p in probs:
+            new_total, new_soft = add_card(total, soft, points)
+            hitting += p * (-1.0 if new_total > 21 else best(new_total, new_soft)[1])
+        return (engine.HIT, hitting) if hitting > standing else (engine.STOP, standing)
+
+    # Single-card totals are included so a hint can be shown mid-deal
+    table = {}
+    for total in range(2, 22):
+        table[(total, False)] = best(total, 0)
+    for total in range(11, 22):
+        table[(total, True)] = best(total, 1)
+    return table
+
+
+def build_table(probs=INFINITE_SHOE, rules=engine.DEFAULT_RULES):
+    table = {}
+    for upcard in UPCARDS:
+        for (total, soft), advice in solve_upcard(upcard, probs, rules).items():
+            table[(total, soft, upcard)] = advice
+    return table
+
+
+def extra_actions(table, probs=INFINITE_SHOE, rules=engine.DEFAULT_RULES):
+    # EVs of the two-card actions from a hit/stand table for the same probs
+    # and rules: ({(total, soft, upcard): double}, {(pair points, upcard):
+    # split}, {upcard: surrender})
+    doubles, splits, surrenders = {}, {}, {}
+    payout = rules.blackjack_payout
+    for upcard in UPCARDS:
+        if not any(points == upcard for points, p in probs):
+            continue
+        finals = dealer_upcard_distribution(upcard, probs, rules)
+        for total in range(2, 21):
+            for soft in ((0, 1) if total >= 12 else (0,)):
+                ev = 0.0
+                for points, p in probs:
+                    ev += p * stand_ev(add_card(total, soft, points)[0], finals, payout)
+                doubles[(total, soft > 0, upcard)] = 2 * ev
+        for pair in UPCARDS:
+            start = add_card(0, 0, pair)
+            ev = 0.0
+            for points, p in probs:
+                total, soft = add_card(*start, points)
+                if pair == 11 and not rules.hit_split_aces:
+                    value = stand_ev(total, finals, payout)
+                else:
+                    value = table[(total, soft > 0, upcard)][1]
+                    if rules.double_after_split and total < 21:
+                        value = max(value, doubles[(total, soft > 0, upcard)])
+                ev += p * value
+            splits[(pair, upcard)] = 2 * ev
+        natural = finals.get(DEALER_NATURAL, 0.0)
+        surrenders[upcard] = -0.5 * (1 - natural) - natural
+    return doubles, splits, surrenders
+
+
+def round_ev(probs=INFINITE_SHOE, rules=engine.DEFAULT_RULES):
+    # EV of a whole round per unit bet when every card, dealer's and
+    # player's, is drawn with these probabilities and each hand is played
+    # the best way for them
+    advisor = StrategyAdvisor(build_table(probs, rules), rules, probs)
+    all_actions = [engine.HIT, engine.STOP, engine.DOUBLE, engine.SPLIT, engine.SURRENDER]
+    ev = 0.0
+    for upcard, p_up in probs:
+        # A two-card 21 is a Black Jack, which is paid without a decision
+        natural = stand_ev(21, dealer_upcard_distribution(upcard, probs, rules), rules.blackjack_payout, natural=True)
+        for first, p_first in probs:
+            for second, p_second in probs:
+                total, soft = add_card(*add_card(0, 0, first), second)
+                pair = first if first == second else None
+                if total == 21:
+                    value = natural
+                else:
+                    value = advisor.best(total, soft > 0, upcard, all_actions, pair)[1]
+                ev += p_up * p_first * p_second * value
+    return ev
+
+
+def save_table(table, path=STRATEGY_CACHE_FILE):
+    rows = [[total, soft, upcard, action, ev] for (total, soft, upcard), (action, ev) in table.items()]
+    with open(path, "w") as f:
+        json.dump({"version": TABLE_VERSION, "table": rows}, f)
+
+
+def load_table(path=STRATEGY_CACHE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        try: data = json.load(f)
+        except json.JSONDecodeError: return None
+    if data.get("version") != TABLE_VERSION:
+        return None
+    return {(total, soft, upcard): (action, ev) for total, soft, upcard, action, ev in data["table"]}
+
+
+class StrategyAdvisor:
+    # Also usable as an engine strategy: advisor(hand, upcard) -> HIT/STOP,
+    # or advisor.choose(hand, upcard, actions) for the full set of actions
+    def __init__(self, table, rules=engine.DEFAULT_RULES, probs=INFINITE_SHOE):
+        self.table = table
+        self.rules = rules
+        self.doubles, self.splits, self.surrenders = extra_actions(table, probs, rules)
+
+    def advise(self, total, soft, upcard_points):
+        if total >= 21:
+            finals = dealer_upcard_distribution(upcard_points, rules=self.rules)
+            return engine.STOP, stand_ev(min(total, 22), finals, self.rules.blackjack_payout)
+        return self.table[(total, soft, upcard_points)]
+
+    def best(self, total, soft, upcard_points, actions, pair=None):
+        # Best of the legal actions; pair is the point value of a pair
+        action, ev = self.advise(total, soft, upcard_points)
+        if total >= 21:
+            return action, ev
+        if actions and engine.HIT not in actions:
+            # e.g. split aces, which may not be hit
+            finals = dealer_upcard_distribution(upcard_points, rules=self.rules)
+            action, ev = engine.STOP, stand_ev(total, finals, self.rules.blackjack_payout)
+        if engine.DOUBLE in actions and self.doubles[(total, soft, upcard_points)] > ev:
+            action, ev = engine.DOUBLE, self.doubles[(total, soft, upcard_points)]
+        if engine.SPLIT in actions and pair and self.splits[(pair, upcard_points)] > ev:
+            action, ev = engine.SPLIT, self.splits[(pair, upcard_points)]
+        if engine.SURRENDER in actions and self.surrenders[upcard_points] > ev:
+            action, ev = engine.SURRENDER, self.surrenders[upcard_points]
+        return action, ev
+
+    def advise_player(self, player, upcard, actions=()):
+        hand = player.hand
+        pair = hand[0].points if len(hand) == 2 and hand[0].points == hand[1].points else None
+        return self.best(player.calculate_score(), player.is_soft(), upcard.points, actions, pair)
+
+    def choose(self, hand, upcard, actions):
+        return self.advise_player(hand, upcard, actions)[0]
+
+    def __call__(self, player, upcard):
+        if player.calculate_score() >= 21:
+            return engine.STOP
+        return self.table[(player.calculate_score(), player.is_soft(), upcard.points)][0]
+
+
+_advisors = {}
+
+
+def get_advisor(path=STRATEGY_CACHE_FILE, rules=None):
+    # Loads the cached table, building and saving it on the first run. Only
+    # the default dealer rule and payout are cached on disk.
+    rules = rules or engine.DEFAULT_RULES
+    if rules not in _advisors:
+        default = engine.DEFAULT_RULES
+        if (rules.dealer_17, rules.blackjack_payout) == (default.dealer_17, default.blackjack_payout):
+            table = load_table(path)
+            if table is None:
+                table = build_table()
+                save_table(table, path)
+        else:
+            table = build_table(rules=rules)
+        _advisors[rules] = StrategyAdvisor(table, rules)
+    return _advisors[rules]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the basic strategy chart")
+    engine.add_rules_arguments(parser)
+    rules = engine.rules_from_args(parser.parse_args())
+    advisor = get_advisor(rules=rules)
+    letters = {engine.HIT: "H", engine.STOP: "S", engine.DOUBLE: "D", engine.SPLIT: "P", engine.SURRENDER: "R"}
+    all_actions = list(letters)
+    print("      " + " ".join(f"{u if u < 11 else 'A':>3}" for u in UPCARDS))
+    for soft in (False, True):
+        for total in range(21, 11 if soft else 4, -1):
+            label = f"{'S' if soft else 'H'}{total:<4}"
+            actions = ["  " + letters[advisor.best(total, soft, u, all_actions)[0]] for u in UPCARDS]
+            print(label + " " + " ".join(actions))
+    for pair in UPCARDS:
+        name = {10: "T", 11: "A"}.get(pair, pair)
+        label = f"P{name},{name:<2}"
+        total, soft = add_card(*add_card(0, 0, pair), pair)
+        actions = ["  " + letters[advisor.best(total, soft > 0, u, all_actions, pair)[0]] for u in UPCARDS]
+        print(label + " " + " ".join(actions))
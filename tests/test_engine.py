@@ -0,0 +1,97 @@
+import engine
+
+
+def card(rank):
+    return engine.CARDS[engine.card_id(rank, 'spades')]
+
+
+class StackedShoe:
+    # Deals the given ranks in order
+    def __init__(self, *ranks):
+        self.cards = [card(rank) for rank in ranks]
+
+    def start_round(self):
+        pass
+
+    def draw(self, face_up=True):
+        return self.cards.pop(0)
+
+    def reveal(self, card):
+        pass
+
+
+class Script:
+    # Strategy that plays the given actions in order, then stops
+    def __init__(self, *actions):
+        self.actions = list(actions)
+
+    def choose(self, hand, upcard, actions):
+        return self.actions.pop(0) if self.actions else engine.STOP
+
+
+def dealt_player(*ranks, bet=10):
+    player = engine.Player("alice")
+    player.bet = bet
+    for rank in ranks:
+        player.hit(card(rank))
+    return player
+
+
+def test_split_aces_can_be_resplit():
+    rules = engine.TableRules(resplit_aces=True)
+    player = dealt_player('ace', 'ace')
+    engine.play_player(StackedShoe('ace', '9', '8', '7'), player, card('6'), Script(engine.SPLIT, engine.SPLIT),
+                       rules)
+    assert len(player.hands) == 3
+    assert [[c.rank for c in hand.hand] for hand in player.hands] == [['ace', '8'], ['ace', '7'], ['ace', '9']]
+    assert all(hand.done for hand in player.hands)
+    assert player.stopped
+
+
+def test_split_aces_stay_open_only_while_they_can_be_resplit():
+    rules = engine.TableRules(resplit_aces=True)
+    player = dealt_player('ace', 'ace')
+    new = engine.split_hand(player, player)
+    engine.take_card(player, player, card('ace'), rules)
+    engine.take_card(player, new, card('9'), rules)
+    assert engine.legal_actions(player, player, rules) == [engine.STOP, engine.SPLIT]
+    assert new.done
+
+    no_resplit = engine.TableRules()
+    player = dealt_player('ace', 'ace')
+    new = engine.split_hand(player, player)
+    engine.take_card(player, player, card('ace'), no_resplit)
+    engine.take_card(player, new, card('ace'), no_resplit)
+    assert player.stopped
+    assert engine.legal_actions(player, player, no_resplit) == []
+
+
+def test_split_aces_cannot_be_hit():
+    rules = engine.TableRules(resplit_aces=True)
+    player = dealt_player('ace', 'ace')
+    engine.play_player(StackedShoe('ace', '9'), player, card('6'), Script(engine.SPLIT, engine.HIT), rules)
+    assert [len(hand.hand) for hand in player.hands] == [2, 2]
+    assert player.stopped
+
+
+def test_only_an_unsplit_two_card_21_is_black_jack():
+    dealer = dealt_player('10', '8')
+    natural = dealt_player('ace', 'king')
+    assert engine.settle(natural, dealer) == (engine.BLACKJACK, 15)
+
+    split = dealt_player('ace', 'ace')
+    new = engine.split_hand(split, split)
+    engine.take_card(split, split, card('king'), engine.DEFAULT_RULES)
+    engine.take_card(split, new, card('5'), engine.DEFAULT_RULES)
+    assert not split.blackjack
+    assert engine.settle(split, dealer) == (engine.WIN, 10)
+
+    doubled = dealt_player('6', '5')
+    doubled.doubled = True
+    engine.take_card(doubled, doubled, card('king'), engine.DEFAULT_RULES)
+    assert engine.settle(doubled, dealer) == (engine.WIN, 20)
+
+    three_cards = dealt_player('6', '5', '10')
+    assert engine.settle(three_cards, dealt_player('9', '2', '10')) == (engine.PUSH, 0)
+    assert engine.settle(three_cards, dealt_player('ace', 'queen')) == (engine.DEALER_BLACKJACK, -10)
+    assert engine.settle(natural, dealt_player('9', '2', '10')) == (engine.BLACKJACK, 15)
@@ -0,0 +1,24 @@
+import pytest
+
+import engine
+import eventlog
+
+
+def test_a_full_log_table_replays(tmp_path):
+    path = str(tmp_path / "round_log.bin")
+    recorder = eventlog.RoundRecorder(path)
+    engine.simulate_rounds(200, seed=3, num_players=eventlog.MAX_SEATS, recorder=recorder)
+    recorder.close()
+    report = eventlog.replay_log(path)
+    assert report.rounds == 200
+    assert report.changed == 0
+    assert report.replayed_net == report.logged_net
+
+
+def test_too_many_seats_is_refused(tmp_path):
+    recorder = eventlog.RoundRecorder(str(tmp_path / "round_log.bin"))
+    with pytest.raises(ValueError, match="at most 16 seats"):
+        engine.simulate_rounds(1, seed=3, num_players=eventlog.MAX_SEATS + 1, recorder=recorder)
+    with pytest.raises(ValueError, match="hands per seat"):
+        engine.simulate_rounds(1, seed=3, rules=engine.TableRules(max_splits=15), recorder=recorder)
+    recorder.close()
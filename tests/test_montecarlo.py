@@ -0,0 +1,33 @@
+import math
+
+import pytest
+
+import engine
+
+montecarlo = pytest.importorskip("montecarlo")
+
+ENGINE_ROUNDS = 100000
+VECTOR_HANDS = 1000000
+
+
+def engine_interval(rules):
+    # Heads-up StandOn(17) on a fresh single deck every round, the same
+    # game montecarlo plays, with the 95% half-width worked out from the
+    # outcome counts (every outcome of a hit/stop hand has a fixed payout)
+    result = engine.simulate_rounds(ENGINE_ROUNDS, engine.StandOn(17), seed=5, decks=1,
+                                    reshuffle=engine.EVERY_ROUND, rules=rules)
+    bet = result.bet
+    payouts = {engine.BLACKJACK: int(bet * rules.blackjack_payout) / bet, engine.WIN: 1.0, engine.PUSH: 0.0}
+    mean = result.expected_value()
+    square = sum(count * payouts.get(outcome, -1.0) ** 2 for outcome, count in result.outcomes.items()) / result.hands
+    return mean, montecarlo.Z_95 * math.sqrt((square - mean * mean) / result.hands)
+
+
+@pytest.mark.parametrize("rules", [engine.DEFAULT_RULES,
+                                   engine.TableRules(dealer_17=engine.STAND_17, blackjack_payout=1.2),
+                                   engine.TableRules(dealer_17=engine.HIT_SOFT_17)])
+def test_montecarlo_agrees_with_the_engine(rules):
+    engine_ev, engine_half = engine_interval(rules)
+    (stats,) = montecarlo.simulate(VECTOR_HANDS, [engine.StandOn(17)], seed=5, rules=rules)
+    low, high = stats.ev_interval()
+    assert abs(stats.expected_value() - engine_ev) < math.hypot(engine_half, (high - low) / 2)
@@ -0,0 +1,28 @@
+from history import make_record
+from profile_cache import ProfileCache
+from storage import PlayerStore
+
+
+def played(balance, payout):
+    return {"balance": balance, "pending": [make_record(abs(payout), "win" if payout > 0 else "loss", payout, balance)]}
+
+
+def test_directory_sees_unsaved_rounds_without_flushing(tmp_path):
+    store = PlayerStore(str(tmp_path / "players.db"), legacy_json=None)
+    store.save_many([("ann", played(900, -100)), ("bob", played(1100, 100)), ("cat", played(1050, 50))])
+    cache = ProfileCache(store, flush_rounds=1000)
+
+    cache.save("ann", played(1500, 600))
+    cache.save("dan", played(1200, 200))
+    assert cache.leaderboard("balance", 2) == [
+        {"name": "ann", "balance": 1500, "rounds": 2, "net": 500},
+        {"name": "dan", "balance": 1200, "rounds": 1, "net": 200},
+    ]
+    assert [entry["name"] for entry in cache.leaderboard("rounds", 4)] == ["ann", "bob", "cat", "dan"]
+    assert [entry["name"] for entry in cache.search("", 3)] == ["ann", "bob", "cat"]
+    assert cache.search("d") == [{"name": "dan", "balance": 1200, "rounds": 1, "net": 200}]
+    assert cache.flushes == 0
+    assert store.search("d") == []
+
+    cache.flush()
+    assert cache.leaderboard("balance", 2) == store.leaderboard("balance", 2)
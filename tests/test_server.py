@@ -0,0 +1,110 @@
+import asyncio
+
+import engine
+import protocol
+from server import TableServer
+from storage import PlayerStore
+
+
+class FakeWriter:
+    def __init__(self):
+        self.sent = []
+
+    def write(self, data):
+        self.sent.append(data)
+
+
+def deal_table(store, seed):
+    # Two seated players who have both bet, with the round under way
+    table_server = TableServer(seats_per_table=2, store=store, seed=seed)
+    table, alice = table_server.seat("alice", FakeWriter())
+    _, bob = table_server.seat("bob", FakeWriter())
+    table.place_bet(alice, 1, 50)
+    table.place_bet(bob, 1, 20)
+    return table_server, table, alice, bob
+
+
+def playing_table(store):
+    for seed in range(100):
+        table_server, table, alice, bob = deal_table(store, seed)
+        if table.phase == protocol.PLAYING and table.turn == alice:
+            return table_server, table, alice, bob
+    raise AssertionError("no seed deals a hand for alice to play")
+
+
+def run(scenario):
+    async def main():
+        scenario()
+    asyncio.run(main())
+
+
+def test_disconnect_on_turn_forfeits_the_bet(tmp_path):
+    store = PlayerStore(str(tmp_path / "players.db"), legacy_json=None)
+
+    def scenario():
+        table_server, table, alice, bob = playing_table(store)
+        table_server.unseat(table, alice)
+        assert table.seats[alice] is None
+        assert table.turn == bob
+        table.act(bob, 2, engine.STOP)
+        assert table.phase == protocol.BETTING
+
+    run(scenario)
+    assert store.load("alice")["balance"] == engine.STARTING_BALANCE - 50
+    (record,) = store.load_history("alice")
+    assert record["payout"] == -50
+    assert record["outcome"] in (engine.LOSS, engine.BUST)
+
+
+def test_disconnect_off_turn_forfeits_the_bet(tmp_path):
+    store = PlayerStore(str(tmp_path / "players.db"), legacy_json=None)
+
+    def scenario():
+        table_server, table, alice, bob = playing_table(store)
+        table_server.unseat(table, bob)
+        assert table.turn == alice
+        table.act(alice, 2, engine.STOP)
+        assert table.phase == protocol.BETTING
+
+    run(scenario)
+    assert store.load("bob")["balance"] == engine.STARTING_BALANCE - 20
+    assert store.load_history("bob")[0]["payout"] == -20
+
+
+def test_last_player_leaving_finishes_the_round(tmp_path):
+    store = PlayerStore(str(tmp_path / "players.db"), legacy_json=None)
+
+    def scenario():
+        table_server, table, alice, bob = playing_table(store)
+        table_server.unseat(table, bob)
+        table_server.unseat(table, alice)
+        assert table.phase == protocol.BETTING
+        assert table.timer is None
+
+    run(scenario)
+    assert store.load("alice")["balance"] == engine.STARTING_BALANCE - 50
+    assert store.load("bob")["balance"] == engine.STARTING_BALANCE - 20
+
+
+def test_disconnect_after_stopping_settles_with_the_round(tmp_path):
+    store = PlayerStore(str(tmp_path / "players.db"), legacy_json=None)
+    settled = []
+
+    def scenario():
+        table_server, table, alice, bob = playing_table(store)
+        table_server.names.add("alice")
+        player = table.seats[alice].player
+        table.act(alice, 2, engine.STOP)
+        assert table.turn == bob
+        table_server.unseat(table, alice)
+        assert "alice" in table_server.names
+        table.act(bob, 2, engine.STOP)
+        assert table.phase == protocol.BETTING
+        assert "alice" not in table_server.names
+        settled.append((engine.settle(player, table.dealer), player.balance))
+
+    run(scenario)
+    ((outcome, amount), balance) = settled[0]
+    assert store.load("alice")["balance"] == balance == engine.STARTING_BALANCE + amount
+    (record,) = store.load_history("alice")
+    assert (record["outcome"], record["payout"]) == (outcome, amount)
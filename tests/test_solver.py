@@ -0,0 +1,22 @@
+import pytest
+
+import engine
+
+solver = pytest.importorskip("solver")
+
+
+def rows_by_hand(rules):
+    decks, rows = solver._solve_upcard((1, 10, solver.DEFAULT_CACHE_SIZE, rules))
+    return {(first, second): row for first, second, *row in rows}
+
+
+def test_tables_follow_the_table_rules():
+    default = rows_by_hand(engine.DEFAULT_RULES)
+    six_to_five = rows_by_hand(engine.TableRules(dealer_17=engine.STAND_17, blackjack_payout=1.2))
+
+    # Black Jack against a ten pays unless the hole card is one of the
+    # deck's three aces left among the 49 unseen cards
+    assert default[(10, 11)] == [10, engine.STOP, pytest.approx(1.5 * 46 / 49), -1.0]
+    assert six_to_five[(10, 11)] == [10, engine.STOP, pytest.approx(1.2 * 46 / 49), -1.0]
+    # The dealer's 17 rule reaches the solved hands
+    assert default[(8, 10)][2] != six_to_five[(8, 10)][2]
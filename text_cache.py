@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+# Bounded LRU cache of rendered text surfaces. Font rasterization is the
+# most expensive thing most screens do per frame, and nearly every label is
+# the same from one frame to the next, so render() hands back the surface
+# from the last time this (font, text, color) was drawn. Cached surfaces are
+# shared: callers must blit them, never draw on them.
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+class TextCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, key, build):
+        # Returns the surface stored under key, calling build() on a miss
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = build()
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    def render(self, font, text, color, antialias=True):
+        return self.cached((font, text, color, antialias), lambda: font.render(text, antialias, color))
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Text cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']}/{self.max_entries} entries, {stats['hit_rate']:.1%} hit rate")